@@ -7,11 +7,8 @@ from django.shortcuts import render
 from django import forms
 from django.utils import timezone
 from datetime import timedelta
-import os
-from django.conf import settings
-from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
 from .models import Case, LabTest, Slide, UserProgress, UserObservation, UserProfile, CaseCategory, SubCategory
+from .services import CasePayloadBuilder, CaseImporter, SlideImageProcessor
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 
@@ -67,8 +64,8 @@ class SlideInline(admin.TabularInline):
     # نمایش پیش‌نمایش تصویر در اینلاین
     def thumbnail(self, obj):
         if obj and obj.image:
-            image_url = f"/media/slides/{obj.image}"
-            return format_html('<img src="{}" style="height:60px; border-radius:4px;" />', image_url)
+            image_url = SlideImageProcessor.url(obj.image, 'thumb')
+            return format_html('<img src="{}" style="height:60px; border-radius:4px;" loading="lazy" />', image_url)
         return "-"
     thumbnail.short_description = "پیش‌نمایش"
 
@@ -144,24 +141,24 @@ def add_default_lab_tests(modeladmin, request, queryset):
 
 @admin.action(description="ساخت کپی از کیس‌های انتخاب‌شده")
 def duplicate_cases(modeladmin, request, queryset):
-    for obj in queryset:
+    for obj in queryset.prefetch_related('lab_tests', 'slides'):
         labtests = list(obj.lab_tests.all())
         slides = list(obj.slides.all())
         # tests = list(obj.tests.all())  # Test model not in use
         obj.pk = None  # کپی شیء اصلی
         obj.title = f"{obj.title} (کپی)"
         obj.save()
-        # کپی روابط فرزند
+        # کپی روابط فرزند به‌صورت دسته‌ای
         for lt in labtests:
             lt.pk = None
             lt.case = obj
-            lt.save()
+        LabTest.objects.bulk_create(labtests)
         for sl in slides:
             sl.pk = None
             sl.case = obj
             # image یک CharField است، فقط نام فایل را کپی می‌کنیم
             # اگر نیاز به کپی فایل هم باشد، باید فایل را هم کپی کنیم
-            sl.save()
+        Slide.objects.bulk_create(slides)
         # for tst in tests:  # Test model not in use
         #     tst.pk = None
         #     tst.case = obj
@@ -323,24 +320,8 @@ class CaseAdmin(admin.ModelAdmin):
                 # پردازش فایل آپلود شده
                 if 'image_upload' in inline_form.cleaned_data and inline_form.cleaned_data['image_upload']:
                     uploaded_file = inline_form.cleaned_data['image_upload']
-                    # ایجاد پوشه slides اگر وجود ندارد
-                    slides_dir = os.path.join(settings.MEDIA_ROOT, 'slides')
-                    os.makedirs(slides_dir, exist_ok=True)
-                    
-                    # ذخیره فایل
-                    file_name = uploaded_file.name
-                    # جلوگیری از overwrite شدن فایل‌های موجود
-                    base_name, ext = os.path.splitext(file_name)
-                    counter = 1
-                    while os.path.exists(os.path.join(slides_dir, file_name)):
-                        file_name = f"{base_name}_{counter}{ext}"
-                        counter += 1
-                    
-                    file_path = os.path.join(slides_dir, file_name)
-                    
-                    with open(file_path, 'wb+') as destination:
-                        for chunk in uploaded_file.chunks():
-                            destination.write(chunk)
+                    # ذخیره با نام مبتنی بر محتوا و ساخت نسخه‌های thumb/medium/full
+                    file_name = SlideImageProcessor.save_upload(uploaded_file)
                     
                     # ذخیره نام فایل در فیلد image
                     instance.image = file_name
@@ -367,31 +348,12 @@ class CaseAdmin(admin.ModelAdmin):
             form = ExcelImportForm(request.POST, request.FILES)
             if form.is_valid():
                 try:
-                    # Lazy import pandas فقط زمانی که نیاز است
-                    try:
-                        import pandas as pd
-                    except ImportError:
-                        messages.error(request, 'خطا: کتابخانه pandas نصب نشده است. لطفاً آن را نصب کنید: pip install pandas openpyxl')
-                        form = ExcelImportForm()
-                        context = {
-                            'form': form,
-                            'title': 'وارد کردن کیس‌ها از فایل اکسل',
-                        }
-                        return render(request, 'admin/cases/case/import_excel.html', context)
-                    
                     excel_file = form.cleaned_data['excel_file']
-                    df = pd.read_excel(excel_file)
-                    
-                    created_count = 0
-                    for _, row in df.iterrows():
-                        Case.objects.create(
-                            title=row.get('title', ''),
-                            category=CaseCategory.objects.first(),  # استفاده از اولین دسته‌بندی موجود
-                            history=row.get('history', ''),
-                            correct_diagnosis=row.get('correct_diagnosis', ''),
-                            explanation=row.get('explanation', '')
-                        )
-                        created_count += 1
+                    importer = CaseImporter(default_category=CaseCategory.objects.first())
+                    result = importer.run(excel_file)
+                    created_count = result['cases']
+                    if result['skipped']:
+                        messages.warning(request, f'{result["skipped"]} ردیف نامعتبر رد شد.')
                     
                     messages.success(request, f'{created_count} کیس با موفقیت از فایل اکسل ایجاد شد.')
                     return HttpResponseRedirect(reverse('admin:cases_case_changelist'))
@@ -487,25 +449,8 @@ class SlideAdminForm(forms.ModelForm):
         # پردازش فایل آپلود شده
         if 'image_upload' in self.cleaned_data and self.cleaned_data['image_upload']:
             uploaded_file = self.cleaned_data['image_upload']
-            
-            # ایجاد پوشه slides اگر وجود ندارد
-            slides_dir = os.path.join(settings.MEDIA_ROOT, 'slides')
-            os.makedirs(slides_dir, exist_ok=True)
-            
-            # ذخیره فایل
-            file_name = uploaded_file.name
-            # جلوگیری از overwrite شدن فایل‌های موجود
-            base_name, ext = os.path.splitext(file_name)
-            counter = 1
-            while os.path.exists(os.path.join(slides_dir, file_name)):
-                file_name = f"{base_name}_{counter}{ext}"
-                counter += 1
-            
-            file_path = os.path.join(slides_dir, file_name)
-            
-            with open(file_path, 'wb+') as destination:
-                for chunk in uploaded_file.chunks():
-                    destination.write(chunk)
+            # ذخیره با نام مبتنی بر محتوا و ساخت نسخه‌های thumb/medium/full
+            file_name = SlideImageProcessor.save_upload(uploaded_file)
             
             # ذخیره نام فایل در فیلد image
             instance.image = file_name
@@ -533,8 +478,8 @@ class SlideAdmin(admin.ModelAdmin):
     def thumbnail_preview(self, obj):
         if obj and obj.image:
             # obj.image یک CharField است که نام فایل را ذخیره می‌کند
-            image_url = f"/media/slides/{obj.image}"
-            return format_html('<img src="{}" style="height:60px; border-radius:4px;" />', image_url)
+            image_url = SlideImageProcessor.url(obj.image, 'thumb')
+            return format_html('<img src="{}" style="height:60px; border-radius:4px;" loading="lazy" />', image_url)
         return "-"
     thumbnail_preview.short_description = "پیش‌نمایش"
 
@@ -590,11 +535,13 @@ class UserObservationAdmin(admin.ModelAdmin):
     
     @admin.action(description="علامت‌گذاری به عنوان صحیح")
     def mark_as_correct(self, request, queryset):
+        CasePayloadBuilder.invalidate_for_observations(queryset)
         updated = queryset.update(is_correct=True)
         self.message_user(request, f'{updated} مشاهده به عنوان صحیح علامت‌گذاری شد.')
     
     @admin.action(description="علامت‌گذاری به عنوان غلط")
     def mark_as_incorrect(self, request, queryset):
+        CasePayloadBuilder.invalidate_for_observations(queryset)
         updated = queryset.update(is_correct=False)
         self.message_user(request, f'{updated} مشاهده به عنوان غلط علامت‌گذاری شد.')
     
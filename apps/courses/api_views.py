@@ -1,28 +1,96 @@
 from rest_framework import generics, filters, status
+from rest_framework.settings import api_settings
 from rest_framework.decorators import api_view
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
-from .models import Case, CaseCategory, LabTest, UserProgress, UserObservation
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from .models import Case, LabTest, UserProgress, UserObservation
 from .serializers import (
     CaseSerializer, CaseListSerializer, CaseCategorySerializer,
-    LabTestSerializer, UserProgressSerializer, UserObservationSerializer
+    LabTestSerializer, UserProgressSerializer, UserObservationSerializer,
+    annotate_case_counts, project_case_queryset,
 )
+from .services import CaseSearch, CaseStats, CasePayloadBuilder, CatalogGeneration, CatalogTree, ConditionalGet
+
+
+class CaseCursorPagination(CursorPagination):
+    """
+    صفحه‌بندی keyset روی (created_at, id)
+    
+    هزینه صفحات عمیق برابر صفحه اول است (بدون OFFSET).
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+
+
+class CaseSearchPagination(PageNumberPagination):
+    """
+    صفحه‌بندی نتایج جستجوی رتبه‌بندی شده
+
+    cursor روی (created_at, id) ترتیب rank را از بین می‌برد و rank اعشاری کلید
+    مناسبی برای cursor نیست؛ تعداد نتایج جستجو محدود است و OFFSET هزینه کمی دارد.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class CaseSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter مبتنی بر CaseSearch (full-text و trigram روی PostgreSQL)
+    
+    اگر پارامتر ordering ارسال نشده باشد، نتایج بر اساس rank مرتب می‌شوند.
+    """
+    
+    @classmethod
+    def is_ranked(cls, request):
+        """آیا نتایج بر اساس rank مرتب می‌شوند؟ (جستجو بدون ?ordering=)"""
+        return bool(
+            request.query_params.get(api_settings.SEARCH_PARAM, '').strip()
+            and not request.query_params.get(api_settings.ORDERING_PARAM)
+        )
+    
+    def filter_queryset(self, request, queryset, view):
+        query = ' '.join(self.get_search_terms(request))
+        if not query:
+            return queryset
+        results = CaseSearch.search(queryset, query)
+        if request.query_params.get(api_settings.ORDERING_PARAM):
+            return results.order_by(*queryset.query.order_by)
+        return results
+
 
 class CaseListView(generics.ListAPIView):
     """
     لیست تمام مطالعات موردی با قابلیت فیلتر و جستجو
     """
-    queryset = Case.objects.all().prefetch_related('category', 'lab_tests', 'slides')
+    queryset = Case.objects.select_related('category')
     serializer_class = CaseListSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = CaseCursorPagination
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, CaseSearchFilter]
     filterset_fields = ['category', 'difficulty_level']
-    search_fields = ['title', 'history', 'category__name']
+    search_fields = ['title', 'history', 'correct_diagnosis', 'summary', 'category__name']
     ordering_fields = ['created_at', 'title', 'difficulty_level']
-    ordering = ['-created_at']
+    ordering = ['-created_at', '-id']
+
+    @property
+    def paginator(self):
+        # نتایج رتبه‌بندی شده جستجو با شماره صفحه صفحه‌بندی می‌شوند تا ترتیب rank حفظ شود
+        if not hasattr(self, '_paginator'):
+            if CaseSearchFilter.is_ranked(self.request):
+                self._paginator = CaseSearchPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        # فقط ستون‌ها و تعدادهای فیلدهای انتخاب شده (?fields=) خوانده می‌شوند
+        fields = CaseListSerializer.selected_fields(self.request)
+        queryset = project_case_queryset(super().get_queryset(), fields)
         category_slug = self.request.query_params.get('category_slug', None)
         
         if category_slug:
@@ -34,15 +102,41 @@ class CaseDetailView(generics.RetrieveAPIView):
     """
     جزئیات یک مطالعه موردی
     """
-    queryset = Case.objects.all().prefetch_related('category', 'subcategory', 'lab_tests', 'slides')
+    queryset = annotate_case_counts(
+        Case.objects.select_related('category', 'sub_category').prefetch_related('lab_tests')
+    )
     serializer_class = CaseSerializer
+    
+    def retrieve(self, request, *args, **kwargs):
+        # validator ها از داده کش شده کیس ساخته می‌شوند؛ پاسخ 304 بدون query و serialize
+        payload = CasePayloadBuilder.get(kwargs['pk'])
+        if payload is None or not payload.get('etag'):
+            return super().retrieve(request, *args, **kwargs)
+        
+        etag = ConditionalGet.make_etag('case_api', payload['etag'], CatalogGeneration.get())
+        response = ConditionalGet.not_modified(request, etag, payload['last_modified'])
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+        return ConditionalGet.apply(response, etag, payload['last_modified'])
 
 class CategoryListView(generics.ListAPIView):
     """
     لیست تمام دسته‌بندی‌ها
     """
-    queryset = CaseCategory.objects.all()
     serializer_class = CaseCategorySerializer
+    # لیست از درخت کش شده کاتالوگ خوانده می‌شود و فیلتر queryset ندارد
+    filter_backends = []
+    
+    def get_queryset(self):
+        return CatalogTree.categories()
+    
+    def list(self, request, *args, **kwargs):
+        # دسته‌بندی‌ها فقط با تغییر کاتالوگ عوض می‌شوند
+        etag = ConditionalGet.make_etag('categories', CatalogGeneration.get(), request.GET.urlencode())
+        response = ConditionalGet.not_modified(request, etag)
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+        return ConditionalGet.apply(response, etag, private=False)
 
 class LabTestListView(generics.ListAPIView):
     """
@@ -58,24 +152,23 @@ class LabTestListView(generics.ListAPIView):
 def case_stats(request):
     """
     آمار کلی مطالعات موردی
+    
+    پاسخ بر اساس نسل کاتالوگ کش می‌شود و ETag/Last-Modified دارد؛
+    کلاینت‌ها با If-None-Match پاسخ 304 بدون بدنه دریافت می‌کنند.
     """
-    total_cases = Case.objects.count()
-    categories = CaseCategory.objects.all()
-    category_stats = []
+    stats = CaseStats.get()
+    generation = stats['generation']
+    etag = f'"case-stats-{generation}"'
+    last_modified = stats['generated_at'].timestamp()
     
-    for category in categories:
-        case_count = Case.objects.filter(category=category).count()
-        category_stats.append({
-            'id': category.id,
-            'name': category.name,
-            'slug': category.slug,
-            'count': case_count
-        })
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = Response(stats['data'])
     
-    return Response({
-        'total_cases': total_cases,
-        'categories': category_stats
-    })
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, max_age=0, must_revalidate=True)
+    return response
 
 @api_view(['POST'])
 def create_user_progress(request):
@@ -117,14 +210,8 @@ def search_cases(request):
     category = request.GET.get('category', '')
     difficulty = request.GET.get('difficulty', '')
     
-    queryset = Case.objects.all()
-    
-    if query:
-        queryset = queryset.filter(
-            Q(title__icontains=query) | 
-            Q(history__icontains=query) |
-            Q(category__name__icontains=query)
-        )
+    fields = CaseListSerializer.selected_fields(request)
+    queryset = project_case_queryset(Case.objects.select_related('category'), fields)
     
     if category:
         queryset = queryset.filter(category__slug=category)
@@ -132,5 +219,11 @@ def search_cases(request):
     if difficulty:
         queryset = queryset.filter(difficulty_level=difficulty)
     
-    serializer = CaseListSerializer(queryset, many=True)
-    return Response(serializer.data)
+    if query:
+        queryset = CaseSearch.search(queryset, query)
+    
+    # نتایج جستجو به ترتیب rank (شماره صفحه) و در غیر این صورت keyset روی (created_at, id)
+    paginator = CaseSearchPagination() if query else CaseCursorPagination()
+    page = paginator.paginate_queryset(queryset, request)
+    serializer = CaseListSerializer(page, many=True, context={'request': request})
+    return paginator.get_paginated_response(serializer.data)
@@ -0,0 +1,57 @@
+"""
+دستور مدیریتی برای ساخت نسخه‌های thumb/medium/full تصاویر اسلایدهای موجود
+استفاده: python manage.py build_slide_images [--dry-run]
+"""
+
+import os
+from django.core.management.base import BaseCommand
+from apps.courses.models import Slide
+from apps.courses.services import SlideImageProcessor
+
+
+class Command(BaseCommand):
+    help = 'انتقال تصاویر اسلایدها به نام مبتنی بر محتوا و ساخت نسخه‌های WebP/JPEG'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='فقط نمایش اسلایدهای نیازمند پردازش'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        processed = missing = failed = 0
+
+        slides = Slide.objects.exclude(image__isnull=True).exclude(image='').only('id', 'case_id', 'image')
+        for slide in slides.iterator():
+            file_path = SlideImageProcessor.media_path(SlideImageProcessor.SLIDES_DIR, slide.image)
+            if not os.path.exists(file_path):
+                missing += 1
+                self.stdout.write(self.style.WARNING(f'⚠️ فایل اسلاید {slide.id} یافت نشد: {slide.image}'))
+                continue
+
+            if dry_run:
+                if not SlideImageProcessor.has_derivatives(slide.image):
+                    self.stdout.write(f'اسلاید {slide.id}: {slide.image}')
+                    processed += 1
+                continue
+
+            try:
+                with open(file_path, 'rb') as source:
+                    file_name = SlideImageProcessor.store(source.read(), slide.image)
+            except Exception as e:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f'❌ خطا در پردازش اسلاید {slide.id}: {e}'))
+                continue
+
+            if file_name != slide.image:
+                # save تا نسخه کش payload کیس هم افزایش پیدا کند
+                slide.image = file_name
+                slide.save(update_fields=['image'])
+            processed += 1
+
+        label = 'نیازمند پردازش' if dry_run else 'پردازش شد'
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {processed} اسلاید {label} (فایل ناموجود: {missing}، خطا: {failed})'
+        ))
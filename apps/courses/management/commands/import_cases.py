@@ -1,14 +1,13 @@
+import os
 from django.core.management.base import BaseCommand
-from django.db import transaction
-import pandas as pd
-from apps.courses.models import Case
+from apps.courses.services import CaseImporter, CaseImportError
 
 
 class Command(BaseCommand):
-    help = 'ایمپورت دسته‌ای کیس‌ها از فایل اکسل'
+    help = 'ایمپورت دسته‌ای کیس‌ها (به همراه تست‌ها و اسلایدها) از فایل اکسل یا CSV'
 
     def add_arguments(self, parser):
-        parser.add_argument('file_path', type=str, help='مسیر فایل اکسل')
+        parser.add_argument('file_path', type=str, help='مسیر فایل اکسل یا CSV')
         parser.add_argument(
             '--batch-size',
             type=int,
@@ -20,87 +19,92 @@ class Command(BaseCommand):
             action='store_true',
             help='فقط نمایش دهد بدون ایجاد کیس‌ها'
         )
+        parser.add_argument(
+            '--resume-from',
+            type=int,
+            default=None,
+            help='شماره آخرین ردیف ذخیره شده؛ ایمپورت از ردیف بعدی ادامه پیدا می‌کند'
+        )
+        parser.add_argument(
+            '--checkpoint-file',
+            type=str,
+            default=None,
+            help='فایلی که شماره آخرین ردیف ذخیره شده بعد از هر دسته در آن نوشته می‌شود'
+        )
+        parser.add_argument(
+            '--no-defaults',
+            action='store_true',
+            help='تست‌ها و گزینه‌های پیش‌فرض (CBC, CHEM, MORPHO) ایجاد نشوند'
+        )
 
     def handle(self, *args, **options):
         file_path = options['file_path']
-        batch_size = options['batch_size']
+        checkpoint_file = options['checkpoint_file']
         dry_run = options['dry_run']
 
-        try:
-            self.stdout.write(f'📖 در حال خواندن فایل: {file_path}')
-            
-            # خواندن فایل اکسل
-            if file_path.endswith('.xlsx'):
-                df = pd.read_excel(file_path)
-            elif file_path.endswith('.csv'):
-                df = pd.read_csv(file_path)
-            else:
-                self.stdout.write(self.style.ERROR('فقط فایل‌های .xlsx و .csv پشتیبانی می‌شوند.'))
-                return
-
-            # بررسی ستون‌های مورد نیاز
-            required_columns = ['title', 'history', 'correct_diagnosis', 'explanation']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            
-            if missing_columns:
-                self.stdout.write(
-                    self.style.ERROR(f'ستون‌های زیر در فایل موجود نیست: {", ".join(missing_columns)}')
-                )
-                return
-
-            # پاک کردن ردیف‌های خالی
-            df = df.dropna(subset=['title', 'history', 'correct_diagnosis', 'explanation'])
-            
-            self.stdout.write(f'📊 تعداد ردیف‌های معتبر: {len(df)}')
-
-            if dry_run:
-                self.stdout.write('🔍 حالت نمایش (بدون ایجاد کیس‌ها)')
-                for index, row in df.head(5).iterrows():
-                    self.stdout.write(f'  - {row["title"]}: {row["history"][:50]}...')
-                return
+        start_row = options['resume_from']
+        if start_row is None:
+            start_row = self._read_checkpoint(checkpoint_file)
 
-            # تبدیل به لیست برای bulk_create
-            cases_to_create = []
-            for index, row in df.iterrows():
-                try:
-                    case = Case(
-                        title=str(row['title']).strip(),
-                        history=str(row['history']).strip(),
-                        correct_diagnosis=str(row['correct_diagnosis']).strip(),
-                        explanation=str(row['explanation']).strip()
-                    )
-                    cases_to_create.append(case)
-                except Exception as e:
-                    self.stdout.write(
-                        self.style.WARNING(f'خطا در پردازش ردیف {index+1}: {str(e)}')
-                    )
-
-            # ایجاد کیس‌ها به صورت دسته‌ای
-            total_created = 0
-            
-            with transaction.atomic():
-                for i in range(0, len(cases_to_create), batch_size):
-                    batch = cases_to_create[i:i + batch_size]
-                    try:
-                        created_cases = Case.objects.bulk_create(batch, ignore_conflicts=True)
-                        total_created += len(created_cases)
-                        
-                        # نمایش پیشرفت
-                        progress = min((i + batch_size) / len(cases_to_create) * 100, 100)
-                        self.stdout.write(
-                            f'📈 پیشرفت: {progress:.1f}% - {total_created} کیس ایجاد شد'
-                        )
-                        
-                    except Exception as e:
-                        self.stdout.write(
-                            self.style.ERROR(f'خطا در ایجاد دسته {i//batch_size + 1}: {str(e)}')
-                        )
+        importer = CaseImporter(
+            batch_size=options['batch_size'],
+            start_row=start_row,
+            dry_run=dry_run,
+            seed_defaults=not options['no_defaults'],
+        )
 
+        def on_chunk(status):
+            if checkpoint_file and not dry_run:
+                with open(checkpoint_file, 'w') as f:
+                    f.write(str(status['checkpoint']))
             self.stdout.write(
-                self.style.SUCCESS(f'✅ {total_created} کیس با موفقیت ایجاد شد.')
+                f'📈 ردیف {status["checkpoint"]} - {status["cases"]} کیس، '
+                f'{status["lab_tests"]} تست، {status["slides"]} اسلاید '
+                f'({status["rows_per_second"]:.0f} ردیف در ثانیه)'
             )
 
+        def on_error(row_number, message):
+            self.stdout.write(self.style.WARNING(f'خطا در پردازش ردیف {row_number}: {message}'))
+
+        self.stdout.write(f'📖 در حال خواندن فایل: {file_path}')
+        if start_row:
+            self.stdout.write(f'⏩ ادامه از بعد از ردیف {start_row}')
+        if dry_run:
+            self.stdout.write('🔍 حالت نمایش (بدون ایجاد کیس‌ها)')
+
+        try:
+            result = importer.run(file_path, on_chunk=on_chunk, on_error=on_error)
         except FileNotFoundError:
             self.stdout.write(self.style.ERROR(f'فایل {file_path} پیدا نشد.'))
+            return
+        except CaseImportError as e:
+            self.stdout.write(self.style.ERROR(str(e)))
+            return
         except Exception as e:
-            self.stdout.write(self.style.ERROR(f'خطا در پردازش فایل: {str(e)}')) 
\ No newline at end of file
+            self.stdout.write(self.style.ERROR(f'خطا در پردازش فایل: {str(e)}'))
+            self.stdout.write(
+                self.style.WARNING('برای ادامه، دستور را با --resume-from برابر آخرین ردیف گزارش شده اجرا کنید.')
+            )
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✅ {result["cases"]} کیس، {result["lab_tests"]} تست، {result["slides"]} اسلاید و '
+                f'{result["observations"]} گزینه ایجاد شد '
+                f'({result["rows"]} ردیف در {result["elapsed"]:.1f} ثانیه، '
+                f'{result["rows_per_second"]:.0f} ردیف در ثانیه).'
+            )
+        )
+        if result['skipped']:
+            self.stdout.write(self.style.WARNING(f'⚠️ {result["skipped"]} ردیف نامعتبر رد شد.'))
+
+    @staticmethod
+    def _read_checkpoint(checkpoint_file):
+        """خواندن شماره ردیف از فایل checkpoint (در صورت وجود)"""
+        if not checkpoint_file or not os.path.exists(checkpoint_file):
+            return 0
+        try:
+            with open(checkpoint_file) as f:
+                return int(f.read().strip() or 0)
+        except ValueError:
+            return 0
@@ -0,0 +1,21 @@
+"""
+دستور مدیریتی برای بازسازی ایندکس جستجوی کیس‌ها (PostgreSQL)
+پس از تغییر CASE_SEARCH_CONFIG اجرا شود.
+استفاده: python manage.py rebuild_case_search
+"""
+
+from django.core.management.base import BaseCommand
+from apps.courses.services import CaseSearch
+
+
+class Command(BaseCommand):
+    help = 'بازسازی ایندکس GIN جستجوی کیس‌ها با CASE_SEARCH_CONFIG فعلی'
+
+    def handle(self, *args, **options):
+        if not CaseSearch.rebuild_index():
+            self.stdout.write(self.style.WARNING('دیتابیس PostgreSQL نیست؛ جستجو با icontains انجام می‌شود.'))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ ایندکس جستجوی کیس‌ها با پیکربندی {CaseSearch.get_config()} بازسازی شد.'
+        ))
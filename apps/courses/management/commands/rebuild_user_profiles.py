@@ -0,0 +1,58 @@
+"""
+دستور مدیریتی برای بازسازی کامل آمار UserProfile همه کاربران
+استفاده: python manage.py rebuild_user_profiles --batch-size 500
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from apps.courses.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = 'بازسازی آمار پروفایل کاربران از روی UserProgress (یک query تجمیعی برای هر دسته)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='تعداد کاربران در هر دسته (پیش‌فرض: 500)'
+        )
+        parser.add_argument('--user-id', type=int, help='ID کاربر خاص (اختیاری)')
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        users = get_user_model().objects.order_by('id')
+        if options['user_id']:
+            users = users.filter(id=options['user_id'])
+
+        user_ids = list(users.values_list('id', flat=True))
+        fields = list(UserProfile.COUNTER_FIELDS) + ['average_attempts_per_case']
+        rebuilt = 0
+
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start:start + batch_size]
+            totals = UserProfile.aggregate_progress(batch)
+
+            with transaction.atomic():
+                UserProfile.objects.bulk_create(
+                    [UserProfile(user_id=user_id) for user_id in batch],
+                    ignore_conflicts=True,
+                )
+                profiles = list(UserProfile.objects.filter(user_id__in=batch))
+                for profile in profiles:
+                    values = totals.get(profile.user_id, {})
+                    for field in UserProfile.COUNTER_FIELDS:
+                        setattr(profile, field, values.get(field, 0))
+                    profile.average_attempts_per_case = UserProfile.compute_average_attempts(
+                        profile.total_attempts, profile.total_cases_completed
+                    )
+                UserProfile.objects.bulk_update(profiles, fields)
+
+            rebuilt += len(profiles)
+            self.stdout.write(f'📈 {rebuilt}/{len(user_ids)} پروفایل بازسازی شد')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ آمار {rebuilt} پروفایل با موفقیت بازسازی شد.')
+        )
@@ -0,0 +1,24 @@
+"""
+دستور مدیریتی برای محاسبه دوباره snapshot آمار پلتفرم
+استفاده (مثلاً هر 5 دقیقه با cron): python manage.py refresh_platform_metrics
+"""
+
+from django.core.management.base import BaseCommand
+from apps.courses.services import PlatformMetrics
+
+
+class Command(BaseCommand):
+    help = 'محاسبه دوباره آمار پلتفرم برای پنل ادمین و template tag ها'
+
+    def handle(self, *args, **options):
+        try:
+            snapshot = PlatformMetrics.refresh()
+            self.stdout.write(
+                self.style.SUCCESS('✅ آمار پلتفرم با موفقیت به‌روزرسانی شد!')
+            )
+            for field in PlatformMetrics.COUNTER_FIELDS:
+                self.stdout.write(f'- {field}: {snapshot[field]}')
+        except Exception as e:
+            self.stdout.write(
+                self.style.ERROR(f'❌ خطا در به‌روزرسانی آمار: {str(e)}')
+            )
@@ -0,0 +1,43 @@
+# Generated manually
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0029_add_database_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprogress',
+            name='correct_observations',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprogress',
+            name='total_observations',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprogress',
+            name='attempts_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprogress',
+            name='user_diagnosis',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userprogress',
+            name='is_diagnosis_correct',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='total_attempts',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated manually
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('courses', '0030_progress_stats_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserAchievement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=100)),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True)),
+                ('icon', models.CharField(blank=True, max_length=20)),
+                ('awarded_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='achievements', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'دستاورد کاربر',
+                'verbose_name_plural': 'دستاوردهای کاربران',
+                'db_table': 'courses_userachievement',
+                'ordering': ['awarded_at', 'id'],
+                'unique_together': {('user', 'code')},
+                'indexes': [models.Index(fields=['user', 'awarded_at'], name='courses_userach_user_award_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated manually
+
+from django.conf import settings
+from django.db import migrations, transaction
+
+
+SEARCH_INDEX_NAME = 'courses_case_search_idx'
+
+# (فیلد، وزن)؛ باید با CaseSearch.VECTOR_FIELDS یکسان باشد
+VECTOR_FIELDS = [
+    ('title', 'A'),
+    ('correct_diagnosis', 'B'),
+    ('history', 'C'),
+    ('summary', 'D'),
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    """
+    ایندکس‌های GIN جستجو (فقط PostgreSQL)
+
+    ایندکس جستجو تابعی است (بدون ستون جدا) تا جدول روی MySQL تغییری نکند؛ پیکربندی
+    از CASE_SEARCH_CONFIG خوانده می‌شود و پس از تغییر آن باید rebuild_case_search اجرا شود.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+
+    Case = apps.get_model('courses', 'Case')
+    config = getattr(settings, 'CASE_SEARCH_CONFIG', 'simple')
+    vector = None
+    for field, weight in VECTOR_FIELDS:
+        part = SearchVector(field, weight=weight, config=config)
+        vector = part if vector is None else vector + part
+    schema_editor.add_index(Case, GinIndex(vector, name=SEARCH_INDEX_NAME))
+
+    # pg_trgm برای جستجوی فازی؛ در صورت نبود دسترسی ساخت افزونه، جستجو بدون آن کار می‌کند
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            schema_editor.execute(
+                'CREATE INDEX IF NOT EXISTS courses_case_title_trgm_idx '
+                'ON courses_case USING gin (title gin_trgm_ops)'
+            )
+    except Exception as e:
+        print(f"pg_trgm not available, fuzzy case search disabled: {e}")
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS courses_case_title_trgm_idx')
+    schema_editor.execute(f'DROP INDEX IF EXISTS {SEARCH_INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0031_userachievement'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
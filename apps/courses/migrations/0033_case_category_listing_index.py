@@ -0,0 +1,20 @@
+# Generated manually
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0032_case_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(
+                fields=['category', 'is_published', '-created_at', '-id'],
+                name='courses_cas_cat_listing_idx',
+            ),
+        ),
+    ]
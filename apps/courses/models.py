@@ -1,7 +1,8 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.utils import timezone
-from django.db.models.signals import post_save
+from django.db.backends.signals import connection_created
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 
 # گزینه‌های پیش‌فرض برای تست CBC
@@ -203,6 +204,8 @@ class Case(models.Model):
             models.Index(fields=['category']),  # برای فیلتر بر اساس category
             models.Index(fields=['sub_category']),  # برای فیلتر بر اساس subcategory
             models.Index(fields=['created_at']),  # برای مرتب‌سازی بر اساس تاریخ
+            # صفحه‌بندی keyset کیس‌های هر دسته‌بندی (CategoryLanding)
+            models.Index(fields=['category', 'is_published', '-created_at', '-id'], name='courses_cas_cat_listing_idx'),
         ]
 
 class LabTest(models.Model):
@@ -251,6 +254,11 @@ class UserProgress(models.Model):
     started_at = models.DateTimeField(null=True, blank=True)
     completed_at = models.DateTimeField(null=True, blank=True)
     last_test = models.ForeignKey(LabTest, on_delete=models.SET_NULL, null=True, blank=True, db_column='last_test_id')
+    correct_observations = models.IntegerField(default=0)
+    total_observations = models.IntegerField(default=0)
+    attempts_count = models.IntegerField(default=0)
+    user_diagnosis = models.TextField(blank=True, null=True)
+    is_diagnosis_correct = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -274,6 +282,19 @@ class UserProgress(models.Model):
             return 0
         return float(self.score)
 
+    def stats_contribution(self):
+        """سهم این رکورد در شمارنده‌های UserProfile (فقط کیس‌های تکمیل شده حساب می‌شوند)"""
+        if not self.completed:
+            return dict.fromkeys(UserProfile.COUNTER_FIELDS, 0)
+        return {
+            'total_cases_completed': 1,
+            'total_correct_observations': self.correct_observations or 0,
+            'total_observations': self.total_observations or 0,
+            'total_correct_diagnoses': 1 if self.is_diagnosis_correct else 0,
+            'total_diagnoses': 1,
+            'total_attempts': self.attempts_count or 0,
+        }
+
 class Test(models.Model):
     case = models.ForeignKey(Case, on_delete=models.CASCADE, related_name='tests')
     title = models.CharField(max_length=100, choices=[
@@ -323,12 +344,23 @@ class UserProfile(models.Model):
     total_correct_diagnoses = models.IntegerField(default=0)
     total_diagnoses = models.IntegerField(default=0)
     average_attempts_per_case = models.FloatField(default=0)
+    total_attempts = models.IntegerField(default=0)
     last_activity = models.DateTimeField(auto_now=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         db_table = 'courses_userprofile'
 
+    # شمارنده‌هایی که با هر تغییر UserProgress به‌صورت تدریجی به‌روز می‌شوند
+    COUNTER_FIELDS = (
+        'total_cases_completed',
+        'total_correct_observations',
+        'total_observations',
+        'total_correct_diagnoses',
+        'total_diagnoses',
+        'total_attempts',
+    )
+
     def __str__(self):
         return f"Profile for {self.user.username}"
 
@@ -357,20 +389,88 @@ class UserProfile(models.Model):
         self.save(update_fields=['subscription_start', 'subscription_end'])
 
     def update_stats(self):
-        """به‌روزرسانی آمار کاربر"""
-        progress_records = self.user.case_progress.filter(completed=True)
-        
-        self.total_cases_completed = progress_records.count()
-        self.total_correct_observations = sum(p.correct_observations for p in progress_records)
-        self.total_observations = sum(p.total_observations for p in progress_records)
-        self.total_correct_diagnoses = progress_records.filter(is_diagnosis_correct=True).count()
-        self.total_diagnoses = progress_records.count()
-        
-        if self.total_cases_completed > 0:
-            self.average_attempts_per_case = sum(p.attempts_count for p in progress_records) / self.total_cases_completed
-        
+        """محاسبه کامل آمار کاربر از روی همه رکوردهای UserProgress (با یک query تجمیعی)"""
+        totals = self.aggregate_progress([self.user_id]).get(self.user_id, {})
+        for field in self.COUNTER_FIELDS:
+            setattr(self, field, totals.get(field, 0))
+        self.average_attempts_per_case = self.compute_average_attempts(
+            self.total_attempts, self.total_cases_completed
+        )
         self.save()
 
+    @staticmethod
+    def compute_average_attempts(total_attempts, total_cases_completed):
+        if not total_cases_completed:
+            return 0
+        return total_attempts / total_cases_completed
+
+    @classmethod
+    def aggregate_progress(cls, user_ids):
+        """
+        محاسبه شمارنده‌های چند کاربر با یک query تجمیعی
+
+        Returns:
+            dict: {user_id: {field: value}}
+        """
+        from django.db.models import Count, Sum, Q
+
+        rows = UserProgress.objects.filter(user_id__in=user_ids, completed=True).values('user_id').annotate(
+            total_cases_completed=Count('id'),
+            total_correct_observations=Sum('correct_observations'),
+            total_observations=Sum('total_observations'),
+            total_correct_diagnoses=Count('id', filter=Q(is_diagnosis_correct=True)),
+            total_diagnoses=Count('id'),
+            total_attempts=Sum('attempts_count'),
+        )
+        return {
+            row.pop('user_id'): {field: row[field] or 0 for field in cls.COUNTER_FIELDS}
+            for row in rows
+        }
+
+    @classmethod
+    def apply_progress_change(cls, user_id, before, after):
+        """
+        اعمال تغییر یک رکورد UserProgress روی شمارنده‌های پروفایل با F() به‌صورت اتمیک
+
+        Args:
+            user_id: شناسه کاربر
+            before: سهم رکورد قبل از تغییر (stats_contribution) یا None
+            after: سهم رکورد بعد از تغییر یا None (حذف)
+        """
+        from django.db.models import F, FloatField
+        from django.db.models.functions import Cast
+
+        before = before or {}
+        after = after or {}
+        deltas = {
+            field: after.get(field, 0) - before.get(field, 0)
+            for field in cls.COUNTER_FIELDS
+        }
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if not deltas:
+            return
+
+        with transaction.atomic():
+            updated = cls.objects.filter(user_id=user_id).update(
+                **{field: F(field) + delta for field, delta in deltas.items()}
+            )
+            if not updated:
+                if not after:
+                    # حذف رکورد برای کاربری که پروفایل ندارد (مثلاً حذف خود کاربر)
+                    return
+                # پروفایل هنوز ایجاد نشده؛ آمار یکباره از روی کل تاریخچه ساخته می‌شود
+                profile, created = cls.objects.get_or_create(user_id=user_id)
+                profile.update_stats()
+                return
+
+            # میانگین در query جداگانه تا از مقادیر به‌روز شده استفاده شود
+            cls.objects.filter(user_id=user_id, total_cases_completed__gt=0).update(
+                average_attempts_per_case=Cast('total_attempts', FloatField()) / F('total_cases_completed')
+            )
+            cls.objects.filter(user_id=user_id, total_cases_completed__lte=0).update(
+                average_attempts_per_case=0
+            )
+
 
 class Bookmark(models.Model):
     """مدل برای bookmark کردن case ها"""
@@ -395,76 +495,252 @@ class Bookmark(models.Model):
         return f"{self.user.username} bookmarked {self.case.title}"
 
 
+class UserAchievement(models.Model):
+    """دستاوردهای کسب شده کاربر به همراه تاریخ کسب"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='achievements')
+    code = models.CharField(max_length=100)
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True)
+    icon = models.CharField(max_length=20, blank=True)
+    awarded_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'code')
+        ordering = ['awarded_at', 'id']
+        verbose_name = 'دستاورد کاربر'
+        verbose_name_plural = 'دستاوردهای کاربران'
+        db_table = 'courses_userachievement'
+        indexes = [
+            models.Index(fields=['user', 'awarded_at'], name='courses_userach_user_award_idx'),  # برای نمایش دستاوردهای کاربر
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.title}"
+
+
+@receiver([post_save, post_delete], sender=Case)
+def invalidate_case_payload_for_case(sender, instance, **kwargs):
+    """باطل کردن داده کش شده صفحه کیس پس از تغییر کیس"""
+    from .services import CasePayloadBuilder
+    CasePayloadBuilder.invalidate(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Case)
+@receiver([post_save, post_delete], sender=CaseCategory)
+@receiver([post_save, post_delete], sender=SubCategory)
+def bump_catalog_generation(sender, instance, **kwargs):
+    """باطل کردن داده‌های کش شده کاتالوگ (آمار دسته‌بندی‌ها و ...)"""
+    from .services import CatalogGeneration
+    CatalogGeneration.bump()
+
+
+@receiver(connection_created)
+def configure_case_search_connection(sender, connection, **kwargs):
+    """تنظیم آستانه جستجوی فازی کیس‌ها روی هر اتصال جدید دیتابیس"""
+    from .services import CaseSearch
+    CaseSearch.configure_connection(connection)
+
+
+@receiver([post_save, post_delete], sender=LabTest)
+@receiver([post_save, post_delete], sender=Slide)
+def invalidate_case_payload_for_child(sender, instance, **kwargs):
+    """باطل کردن داده کش شده صفحه کیس پس از تغییر تست یا اسلاید"""
+    from .services import CasePayloadBuilder
+    CasePayloadBuilder.invalidate(instance.case_id)
+    if sender is LabTest and instance.lab_type == CasePayloadBuilder.GLOBAL_DEFAULT_TYPE:
+        CasePayloadBuilder.invalidate_defaults()
+
+
+@receiver([post_save, post_delete], sender=UserObservation)
+def invalidate_case_payload_for_observation(sender, instance, **kwargs):
+    """باطل کردن داده کش شده صفحه کیس پس از تغییر گزینه‌ها"""
+    from .services import CasePayloadBuilder
+    if not instance.case_test_id:
+        CasePayloadBuilder.invalidate(instance.case_id)
+        return
+    case_test = LabTest.objects.filter(pk=instance.case_test_id).values('case_id', 'lab_type').first()
+    if case_test is None:
+        CasePayloadBuilder.invalidate(instance.case_id)
+        return
+    CasePayloadBuilder.invalidate(case_test['case_id'])
+    if instance.case_id and instance.case_id != case_test['case_id']:
+        CasePayloadBuilder.invalidate(instance.case_id)
+    if case_test['lab_type'] == CasePayloadBuilder.GLOBAL_DEFAULT_TYPE:
+        CasePayloadBuilder.invalidate_defaults()
+
+
+@receiver(pre_save, sender=UserProgress)
+def capture_progress_stats(sender, instance, **kwargs):
+    """نگهداری سهم قبلی رکورد در آمار پروفایل برای محاسبه تغییرات"""
+    instance._previous_stats = None
+    if instance.pk:
+        previous = UserProgress.objects.filter(pk=instance.pk).only(
+            'completed', 'correct_observations', 'total_observations',
+            'attempts_count', 'is_diagnosis_correct',
+        ).first()
+        if previous is not None:
+            instance._previous_stats = previous.stats_contribution()
+
+
+@receiver(post_save, sender=UserProgress)
+def apply_progress_stats(sender, instance, **kwargs):
+    """به‌روزرسانی تدریجی آمار پروفایل پس از ذخیره UserProgress"""
+    UserProfile.apply_progress_change(
+        instance.user_id, getattr(instance, '_previous_stats', None), instance.stats_contribution()
+    )
+
+
+@receiver(post_delete, sender=UserProgress)
+def revert_progress_stats(sender, instance, **kwargs):
+    """کم کردن سهم رکورد حذف شده از آمار پروفایل"""
+    UserProfile.apply_progress_change(instance.user_id, instance.stats_contribution(), None)
+
+
+@receiver([post_save, post_delete], sender=UserProgress)
+def invalidate_user_analytics(sender, instance, **kwargs):
+    """باطل کردن آمار کش شده صفحه analytics کاربر"""
+    from apps.courses.services import UserAnalytics
+    UserAnalytics.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=UserProgress)
+def update_platform_metrics_for_progress(sender, instance, created, **kwargs):
+    """به‌روزرسانی تدریجی شمارنده‌های پیشرفت در snapshot آمار پلتفرم"""
+    from apps.courses.services import PlatformMetrics
+
+    previous = getattr(instance, '_previous_stats', None) or {}
+    was_completed = bool(previous.get('total_cases_completed'))
+    deltas = {'total_progress': 1 if created else 0}
+    if instance.completed and not was_completed:
+        deltas.update(completed_cases=1, monthly_completions=1, weekly_completions=1)
+    elif was_completed and not instance.completed:
+        deltas['completed_cases'] = -1
+    PlatformMetrics.increment(**deltas)
+
+
+@receiver(post_delete, sender=UserProgress)
+def revert_platform_metrics_for_progress(sender, instance, **kwargs):
+    from apps.courses.services import PlatformMetrics
+    PlatformMetrics.increment(total_progress=-1, completed_cases=-1 if instance.completed else 0)
+
+
+@receiver([post_save, post_delete], sender=Case)
+@receiver([post_save, post_delete], sender=CaseCategory)
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def update_platform_metrics_counts(sender, instance, created=None, **kwargs):
+    """به‌روزرسانی تعداد کیس‌ها، دسته‌بندی‌ها و کاربران در snapshot آمار پلتفرم"""
+    from apps.courses.services import PlatformMetrics
+
+    if created is False:
+        return
+    delta = 1 if created else -1
+    if sender is Case:
+        PlatformMetrics.increment(total_cases=delta)
+    elif sender is CaseCategory:
+        PlatformMetrics.increment(total_categories=delta)
+    else:
+        PlatformMetrics.increment(
+            total_users=delta,
+            new_students_this_month=delta if created else 0,
+        )
+
+
+@receiver(post_save, sender=UserProgress)
+def award_achievements(sender, instance, **kwargs):
+    """بررسی و ثبت دستاوردهای جدید پس از تکمیل یک کیس (بعد از به‌روزرسانی آمار پروفایل)"""
+    if instance.completed:
+        from apps.courses.services import AchievementEngine
+        AchievementEngine.evaluate(instance.user_id)
+
+
+# مشخصات تست‌های پیش‌فرض هر کیس جدید: (lab_type, lab_name, normal_range, order_index)
+DEFAULT_LAB_TESTS = [
+    ('CBC', 'Complete Blood Count', 'Normal ranges vary by species', 1),
+    ('CHEM', 'Clinical Chemistry Panel', 'Normal ranges vary by species', 2),
+    ('MORPHO', 'Morphological Changes', 'No abnormalities expected', 3),
+]
+
+
+def get_default_options_for_lab_type(lab_type):
+    """دریافت لیست گزینه‌های پیش‌فرض برای نوع آزمایش"""
+    return {
+        'CBC': CBC_DEFAULT_OPTIONS,
+        'CHEM': CHEM_DEFAULT_OPTIONS,
+        'MORPHO': MORPHO_DEFAULT_OPTIONS,
+    }.get(lab_type, [])
+
+
 @receiver(post_save, sender=Case)
 def create_default_lab_tests_for_case(sender, instance, created, **kwargs):
     """ایجاد تست‌های پیش‌فرض برای کیس جدید"""
     if created:
-        # ایجاد تست CBC
-        cbc_test = LabTest.objects.create(
-            case=instance,
-            lab_type='CBC',
-            lab_name='Complete Blood Count',
-            normal_range='Normal ranges vary by species',
-            lab_result='',
-            order_index=1
-        )
-        
-        # ایجاد تست CHEM
-        chem_test = LabTest.objects.create(
-            case=instance,
-            lab_type='CHEM',
-            lab_name='Clinical Chemistry Panel',
-            normal_range='Normal ranges vary by species',
-            lab_result='',
-            order_index=2
-        )
-        
-        # ایجاد تست MORPHO
-        morpho_test = LabTest.objects.create(
-            case=instance,
-            lab_type='MORPHO',
-            lab_name='Morphological Changes',
-            normal_range='No abnormalities expected',
-            lab_result='',
-            order_index=3
-        )
-        
-        # ایجاد گزینه‌های پیش‌فرض برای UserObservation
-        create_default_user_observations(instance, cbc_test, chem_test, morpho_test)
+        seed_default_lab_tests([instance])
+
+
+def seed_default_lab_tests(cases, batch_size=1000):
+    """
+    ایجاد دسته‌ای تست‌های پیش‌فرض (CBC, CHEM, MORPHO) و گزینه‌های آن‌ها برای چند کیس
+
+    همه ردیف‌ها با bulk_create و در یک تراکنش ایجاد می‌شوند؛ برای هر دسته
+    از کیس‌ها فقط دو INSERT (تست‌ها و گزینه‌ها) اجرا می‌شود.
+
+    Args:
+        cases: لیست کیس‌های ذخیره شده (دارای pk)
+        batch_size: تعداد ردیف در هر INSERT
+
+    Returns:
+        tuple: (تعداد تست‌های ایجاد شده، تعداد گزینه‌های ایجاد شده)
+    """
+    cases = [case for case in cases if case.pk]
+    if not cases:
+        return 0, 0
+
+    with transaction.atomic():
+        lab_tests = [
+            LabTest(
+                case=case,
+                lab_type=lab_type,
+                lab_name=lab_name,
+                normal_range=normal_range,
+                lab_result='',
+                order_index=order_index,
+            )
+            for case in cases
+            for lab_type, lab_name, normal_range, order_index in DEFAULT_LAB_TESTS
+        ]
+        LabTest.objects.bulk_create(lab_tests, batch_size=batch_size)
+
+        # در دیتابیس‌هایی که pk را از bulk_create برنمی‌گردانند (MySQL)، تست‌ها دوباره خوانده می‌شوند
+        if any(lab_test.pk is None for lab_test in lab_tests):
+            lab_tests = list(LabTest.objects.filter(
+                case__in=cases,
+                lab_type__in=[spec[0] for spec in DEFAULT_LAB_TESTS],
+            ).only('id', 'case_id', 'lab_type'))
+
+        observations = build_default_user_observations(lab_tests)
+        UserObservation.objects.bulk_create(observations, batch_size=batch_size)
+
+    return len(lab_tests), len(observations)
+
+
+def build_default_user_observations(lab_tests):
+    """ساخت (بدون ذخیره) UserObservation های پیش‌فرض برای تست‌های داده شده"""
+    observations = []
+    for lab_test in lab_tests:
+        for i, option in enumerate(get_default_options_for_lab_type(lab_test.lab_type)):
+            observations.append(UserObservation(
+                case_id=lab_test.case_id,
+                case_test=lab_test,
+                observation_text=option,
+                is_correct=False,  # به صورت پیش‌فرض غلط
+                explanation="",
+                order_index=i
+            ))
+    return observations
 
 
 def create_default_user_observations(case, cbc_test, chem_test, morpho_test):
     """ایجاد گزینه‌های پیش‌فرض UserObservation برای تست‌های مختلف"""
-    
-    # ایجاد UserObservation برای CBC
-    for i, option in enumerate(CBC_DEFAULT_OPTIONS):
-        UserObservation.objects.create(
-            case=case,
-            case_test=cbc_test,
-            observation_text=option,
-            is_correct=False,  # به صورت پیش‌فرض غلط
-            explanation="",
-            order_index=i
-        )
-    
-    # ایجاد UserObservation برای CHEM
-    for i, option in enumerate(CHEM_DEFAULT_OPTIONS):
-        UserObservation.objects.create(
-            case=case,
-            case_test=chem_test,
-            observation_text=option,
-            is_correct=False,  # به صورت پیش‌فرض غلط
-            explanation="",
-            order_index=i
-        )
-    
-    # ایجاد UserObservation برای MORPHO
-    for i, option in enumerate(MORPHO_DEFAULT_OPTIONS):
-        UserObservation.objects.create(
-            case=case,
-            case_test=morpho_test,
-            observation_text=option,
-            is_correct=False,  # به صورت پیش‌فرض غلط
-            explanation="",
-            order_index=i
-        )
\ No newline at end of file
+    observations = build_default_user_observations([cbc_test, chem_test, morpho_test])
+    UserObservation.objects.bulk_create(observations)
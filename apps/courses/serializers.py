@@ -1,5 +1,89 @@
 from rest_framework import serializers
-from .models import Case, CaseCategory, LabTest, UserProgress, UserObservation, UserProfile, SubCategory
+from django.db.models import Count, OuterRef, Subquery, IntegerField
+from django.db.models.functions import Coalesce
+from .models import Case, CaseCategory, LabTest, Slide, UserProgress, UserObservation, UserProfile, SubCategory
+
+
+def annotate_case_counts(queryset):
+    """
+    اضافه کردن slides_count و lab_tests_count به queryset کیس‌ها در همان query
+
+    از subquery استفاده می‌شود تا join دو رابطه تعداد ردیف‌ها را ضرب نکند.
+    """
+    def count_of(model):
+        return Coalesce(
+            Subquery(
+                model.objects.filter(case=OuterRef('pk')).order_by().values('case')
+                .annotate(total=Count('id')).values('total'),
+                output_field=IntegerField(),
+            ),
+            0,
+        )
+    return queryset.annotate(slides_count=count_of(Slide), lab_tests_count=count_of(LabTest))
+
+
+# فیلدهای متنی طولانی که فقط در صورت درخواست (?fields=) از دیتابیس خوانده می‌شوند
+DEFERRABLE_CASE_FIELDS = ('history', 'summary', 'correct_diagnosis', 'explanation')
+COUNT_FIELDS = ('slides_count', 'lab_tests_count')
+
+
+def project_case_queryset(queryset, fields):
+    """
+    محدود کردن ستون‌های خوانده شده به فیلدهای انتخاب شده serializer
+
+    Args:
+        queryset: queryset کیس‌ها
+        fields: مجموعه نام فیلدهای خروجی (SparseFieldsMixin.selected_fields)
+    """
+    deferred = [field for field in DEFERRABLE_CASE_FIELDS if field not in fields]
+    if deferred:
+        queryset = queryset.defer(*deferred)
+    if any(field in fields for field in COUNT_FIELDS):
+        queryset = annotate_case_counts(queryset)
+    return queryset
+
+
+class SparseFieldsMixin:
+    """
+    انتخاب فیلدهای خروجی با پارامتر ?fields=id,title,...
+
+    بدون پارامتر، default_fields (در صورت تعریف) برگردانده می‌شود.
+    """
+    
+    fields_param = 'fields'
+    default_fields = None
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = self.selected_fields(self.context.get('request'))
+        for name in list(self.fields):
+            if name not in selected:
+                self.fields.pop(name)
+    
+    @classmethod
+    def selected_fields(cls, request):
+        """مجموعه فیلدهای درخواست شده (فقط فیلدهای مجاز serializer)"""
+        available = cls.Meta.fields
+        default = set(cls.default_fields or available)
+        if request is None:
+            return default
+        requested = request.query_params.get(cls.fields_param)
+        if not requested:
+            return default
+        names = {name.strip() for name in requested.split(',')}
+        return {name for name in available if name in names} or default
+
+
+class AnnotatedCountsMixin:
+    """خواندن تعدادها از annotation (در صورت نبود annotation، شمارش جداگانه)"""
+    
+    def get_slides_count(self, obj):
+        count = getattr(obj, 'slides_count', None)
+        return obj.slides.count() if count is None else count
+    
+    def get_lab_tests_count(self, obj):
+        count = getattr(obj, 'lab_tests_count', None)
+        return obj.lab_tests.count() if count is None else count
 
 class CaseCategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -16,7 +100,7 @@ class LabTestSerializer(serializers.ModelSerializer):
         model = LabTest
         fields = ['id', 'name', 'test_type', 'normal_range', 'unit', 'description']
 
-class CaseSerializer(serializers.ModelSerializer):
+class CaseSerializer(AnnotatedCountsMixin, serializers.ModelSerializer):
     category = CaseCategorySerializer(read_only=True)
     subcategory = SubCategorySerializer(read_only=True)
     lab_tests = LabTestSerializer(many=True, read_only=True)
@@ -31,30 +115,24 @@ class CaseSerializer(serializers.ModelSerializer):
             'estimated_time', 'created_at', 'updated_at',
             'lab_tests', 'slides_count', 'lab_tests_count'
         ]
-    
-    def get_slides_count(self, obj):
-        return obj.slides.count()
-    
-    def get_lab_tests_count(self, obj):
-        return obj.lab_tests.count()
 
-class CaseListSerializer(serializers.ModelSerializer):
+class CaseListSerializer(SparseFieldsMixin, AnnotatedCountsMixin, serializers.ModelSerializer):
     category = CaseCategorySerializer(read_only=True)
     slides_count = serializers.SerializerMethodField()
     lab_tests_count = serializers.SerializerMethodField()
     
+    # history فقط با ?fields=...,history برگردانده می‌شود
+    default_fields = [
+        'id', 'title', 'category', 'difficulty_level',
+        'estimated_time', 'created_at', 'slides_count', 'lab_tests_count'
+    ]
+    
     class Meta:
         model = Case
         fields = [
             'id', 'title', 'history', 'category', 'difficulty_level',
             'estimated_time', 'created_at', 'slides_count', 'lab_tests_count'
         ]
-    
-    def get_slides_count(self, obj):
-        return obj.slides.count()
-    
-    def get_lab_tests_count(self, obj):
-        return obj.lab_tests.count()
 
 class UserProgressSerializer(serializers.ModelSerializer):
     case_title = serializers.CharField(source='case.title', read_only=True)
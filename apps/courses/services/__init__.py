@@ -0,0 +1,21 @@
+"""
+سرویس‌های کمکی برای app courses
+"""
+from .case_payload import CasePayloadBuilder
+from .case_import import CaseImporter, CaseImportError
+from .case_status import UserCaseStatus
+from .user_analytics import UserAnalytics
+from .achievements import AchievementEngine
+from .platform_metrics import PlatformMetrics
+from .case_search import CaseSearch
+from .catalog import CatalogGeneration, CaseStats, CatalogTree, CaseNavigation, CategoryLanding
+from .conditional import ConditionalGet
+from .slide_images import SlideImageProcessor
+from .answer_batch import AnswerBatch, AnswerBatchError
+
+__all__ = [
+    'CasePayloadBuilder', 'CaseImporter', 'CaseImportError', 'UserCaseStatus', 'UserAnalytics',
+    'AchievementEngine', 'PlatformMetrics', 'CaseSearch', 'CatalogGeneration', 'CaseStats',
+    'CatalogTree', 'CaseNavigation', 'CategoryLanding', 'ConditionalGet', 'SlideImageProcessor',
+    'AnswerBatch', 'AnswerBatchError',
+]
@@ -0,0 +1,201 @@
+"""
+موتور قوانین دستاوردهای کاربر
+"""
+from django.db.models import Count
+from django.utils import timezone
+
+
+class AchievementEngine:
+    """
+    ارزیابی قوانین دستاورد روی تاریخچه تکمیل کیس‌های کاربر
+
+    تاریخچه یک بار خوانده می‌شود و همه قوانین در حافظه بررسی می‌شوند؛ دستاوردهای
+    کسب شده با تاریخ کسب در UserAchievement ذخیره می‌شوند و صفحه دستاوردها فقط
+    همین جدول را می‌خواند.
+    """
+
+    # (تعداد کیس تکمیل شده، کد، عنوان، توضیح، آیکون)
+    MILESTONE_RULES = [
+        (1, 'completed_1', 'شروع کننده', 'اولین کیس خود را تکمیل کردید', '🎯'),
+        (5, 'completed_5', 'متعلم', '5 کیس را تکمیل کردید', '📚'),
+        (10, 'completed_10', 'متخصص', '10 کیس را تکمیل کردید', '🏆'),
+        (25, 'completed_25', 'استاد', '25 کیس را تکمیل کردید', '👑'),
+        (50, 'completed_50', 'قهرمان', '50 کیس را تکمیل کردید', '🥇'),
+    ]
+
+    # (حداقل دقت کلی، کد، عنوان، توضیح، آیکون)
+    ACCURACY_RULES = [
+        (80, 'accuracy_80', 'دقیق', 'دقت کلی بالای 80%', '🎯'),
+        (90, 'accuracy_90', 'نابغه', 'دقت کلی بالای 90%', '🧠'),
+        (95, 'accuracy_95', 'کمال‌گرا', 'دقت کلی بالای 95%', '💎'),
+    ]
+
+    CATEGORY_CODE = 'category_{category_id}'
+
+    # دستاوردهایی که قبل از کسب هم (با درصد پیشرفت) نمایش داده می‌شوند
+    PENDING_CODES = {
+        'completed_50': '50 کیس را تکمیل کنید',
+        'accuracy_95': 'دقت کلی بالای 95%',
+    }
+
+    @classmethod
+    def load_timeline(cls, user_id):
+        """
+        خواندن یکباره تاریخچه تکمیل کیس‌های کاربر (به ترتیب زمان تکمیل)
+
+        Returns:
+            list: [(case_id, category_id, is_published, completed_at)]
+        """
+        from apps.courses.models import UserProgress
+
+        return list(
+            UserProgress.objects.filter(user_id=user_id, completed=True)
+            .order_by('completed_at', 'id')
+            .values_list('case_id', 'case__category_id', 'case__is_published', 'completed_at')
+        )
+
+    @classmethod
+    def evaluate_rules(cls, timeline, accuracy, category_totals, now=None):
+        """
+        ارزیابی همه قوانین در حافظه
+
+        Args:
+            timeline: خروجی load_timeline
+            accuracy: دقت کلی کاربر (درصد)
+            category_totals: {category_id: (name, تعداد کیس‌های منتشر شده)}
+            now: زمان ثبت دستاوردهایی که تاریخ مشخصی در تاریخچه ندارند
+
+        Returns:
+            dict: {code: dict(title, description, icon, awarded_at)}
+        """
+        now = now or timezone.now()
+        earned = {}
+
+        # اولین تکمیل هر کیس (تکمیل دوباره یک کیس شمرده نمی‌شود)
+        first_completion = {}
+        for case_id, category_id, is_published, completed_at in timeline:
+            if case_id not in first_completion:
+                first_completion[case_id] = (category_id, is_published, completed_at)
+        completions = list(first_completion.values())
+
+        for target, code, title, description, icon in cls.MILESTONE_RULES:
+            if len(completions) >= target:
+                earned[code] = {
+                    'title': title,
+                    'description': description,
+                    'icon': icon,
+                    'awarded_at': completions[target - 1][2] or now,
+                }
+
+        for target, code, title, description, icon in cls.ACCURACY_RULES:
+            if accuracy >= target:
+                earned[code] = {
+                    'title': title,
+                    'description': description,
+                    'icon': icon,
+                    'awarded_at': now,
+                }
+
+        # دسته‌بندی کامل: همه کیس‌های منتشر شده دسته تکمیل شده باشند
+        completed_by_category = {}
+        for category_id, is_published, completed_at in completions:
+            if category_id is not None and is_published:
+                completed_by_category.setdefault(category_id, []).append(completed_at)
+        for category_id, dates in completed_by_category.items():
+            name, total = category_totals.get(category_id, (None, 0))
+            if total and len(dates) >= total:
+                earned[cls.CATEGORY_CODE.format(category_id=category_id)] = {
+                    'title': f'متخصص {name}',
+                    'description': f'همه کیس‌های {name} را تکمیل کردید',
+                    'icon': '🏅',
+                    'awarded_at': max((d for d in dates if d), default=now),
+                }
+
+        return earned
+
+    @classmethod
+    def evaluate(cls, user_id):
+        """
+        ارزیابی و ذخیره دستاوردهای جدید کاربر
+
+        Returns:
+            int: تعداد دستاوردهای جدید
+        """
+        from apps.courses.models import Case, UserAchievement, UserProfile
+
+        profile = UserProfile.objects.filter(user_id=user_id).first()
+        accuracy = profile.overall_accuracy if profile else 0
+
+        timeline = cls.load_timeline(user_id)
+        category_ids = {row[1] for row in timeline if row[1] is not None and row[2]}
+        category_totals = {}
+        if category_ids:
+            rows = Case.objects.filter(is_published=True, category_id__in=category_ids).values(
+                'category_id', 'category__name'
+            ).annotate(total=Count('id')).order_by()
+            category_totals = {
+                row['category_id']: (row['category__name'], row['total']) for row in rows
+            }
+
+        earned = cls.evaluate_rules(timeline, accuracy, category_totals)
+        existing = set(UserAchievement.objects.filter(user_id=user_id).values_list('code', flat=True))
+        new_achievements = [
+            UserAchievement(user_id=user_id, code=code, **data)
+            for code, data in earned.items()
+            if code not in existing
+        ]
+        if new_achievements:
+            UserAchievement.objects.bulk_create(new_achievements, ignore_conflicts=True)
+        return len(new_achievements)
+
+    @classmethod
+    def for_user(cls, user, profile):
+        """
+        داده صفحه دستاوردها: دستاوردهای ذخیره شده به همراه دستاوردهای در انتظار
+
+        Args:
+            user: کاربر
+            profile: UserProfile کاربر (برای درصد پیشرفت دستاوردهای کسب نشده)
+
+        Returns:
+            list: dict هایی با کلیدهای title, description, icon, earned, date / progress, target
+        """
+        from apps.courses.models import UserAchievement
+
+        awarded = list(UserAchievement.objects.filter(user=user))
+        if not awarded and profile.total_cases_completed:
+            # کاربرانی که پیش از ذخیره دستاوردها کیس تکمیل کرده‌اند
+            if cls.evaluate(user.id):
+                awarded = list(UserAchievement.objects.filter(user=user))
+
+        achievements = [
+            {
+                'title': achievement.title,
+                'description': achievement.description,
+                'icon': achievement.icon,
+                'earned': True,
+                'date': achievement.awarded_at,
+            }
+            for achievement in awarded
+        ]
+
+        awarded_codes = {achievement.code for achievement in awarded}
+        pending_rules = [
+            (target, code, title, icon, profile.total_cases_completed)
+            for target, code, title, description, icon in cls.MILESTONE_RULES
+        ] + [
+            (target, code, title, icon, profile.overall_accuracy)
+            for target, code, title, description, icon in cls.ACCURACY_RULES
+        ]
+        for target, code, title, icon, progress in pending_rules:
+            if code in cls.PENDING_CODES and code not in awarded_codes:
+                achievements.append({
+                    'title': title,
+                    'description': cls.PENDING_CODES[code],
+                    'icon': icon,
+                    'earned': False,
+                    'progress': progress,
+                    'target': target,
+                })
+
+        return achievements
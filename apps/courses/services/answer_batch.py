@@ -0,0 +1,179 @@
+"""
+سرویس ثبت دسته‌ای مشاهدات (پاسخ‌های) کاربر برای یک کیس
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .case_payload import CasePayloadBuilder
+
+
+class AnswerBatchError(Exception):
+    """خطای ثبت دسته پاسخ (همراه با کد وضعیت HTTP)"""
+
+    def __init__(self, message, status=400, errors=None):
+        super().__init__(message)
+        self.status = status
+        self.errors = errors or []
+
+
+class AnswerBatch:
+    """
+    اعتبارسنجی و ذخیره مشاهدات یک بار حل کیس با یک bulk_create
+
+    درستی هر مشاهده از روی کلید پاسخ (داده کش شده CasePayloadBuilder) تعیین می‌شود
+    و به مقدار ارسالی کاربر اعتماد نمی‌شود. نتیجه هر دسته با کلید idempotency
+    کاربر در کش نگهداری می‌شود تا ارسال دوباره (retry شبکه موبایل) رکورد تکراری نسازد.
+
+    Example:
+        result = AnswerBatch.ingest(request.user, case_id, [
+            {'test': 'cbc', 'observation': 'Anemia'},
+        ], idempotency_key='6f1c...')
+    """
+
+    OBSERVATION_TEST_TYPE = 'OBSERVATION'
+    IDEMPOTENCY_KEY = 'answer_batch:{user_id}:{key}'
+    PENDING = 'pending'
+    # مدت قفل دسته در حال پردازش (ثانیه)
+    PENDING_TIMEOUT = 60
+    MAX_KEY_LENGTH = 100
+
+    @classmethod
+    def get_max_items(cls):
+        return getattr(settings, 'ANSWER_BATCH_MAX_ITEMS', 200)
+
+    @classmethod
+    def get_idempotency_timeout(cls):
+        """مدت نگهداری نتیجه هر دسته برای پاسخ به ارسال دوباره (ثانیه)"""
+        return getattr(settings, 'ANSWER_BATCH_IDEMPOTENCY_TIMEOUT', 60 * 60 * 24)
+
+    @classmethod
+    def get_answer_key(cls, case_id):
+        """
+        کلید پاسخ کیس از داده کش شده صفحه کیس
+
+        Returns:
+            dict: {عنوان تست: (set گزینه‌ها، set گزینه‌های صحیح)} یا None
+        """
+        payload = CasePayloadBuilder.get(case_id)
+        if payload is None:
+            return None
+        return {
+            test['title']: (set(test['observations']), set(test['correct_observations']))
+            for test in payload['tests']
+        }
+
+    @classmethod
+    def validate(cls, answer_key, observations):
+        """
+        بررسی مشاهدات ارسالی با کلید پاسخ
+
+        Returns:
+            list: (عنوان تست، متن مشاهده، is_correct)
+
+        Raises:
+            AnswerBatchError: در صورت وجود مشاهده نامعتبر (هیچ موردی ذخیره نمی‌شود)
+        """
+        if not isinstance(observations, list) or not observations:
+            raise AnswerBatchError('observations must be a non-empty list')
+        if len(observations) > cls.get_max_items():
+            raise AnswerBatchError(f'Too many observations (max {cls.get_max_items()})')
+
+        rows = []
+        errors = []
+        seen = set()
+        for index, item in enumerate(observations):
+            if not isinstance(item, dict):
+                errors.append({'index': index, 'error': 'Invalid observation'})
+                continue
+            test = str(item.get('test') or '').strip()
+            text = str(item.get('observation') or item.get('observation_text') or '').strip()
+
+            if test not in answer_key:
+                errors.append({'index': index, 'error': f'Unknown test: {test}'})
+                continue
+            options, correct = answer_key[test]
+            if text not in options:
+                errors.append({'index': index, 'error': f'Unknown observation: {text}'})
+                continue
+
+            # تکرار یک مشاهده در همان دسته فقط یک بار ذخیره می‌شود
+            if (test, text) in seen:
+                continue
+            seen.add((test, text))
+            rows.append((test, text, text in correct))
+
+        if errors:
+            raise AnswerBatchError('Invalid observations', errors=errors)
+        return rows
+
+    @classmethod
+    def ingest(cls, user, case_id, observations, idempotency_key):
+        """
+        ثبت دسته مشاهدات کاربر
+
+        Returns:
+            dict: status, saved, correct, replayed
+
+        Raises:
+            AnswerBatchError
+        """
+        idempotency_key = (idempotency_key or '').strip()
+        if not idempotency_key or len(idempotency_key) > cls.MAX_KEY_LENGTH:
+            raise AnswerBatchError('A valid idempotency key is required')
+
+        cache_key = cls.IDEMPOTENCY_KEY.format(user_id=user.pk, key=idempotency_key)
+        previous = cache.get(cache_key)
+        if isinstance(previous, dict):
+            return dict(previous, replayed=True)
+
+        # قفل دسته؛ ارسال هم‌زمان همان دسته منتظر پایان ارسال اول می‌ماند
+        if not cache.add(cache_key, cls.PENDING, cls.PENDING_TIMEOUT):
+            raise AnswerBatchError('This batch is already being processed', status=409)
+
+        try:
+            answer_key = cls.get_answer_key(case_id)
+            if answer_key is None:
+                raise AnswerBatchError('Case not found', status=404)
+            rows = cls.validate(answer_key, observations)
+            result = cls._save(user, case_id, rows)
+        except Exception:
+            cache.delete(cache_key)
+            raise
+
+        cache.set(cache_key, result, cls.get_idempotency_timeout())
+        return dict(result, replayed=False)
+
+    @classmethod
+    def _save(cls, user, case_id, rows):
+        from apps.courses.models import LabTest, UserObservation
+
+        with transaction.atomic():
+            observation_test, _ = LabTest.objects.get_or_create(
+                case_id=case_id,
+                lab_type=cls.OBSERVATION_TEST_TYPE,
+                defaults={
+                    'lab_name': 'User Observation',
+                    'lab_result': 'N/A',
+                    'normal_range': 'N/A'
+                }
+            )
+            UserObservation.objects.bulk_create([
+                UserObservation(
+                    user=user,
+                    case_id=case_id,
+                    case_test=observation_test,
+                    observation_text=text,
+                    is_correct=is_correct,
+                )
+                for test, text, is_correct in rows
+            ])
+
+        # bulk_create سیگنال post_save را اجرا نمی‌کند
+        CasePayloadBuilder.invalidate(case_id)
+
+        return {
+            'status': 'success',
+            'saved': len(rows),
+            'correct': sum(1 for row in rows if row[2]),
+        }
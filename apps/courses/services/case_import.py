@@ -0,0 +1,400 @@
+"""
+سرویس ایمپورت جریانی (streaming) کیس‌ها از فایل اکسل یا CSV
+
+فایل ردیف به ردیف خوانده می‌شود و کیس‌ها به همراه تست‌ها، اسلایدها و گزینه‌های
+پیش‌فرض در دسته‌های جداگانه (هر دسته در یک تراکنش) ذخیره می‌شوند؛ بنابراین مصرف
+حافظه به اندازه فایل وابسته نیست.
+
+قالب فایل:
+    هر ردیف یک کیس است مگر اینکه ستون record_type برابر lab_test یا slide باشد.
+    ردیف‌های فرزند (lab_test / slide) به آخرین کیس قبل از خود تعلق دارند.
+
+    ستون‌های کیس: title, history, correct_diagnosis, explanation
+                   (اختیاری: summary, slug, category, sub_category, is_published)
+    ستون‌های تست: lab_type, lab_name, normal_range, lab_result, order_index
+    ستون‌های اسلاید: image, slide_title, slide_description, order_index
+"""
+import csv
+import time
+import logging
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class CaseImportError(Exception):
+    """خطای غیرقابل ادامه در فرآیند ایمپورت"""
+    pass
+
+
+class CaseImporter:
+    """
+    ایمپورت دسته‌ای کیس‌ها با خواندن جریانی فایل
+
+    Example:
+        importer = CaseImporter(batch_size=500, start_row=1200)
+        result = importer.run('cases.xlsx', on_chunk=print)
+    """
+
+    REQUIRED_COLUMNS = ['title', 'history', 'correct_diagnosis', 'explanation']
+    CASE_TYPE = 'case'
+    LAB_TEST_TYPE = 'lab_test'
+    SLIDE_TYPE = 'slide'
+    TRUE_VALUES = {'1', 'true', 'yes', 'y', 'بله'}
+
+    def __init__(self, batch_size=1000, start_row=0, dry_run=False,
+                 seed_defaults=True, default_category=None):
+        """
+        Args:
+            batch_size: تعداد کیس‌ها در هر دسته
+            start_row: شماره آخرین ردیف ذخیره شده (checkpoint)؛ ردیف‌های قبل از آن رد می‌شوند
+            dry_run: فقط خواندن و اعتبارسنجی، بدون ذخیره
+            seed_defaults: ایجاد تست‌ها و گزینه‌های پیش‌فرض (مانند سیگنال post_save کیس)
+            default_category: دسته‌بندی کیس‌هایی که ستون category ندارند
+        """
+        self.batch_size = max(1, batch_size)
+        self.start_row = start_row or 0
+        self.dry_run = dry_run
+        self.seed_defaults = seed_defaults
+        self.default_category = default_category
+        self._categories = None
+        self._subcategories = None
+
+    # ------------------------------------------------------------------
+    # خواندن فایل
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def iter_rows(cls, source, file_name=None):
+        """
+        خواندن جریانی ردیف‌ها
+
+        Args:
+            source: مسیر فایل یا شیء فایل (مثلاً UploadedFile)
+            file_name: نام فایل برای تشخیص فرمت (در صورت شیء فایل)
+
+        Yields:
+            tuple: (شماره ردیف در فایل، dict ستون‌ها)
+        """
+        name = (file_name or getattr(source, 'name', None) or str(source)).lower()
+        if name.endswith('.xlsx'):
+            yield from cls._iter_xlsx(source)
+        elif name.endswith('.csv'):
+            yield from cls._iter_csv(source)
+        else:
+            raise CaseImportError('فقط فایل‌های .xlsx و .csv پشتیبانی می‌شوند.')
+
+    @staticmethod
+    def _iter_xlsx(source):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(source, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            columns = [str(col).strip().lower() if col is not None else '' for col in header]
+            for row_number, values in enumerate(rows, start=2):
+                yield row_number, dict(zip(columns, values))
+        finally:
+            workbook.close()
+
+    @staticmethod
+    def _iter_csv(source):
+        import io
+
+        if isinstance(source, str):
+            handle = open(source, newline='', encoding='utf-8-sig')
+        else:
+            handle = io.TextIOWrapper(getattr(source, 'file', source), encoding='utf-8-sig', newline='')
+        try:
+            reader = csv.reader(handle)
+            header = next(reader, None)
+            if header is None:
+                return
+            columns = [col.strip().lower() for col in header]
+            for row_number, values in enumerate(reader, start=2):
+                yield row_number, dict(zip(columns, values))
+        finally:
+            if isinstance(source, str):
+                handle.close()
+            else:
+                handle.detach()
+
+    # ------------------------------------------------------------------
+    # تبدیل ردیف‌ها
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _text(row, column):
+        value = row.get(column)
+        if value is None:
+            return ''
+        return str(value).strip()
+
+    @classmethod
+    def _int(cls, row, column, default=0):
+        value = cls._text(row, column)
+        try:
+            return int(float(value)) if value else default
+        except ValueError:
+            return default
+
+    def _load_lookups(self):
+        """بارگذاری یکباره دسته‌بندی‌ها و زیردسته‌ها در حافظه"""
+        from apps.courses.models import CaseCategory, SubCategory
+
+        self._categories = {}
+        for category in CaseCategory.objects.only('id', 'name', 'slug'):
+            self._categories[category.name.strip().lower()] = category
+            if category.slug:
+                self._categories.setdefault(category.slug.strip().lower(), category)
+
+        self._subcategories = {}
+        for sub in SubCategory.objects.only('id', 'category_id', 'name', 'slug'):
+            self._subcategories[(sub.category_id, sub.name.strip().lower())] = sub
+            if sub.slug:
+                self._subcategories.setdefault((sub.category_id, sub.slug.strip().lower()), sub)
+
+    def resolve_category(self, name):
+        """پیدا کردن (یا ایجاد) دسته‌بندی بر اساس نام یا slug"""
+        from apps.courses.models import CaseCategory
+
+        if not name:
+            return self.default_category
+        key = name.lower()
+        category = self._categories.get(key)
+        if category is None and not self.dry_run:
+            category = CaseCategory.objects.create(name=name)
+            self._categories[key] = category
+        return category
+
+    def resolve_subcategory(self, category, name):
+        """پیدا کردن (یا ایجاد) زیردسته‌بندی در یک دسته‌بندی"""
+        from apps.courses.models import SubCategory
+
+        if not name or category is None or category.pk is None:
+            return None
+        key = (category.pk, name.lower())
+        sub = self._subcategories.get(key)
+        if sub is None and not self.dry_run:
+            sub = SubCategory.objects.create(category=category, name=name)
+            self._subcategories[key] = sub
+        return sub
+
+    def build_case(self, row):
+        """ساخت شیء Case (بدون ذخیره) از یک ردیف"""
+        from apps.courses.models import Case
+
+        values = {column: self._text(row, column) for column in self.REQUIRED_COLUMNS}
+        missing = [column for column, value in values.items() if not value]
+        if missing:
+            raise ValueError(f'ستون‌های خالی: {", ".join(missing)}')
+
+        category = self.resolve_category(self._text(row, 'category'))
+        return Case(
+            category=category,
+            sub_category=self.resolve_subcategory(category, self._text(row, 'sub_category')),
+            slug=self._text(row, 'slug') or None,
+            summary=self._text(row, 'summary') or None,
+            is_published=self._text(row, 'is_published').lower() in self.TRUE_VALUES,
+            **values
+        )
+
+    def build_lab_test(self, row):
+        """ساخت شیء LabTest (بدون کیس) از یک ردیف فرزند"""
+        from apps.courses.models import LabTest
+
+        lab_type = self._text(row, 'lab_type').upper()
+        if not lab_type:
+            raise ValueError('ستون lab_type خالی است')
+        return LabTest(
+            lab_type=lab_type,
+            lab_name=self._text(row, 'lab_name'),
+            normal_range=self._text(row, 'normal_range'),
+            lab_result=self._text(row, 'lab_result'),
+            order_index=self._int(row, 'order_index'),
+        )
+
+    def build_slide(self, row):
+        """ساخت شیء Slide (بدون کیس) از یک ردیف فرزند"""
+        from apps.courses.models import Slide
+
+        image = self._text(row, 'image')
+        if not image:
+            raise ValueError('ستون image خالی است')
+        return Slide(
+            image=image,
+            title=self._text(row, 'slide_title') or None,
+            description=self._text(row, 'slide_description') or None,
+            order_index=self._int(row, 'order_index'),
+        )
+
+    # ------------------------------------------------------------------
+    # ذخیره دسته‌ها
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _assign_case_ids(cases, max_id_before):
+        """
+        تعیین pk کیس‌ها در دیتابیس‌هایی که bulk_create شناسه برنمی‌گرداند (MySQL)
+
+        کیس‌های یک INSERT چندردیفی به ترتیب شناسه خوانده و با عنوان تطبیق داده می‌شوند.
+        """
+        from apps.courses.models import Case
+
+        rows = list(
+            Case.objects.filter(id__gt=max_id_before).order_by('id').values_list('id', 'title')[:len(cases)]
+        )
+        if len(rows) != len(cases) or any(title != case.title for (_, title), case in zip(rows, cases)):
+            raise CaseImportError('امکان تطبیق شناسه کیس‌های ایجاد شده وجود ندارد.')
+        for (case_id, _), case in zip(rows, cases):
+            case.pk = case_id
+
+    def save_chunk(self, chunk):
+        """
+        ذخیره یک دسته کیس به همراه فرزندان آن‌ها در یک تراکنش
+
+        Args:
+            chunk: لیست (case, lab_tests, slides)
+
+        Returns:
+            dict: تعداد ردیف‌های ایجاد شده از هر نوع
+        """
+        from apps.courses.models import Case, LabTest, Slide, seed_default_lab_tests
+        from .catalog import CatalogGeneration
+
+        cases = [case for case, _, _ in chunk]
+        with transaction.atomic():
+            if connection.features.can_return_rows_from_bulk_insert:
+                Case.objects.bulk_create(cases)
+            else:
+                max_id_before = Case.objects.order_by('-id').values_list('id', flat=True).first() or 0
+                Case.objects.bulk_create(cases)
+                self._assign_case_ids(cases, max_id_before)
+
+            lab_tests, slides = [], []
+            for case, case_lab_tests, case_slides in chunk:
+                for lab_test in case_lab_tests:
+                    lab_test.case = case
+                    lab_tests.append(lab_test)
+                for slide in case_slides:
+                    slide.case = case
+                    slides.append(slide)
+
+            LabTest.objects.bulk_create(lab_tests, batch_size=self.batch_size)
+            Slide.objects.bulk_create(slides, batch_size=self.batch_size)
+
+            defaults = (0, 0)
+            if self.seed_defaults:
+                defaults = seed_default_lab_tests(cases, batch_size=self.batch_size)
+
+            # bulk_create سیگنال post_save نمی‌فرستد
+            CatalogGeneration.bump()
+
+        return {
+            'cases': len(cases),
+            'lab_tests': len(lab_tests) + defaults[0],
+            'slides': len(slides),
+            'observations': defaults[1],
+        }
+
+    # ------------------------------------------------------------------
+    # اجرا
+    # ------------------------------------------------------------------
+
+    def run(self, source, file_name=None, on_chunk=None, on_error=None):
+        """
+        اجرای ایمپورت
+
+        Args:
+            source: مسیر فایل یا شیء فایل
+            file_name: نام فایل (برای شیء فایل بدون name)
+            on_chunk: تابعی که بعد از ذخیره هر دسته با dict وضعیت صدا زده می‌شود
+            on_error: تابعی که برای ردیف‌های نامعتبر با (شماره ردیف، پیام خطا) صدا زده می‌شود
+
+        Returns:
+            dict: آمار کل (cases, lab_tests, slides, observations, skipped, checkpoint, rows_per_second)
+        """
+        self._load_lookups()
+
+        totals = {'cases': 0, 'lab_tests': 0, 'slides': 0, 'observations': 0, 'skipped': 0}
+        started = time.monotonic()
+        rows_read = 0
+        checkpoint = self.start_row
+        chunk = []
+        current = None
+        last_row = self.start_row
+        header_checked = False
+
+        def report_error(row_number, message):
+            totals['skipped'] += 1
+            if on_error:
+                on_error(row_number, message)
+
+        def flush():
+            nonlocal chunk, checkpoint
+            if chunk and not self.dry_run:
+                for key, value in self.save_chunk(chunk).items():
+                    totals[key] += value
+            elif chunk:
+                totals['cases'] += len(chunk)
+                totals['lab_tests'] += sum(len(item[1]) for item in chunk)
+                totals['slides'] += sum(len(item[2]) for item in chunk)
+            chunk = []
+            checkpoint = last_row
+            if on_chunk:
+                on_chunk(self._status(totals, checkpoint, rows_read, started))
+
+        for row_number, row in self.iter_rows(source, file_name):
+            if not header_checked:
+                missing = [column for column in self.REQUIRED_COLUMNS if column not in row]
+                if missing:
+                    raise CaseImportError(f'ستون‌های زیر در فایل موجود نیست: {", ".join(missing)}')
+                header_checked = True
+
+            if row_number <= self.start_row:
+                continue
+            if not any(value not in (None, '') for value in row.values()):
+                continue
+
+            rows_read += 1
+            record_type = self._text(row, 'record_type').lower() or self.CASE_TYPE
+            try:
+                if record_type == self.CASE_TYPE:
+                    # دسته فقط در مرز کیس‌ها بسته می‌شود تا فرزندان از کیس خود جدا نشوند
+                    if len(chunk) >= self.batch_size:
+                        flush()
+                    current = (self.build_case(row), [], [])
+                    chunk.append(current)
+                elif current is None:
+                    raise ValueError('ردیف فرزند بدون کیس معتبر قبلی')
+                elif record_type == self.LAB_TEST_TYPE:
+                    current[1].append(self.build_lab_test(row))
+                elif record_type == self.SLIDE_TYPE:
+                    current[2].append(self.build_slide(row))
+                else:
+                    raise ValueError(f'نوع ردیف نامعتبر: {record_type}')
+            except (ValueError, TypeError) as e:
+                if record_type == self.CASE_TYPE:
+                    # فرزندان کیس نامعتبر هم رد می‌شوند
+                    current = None
+                report_error(row_number, str(e))
+            last_row = row_number
+
+        if chunk:
+            flush()
+
+        return self._status(totals, checkpoint, rows_read, started)
+
+    @staticmethod
+    def _status(totals, checkpoint, rows_read, started):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        return dict(
+            totals,
+            checkpoint=checkpoint,
+            rows=rows_read,
+            elapsed=elapsed,
+            rows_per_second=rows_read / elapsed,
+        )
@@ -0,0 +1,274 @@
+"""
+سرویس ساخت و کش داده‌های صفحه نمایش کیس (case player)
+"""
+import time
+import hashlib
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+
+class CasePayloadBuilder:
+    """
+    ساخت داده‌های کامل یک کیس (تست‌ها، گزینه‌ها، پاسخ‌های صحیح و اسلایدها)
+    با تعداد ثابتی query و نگهداری نتیجه در کش
+
+    کلید کش شامل نسخه کیس و نسخه گزینه‌های پیش‌فرض است؛ با ذخیره
+    Case, LabTest, Slide یا UserObservation نسخه افزایش پیدا می‌کند.
+    """
+
+    PAYLOAD_KEY = 'case_payload:{case_id}:{version}:{defaults_version}'
+    VERSION_KEY = 'case_payload_version:{case_id}'
+    DEFAULTS_VERSION_KEY = 'case_payload_defaults_version'
+
+    # گزینه‌های CBC از تست سراسری CBC_DEFAULT خوانده می‌شوند
+    GLOBAL_DEFAULT_TYPE = 'CBC_DEFAULT'
+    DEFAULT_TEST_TYPES = ['CBC_DEFAULT', 'CHEM_DEFAULT', 'MORPHO_DEFAULT']
+
+    CASE_FIELDS = (
+        'id', 'title', 'history', 'summary', 'correct_diagnosis', 'explanation',
+        'category_id', 'sub_category_id', 'is_published', 'updated_at',
+    )
+
+    @classmethod
+    def get_timeout(cls):
+        """مدت نگهداری داده در کش (ثانیه)"""
+        return getattr(settings, 'CASE_PAYLOAD_CACHE_TIMEOUT', 60 * 60)
+
+    @staticmethod
+    def _read_version(key):
+        """خواندن نسخه فعلی؛ در صورت نبود، مقدار یکتای جدید ساخته می‌شود"""
+        version = cache.get(key)
+        if version is None:
+            # استفاده از زمان به جای 1 تا بعد از evict شدن کلید نسخه، داده قدیمی دوباره خوانده نشود
+            cache.add(key, int(time.time() * 1000), None)
+            version = cache.get(key, 0)
+        return version
+
+    @staticmethod
+    def _bump_version(key):
+        """افزایش نسخه برای باطل کردن داده‌های کش شده"""
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, int(time.time() * 1000), None)
+
+    @classmethod
+    def get_cache_key(cls, case_id):
+        """ساخت کلید کش بر اساس نسخه کیس و نسخه گزینه‌های پیش‌فرض"""
+        return cls.PAYLOAD_KEY.format(
+            case_id=case_id,
+            version=cls._read_version(cls.VERSION_KEY.format(case_id=case_id)),
+            defaults_version=cls._read_version(cls.DEFAULTS_VERSION_KEY),
+        )
+
+    @classmethod
+    def invalidate(cls, case_id):
+        """باطل کردن داده کش شده یک کیس"""
+        if case_id:
+            cls._bump_version(cls.VERSION_KEY.format(case_id=case_id))
+
+    @classmethod
+    def invalidate_defaults(cls):
+        """باطل کردن داده همه کیس‌ها (تغییر در گزینه‌های پیش‌فرض سراسری)"""
+        cls._bump_version(cls.DEFAULTS_VERSION_KEY)
+
+    @classmethod
+    def invalidate_for_observations(cls, queryset):
+        """
+        باطل کردن داده کیس‌های مرتبط با مجموعه‌ای از گزینه‌ها
+
+        برای queryset.update() که سیگنال post_save را اجرا نمی‌کند.
+        """
+        rows = queryset.values_list('case_id', 'case_test__case_id', 'case_test__lab_type').distinct()
+        for case_id, test_case_id, lab_type in rows:
+            cls.invalidate(case_id)
+            cls.invalidate(test_case_id)
+            if lab_type == cls.GLOBAL_DEFAULT_TYPE:
+                cls.invalidate_defaults()
+
+    @classmethod
+    def get(cls, case_id):
+        """
+        دریافت داده کیس از کش یا ساخت آن
+
+        Args:
+            case_id: شناسه کیس
+
+        Returns:
+            dict: {'case': {...}, 'tests': [...], 'etag': str, 'last_modified': datetime}
+                  یا None اگر کیس وجود نداشته باشد
+        """
+        cache_key = cls.get_cache_key(case_id)
+        payload = cache.get(cache_key)
+        if payload is not None:
+            return payload
+
+        payload = cls.build(case_id)
+        if payload is not None:
+            cache.set(cache_key, payload, cls.get_timeout())
+        return payload
+
+    @classmethod
+    def build(cls, case_id):
+        """
+        ساخت داده کامل کیس با 4 query ثابت (کیس، تست‌ها، گزینه‌ها، اسلایدها)
+
+        Args:
+            case_id: شناسه کیس
+
+        Returns:
+            dict یا None
+        """
+        from apps.courses.models import Case, LabTest, Slide, UserObservation
+
+        case = Case.objects.filter(pk=case_id).values(*cls.CASE_FIELDS).first()
+        if case is None:
+            return None
+
+        lab_tests = list(LabTest.objects.filter(case_id=case_id).order_by('id'))
+        lab_test_ids = {lt.id for lt in lab_tests}
+
+        options = UserObservation.objects.filter(
+            Q(case_test_id__in=lab_test_ids) | Q(case_test__lab_type=cls.GLOBAL_DEFAULT_TYPE)
+        ).values_list('case_test_id', 'case_test__lab_type', 'observation_text', 'is_correct').order_by('id')
+
+        # گروه‌بندی گزینه‌ها بر اساس تست
+        observations_by_test = {}
+        global_default = {'observations': [], 'correct_observations': []}
+        for case_test_id, lab_type, text, is_correct in options:
+            if case_test_id in lab_test_ids:
+                bucket = observations_by_test.setdefault(
+                    case_test_id, {'observations': [], 'correct_observations': []}
+                )
+                bucket['observations'].append(text)
+                if is_correct:
+                    bucket['correct_observations'].append(text)
+            if lab_type == cls.GLOBAL_DEFAULT_TYPE:
+                global_default['observations'].append(text)
+                if is_correct:
+                    global_default['correct_observations'].append(text)
+
+        # اولین تست هر نوع (بدون حساسیت به حروف بزرگ و کوچک) مرجع گزینه‌های آن نوع است
+        first_test_by_type = {}
+        for lt in lab_tests:
+            first_test_by_type.setdefault(lt.lab_type.lower(), lt)
+
+        empty = {'observations': [], 'correct_observations': []}
+
+        # ساخت داده‌های جدول آزمایش به‌صورت گروهی
+        tests_map = {}
+        for lt in lab_tests:
+            key = lt.lab_type.lower()
+            if key not in tests_map:
+                if key == 'cbc':
+                    source = global_default
+                else:
+                    source = observations_by_test.get(first_test_by_type[key].id, empty)
+                tests_map[key] = {
+                    'title': key,
+                    'rows': [],
+                    'observations': list(source['observations']),
+                    'correct_observations': list(source['correct_observations']),
+                }
+
+            tests_map[key]['rows'].append({
+                'name': lt.lab_name,
+                'value': lt.lab_result,
+                'reference': lt.normal_range,
+                'report': lt.lab_result,
+            })
+
+        tests_data = list(tests_map.values())
+
+        # اضافه کردن تست‌های پیش‌فرض کیس (بدون row)
+        for default_type in cls.DEFAULT_TEST_TYPES:
+            test_title = default_type.lower().replace('_default', '')
+            if any(t.get('title') == test_title for t in tests_data):
+                continue
+            default_test = next((lt for lt in lab_tests if lt.lab_type == default_type), None)
+            if default_test:
+                source = observations_by_test.get(default_test.id, empty)
+                tests_data.append({
+                    'title': test_title,
+                    'rows': [],
+                    'observations': list(source['observations']),
+                    'correct_observations': list(source['correct_observations']),
+                })
+
+        # اسلایدها همگی از گزینه‌های تست SLIDE استفاده می‌کنند
+        slide_test = first_test_by_type.get('slide')
+        slide_source = observations_by_test.get(slide_test.id, empty) if slide_test else empty
+
+        slides_data = []
+        slides = list(Slide.objects.filter(case_id=case_id).order_by('order_index', 'id'))
+        for i, slide in enumerate(slides):
+            slides_data.append({
+                'title': f'slide_{i+1}',
+                'report': cls.render_slide_report(slide),
+                'observations': list(slide_source['observations']),
+                'correct_observations': list(slide_source['correct_observations']),
+            })
+
+        tests = tests_data + slides_data
+
+        # validator ها برای درخواست‌های شرطی: ETag از محتوای نهایی و Last-Modified از
+        # بیشترین updated_at کیس و فرزندان آن
+        timestamps = [case['updated_at']] + [lt.updated_at for lt in lab_tests] + [s.updated_at for s in slides]
+        content = repr((sorted(case.items()), tests)).encode('utf-8')
+
+        return {
+            'case': case,
+            'tests': tests,
+            'etag': hashlib.md5(content).hexdigest(),
+            'last_modified': max((t for t in timestamps if t), default=None),
+        }
+
+    @staticmethod
+    def render_slide_report(slide):
+        """ساخت HTML نمایش یک اسلاید"""
+        try:
+            if slide.image and slide.image.strip():
+                from .slide_images import SlideImageProcessor
+
+                # slide.image یک CharField است که نام فایل را ذخیره می‌کند
+                image_html = SlideImageProcessor.picture_html(
+                    slide.image,
+                    slide.title or 'Slide Image',
+                    style='max-width:100%; height:auto; border-radius:8px; box-shadow: 0 4px 8px rgba(0,0,0,0.1);',
+                    extra_attrs="onerror=\"this.parentNode.style.display='none'; "
+                                "this.parentNode.nextElementSibling.style.display='block';\"",
+                )
+                return f"""
+                <div style="text-align: center; margin-bottom: 1rem;">
+                    {image_html}
+                    <div style='display:none; background: #f0f0f0; padding: 20px; text-align: center; border-radius:8px;'>
+                        <i class='fas fa-image' style='font-size: 48px; color: #ccc;'></i><br>
+                        <p>تصویر یافت نشد: {slide.image}</p>
+                    </div>
+                </div>
+                <div style="background: #f8f9fa; padding: 1rem; border-radius: 8px; border-right: 4px solid #3ea66b;">
+                    <strong>عنوان:</strong> {slide.title or 'بدون عنوان'}<br><br>
+                    <strong>توضیحات:</strong> {slide.description or 'بدون توضیح'}
+                </div>
+                """
+            return f"""
+                <div style='background: #f0f0f0; padding: 20px; text-align: center; border-radius:8px;'>
+                    <i class='fas fa-image' style='font-size: 48px; color: #ccc;'></i><br><br>
+                    <strong>عنوان:</strong> {slide.title or 'بدون عنوان'}<br><br>
+                    <strong>توضیحات:</strong> {slide.description or 'بدون توضیح'}
+                </div>
+                """
+        except Exception as e:
+            logger.error(f"Error processing slide image: {e}")
+            return f"""
+            <div style='background: #f0f0f0; padding: 20px; text-align: center; border-radius:8px;'>
+                <i class='fas fa-image' style='font-size: 48px; color: #ccc;'></i><br><br>
+                <strong>خطا در نمایش تصویر:</strong> {str(e)}<br><br>
+                <strong>عنوان:</strong> {slide.title or 'بدون عنوان'}<br><br>
+                <strong>توضیحات:</strong> {slide.description or 'بدون توضیح'}
+            </div>
+            """
@@ -0,0 +1,163 @@
+"""
+سرویس جستجوی کیس‌ها
+
+روی PostgreSQL:
+- بردار جستجوی وزن‌دار (عنوان A، تشخیص B، پیشینه C، خلاصه D) با ایندکس GIN تابعی روی
+  همان عبارت؛ ستون جداگانه‌ای وجود ندارد و جدول روی MySQL/SQLite تغییری نمی‌کند.
+  پس از تغییر CASE_SEARCH_CONFIG باید rebuild_case_search اجرا شود تا ایندکس با
+  پیکربندی جدید ساخته شود (در غیر این صورت query ها از ایندکس استفاده نمی‌کنند)
+- رتبه‌بندی نتایج با SearchRank
+- جستجوی فازی trigram روی عنوان (pg_trgm، عملگر % با ایندکس gin_trgm_ops) برای
+  غلط‌های تایپی در همان query؛ آستانه با pg_trgm.similarity_threshold برای هر اتصال تنظیم می‌شود
+
+روی دیتابیس‌های دیگر (SQLite در توسعه) جستجو با icontains انجام می‌شود.
+"""
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q, F, Value, IntegerField, Case as CaseWhen, When
+
+
+class CaseSearch:
+    """جستجو و نگهداری ایندکس جستجوی کیس‌ها"""
+
+    INDEX_NAME = 'courses_case_search_idx'
+
+    # (فیلد، وزن)
+    VECTOR_FIELDS = [
+        ('title', 'A'),
+        ('correct_diagnosis', 'B'),
+        ('history', 'C'),
+        ('summary', 'D'),
+    ]
+
+    _trigram_available = None
+
+    @classmethod
+    def get_config(cls):
+        """پیکربندی متن PostgreSQL؛ simple برای متن فارسی/انگلیسی بدون ریشه‌یابی"""
+        return getattr(settings, 'CASE_SEARCH_CONFIG', 'simple')
+
+    @classmethod
+    def get_trigram_threshold(cls):
+        return getattr(settings, 'CASE_SEARCH_TRIGRAM_THRESHOLD', 0.2)
+
+    @classmethod
+    def configure_connection(cls, db_connection):
+        """تنظیم آستانه عملگر % برای یک اتصال جدید (گیرنده سیگنال connection_created)"""
+        if db_connection.vendor != 'postgresql':
+            return
+        with db_connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT set_config('pg_trgm.similarity_threshold', %s, false)",
+                [str(cls.get_trigram_threshold())]
+            )
+
+    @classmethod
+    def is_postgres(cls):
+        return connection.vendor == 'postgresql'
+
+    @classmethod
+    def trigram_available(cls):
+        """آیا افزونه pg_trgm نصب است؟ (یک بار در هر پروسه بررسی می‌شود)"""
+        if cls._trigram_available is None:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                cls._trigram_available = cursor.fetchone() is not None
+        return cls._trigram_available
+
+    @classmethod
+    def build_vector(cls):
+        """عبارت SearchVector وزن‌دار فیلدهای کیس"""
+        from django.contrib.postgres.search import SearchVector
+
+        config = cls.get_config()
+        vector = None
+        for field, weight in cls.VECTOR_FIELDS:
+            part = SearchVector(field, weight=weight, config=config)
+            vector = part if vector is None else vector + part
+        return vector
+
+    @classmethod
+    def build_index(cls):
+        """ایندکس GIN تابعی روی build_vector (عبارت باید با عبارت query ها یکسان باشد)"""
+        from django.contrib.postgres.indexes import GinIndex
+        return GinIndex(cls.build_vector(), name=cls.INDEX_NAME)
+
+    @classmethod
+    def rebuild_index(cls):
+        """
+        ساخت دوباره ایندکس جستجو با CASE_SEARCH_CONFIG فعلی
+
+        Returns:
+            bool: False روی دیتابیس‌های غیر PostgreSQL
+        """
+        if not cls.is_postgres():
+            return False
+        from apps.courses.models import Case
+
+        with connection.schema_editor() as schema_editor:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {cls.INDEX_NAME}')
+            schema_editor.add_index(Case, cls.build_index())
+        return True
+
+    @classmethod
+    def search(cls, queryset, query):
+        """
+        فیلتر و رتبه‌بندی queryset کیس‌ها بر اساس عبارت جستجو
+
+        Returns:
+            QuerySet: مرتب شده بر اساس rank (و سپس جدیدترین و id برای ترتیب پایدار صفحات)
+        """
+        query = (query or '').strip()
+        if not query:
+            return queryset
+        if cls.is_postgres():
+            return cls._search_postgres(queryset, query)
+        return cls._search_fallback(queryset, query)
+
+    @classmethod
+    def _matching_category_ids(cls, query):
+        from apps.courses.models import CaseCategory
+        return list(CaseCategory.objects.filter(name__icontains=query).values_list('id', flat=True))
+
+    @classmethod
+    def _search_postgres(cls, queryset, query):
+        from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+
+        search_query = SearchQuery(query, config=cls.get_config(), search_type='websearch')
+        # alias (نه annotate) تا بردار فقط در شرط و rank استفاده شود و در SELECT نیاید
+        queryset = queryset.alias(search_document=cls.build_vector())
+        condition = Q(search_document=search_query)
+        # دسته‌بندی‌ها جدول کوچکی هستند؛ شناسه‌ها جدا خوانده می‌شوند تا شرط OR از ایندکس استفاده کند
+        category_ids = cls._matching_category_ids(query)
+        if category_ids:
+            condition |= Q(category_id__in=category_ids)
+
+        rank = SearchRank(F('search_document'), search_query)
+
+        # عنوان‌های مشابه (غلط تایپی) با عملگر % که از ایندکس trigram استفاده می‌کند؛
+        # شباهت فقط برای مرتب‌سازی ردیف‌های پیدا شده محاسبه می‌شود
+        if cls.trigram_available():
+            condition |= Q(title__trigram_similar=query)
+            rank = rank + TrigramSimilarity('title', query)
+
+        return queryset.filter(condition).annotate(rank=rank).order_by('-rank', '-created_at', '-id')
+
+    @classmethod
+    def _search_fallback(cls, queryset, query):
+        """جستجوی ساده برای دیتابیس‌های غیر PostgreSQL"""
+        return queryset.filter(
+            Q(title__icontains=query) |
+            Q(correct_diagnosis__icontains=query) |
+            Q(history__icontains=query) |
+            Q(summary__icontains=query) |
+            Q(category__name__icontains=query)
+        ).annotate(
+            rank=CaseWhen(
+                When(title__icontains=query, then=Value(4)),
+                When(correct_diagnosis__icontains=query, then=Value(3)),
+                When(history__icontains=query, then=Value(2)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        ).order_by('-rank', '-created_at', '-id')
@@ -0,0 +1,76 @@
+"""
+کوئری وضعیت کیس‌ها برای یک کاربر (تکمیل شده، در حال انجام، شروع نشده)
+"""
+from django.db.models import Subquery, OuterRef, Value, BooleanField, IntegerField, Q
+from django.db.models.functions import Coalesce
+
+
+class UserCaseStatus:
+    """
+    افزودن وضعیت پیشرفت کاربر به queryset کیس‌ها با Subquery
+
+    به جای یک query برای هر کیس، پیشرفت کاربر در همان query کیس‌ها خوانده
+    می‌شود و فیلتر وضعیت هم در SQL اعمال می‌شود.
+    """
+
+    COMPLETED = 'completed'
+    IN_PROGRESS = 'in_progress'
+    NOT_STARTED = 'not_started'
+    STATUSES = (COMPLETED, IN_PROGRESS, NOT_STARTED)
+
+    @classmethod
+    def annotate(cls, queryset, user):
+        """
+        افزودن فیلدهای progress_id, is_completed, score, attempts, completed_at
+
+        Args:
+            queryset: queryset کیس‌ها
+            user: کاربر
+
+        Returns:
+            QuerySet
+        """
+        from apps.courses.models import UserProgress
+
+        # مانند .first() قدیمی: اولین رکورد پیشرفت کاربر برای هر کیس
+        progress = UserProgress.objects.filter(user=user, case=OuterRef('pk')).order_by('id')
+
+        return queryset.annotate(
+            progress_id=Subquery(progress.values('id')[:1]),
+            is_completed=Coalesce(
+                Subquery(progress.values('completed')[:1]), Value(False), output_field=BooleanField()
+            ),
+            score=Subquery(progress.values('score')[:1]),
+            attempts=Coalesce(
+                Subquery(progress.values('attempts')[:1]), Value(0), output_field=IntegerField()
+            ),
+            completed_at=Subquery(progress.values('completed_at')[:1]),
+        )
+
+    @classmethod
+    def filter_status(cls, queryset, status):
+        """اعمال فیلتر وضعیت روی queryset حاصل از annotate"""
+        if status == cls.COMPLETED:
+            return queryset.filter(is_completed=True)
+        if status == cls.IN_PROGRESS:
+            return queryset.filter(Q(is_completed=False) & Q(attempts__gt=0))
+        if status == cls.NOT_STARTED:
+            return queryset.filter(attempts=0)
+        return queryset
+
+    @classmethod
+    def for_user(cls, user, queryset=None, status=None):
+        """
+        queryset کیس‌های منتشر شده به همراه وضعیت کاربر
+
+        Args:
+            user: کاربر
+            queryset: queryset پایه (پیش‌فرض: کیس‌های منتشر شده)
+            status: یکی از STATUSES یا None برای همه
+        """
+        from apps.courses.models import Case
+
+        if queryset is None:
+            queryset = Case.objects.filter(is_published=True)
+        queryset = cls.annotate(queryset.select_related('category'), user)
+        return cls.filter_status(queryset, status)
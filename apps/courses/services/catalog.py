@@ -0,0 +1,372 @@
+"""
+سرویس‌های کش کاتالوگ کیس‌ها (دسته‌بندی‌ها و آمار آن‌ها)
+"""
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+class CatalogGeneration:
+    """
+    شمارنده نسل کاتالوگ
+
+    با هر تغییر Case, CaseCategory یا SubCategory افزایش پیدا می‌کند؛ داده‌های کش شده
+    کاتالوگ این مقدار را در کلید خود دارند و ETag پاسخ‌ها از آن ساخته می‌شود.
+    """
+
+    CACHE_KEY = 'catalog_generation'
+
+    @classmethod
+    def get(cls):
+        """نسل فعلی؛ در صورت نبود، مقدار یکتای جدید ساخته می‌شود"""
+        generation = cache.get(cls.CACHE_KEY)
+        if generation is None:
+            # استفاده از زمان به جای 1 تا بعد از evict شدن کلید، داده قدیمی دوباره خوانده نشود
+            cache.add(cls.CACHE_KEY, int(time.time() * 1000), None)
+            generation = cache.get(cls.CACHE_KEY, 0)
+        return generation
+
+    @classmethod
+    def bump(cls):
+        """باطل کردن همه داده‌های کش شده کاتالوگ"""
+        try:
+            cache.incr(cls.CACHE_KEY)
+        except ValueError:
+            cache.set(cls.CACHE_KEY, int(time.time() * 1000), None)
+
+
+class CaseStats:
+    """آمار تعداد کیس‌های هر دسته‌بندی (endpoint case_stats)"""
+
+    CACHE_KEY = 'case_stats:{generation}'
+
+    @classmethod
+    def get_timeout(cls):
+        """مدت نگهداری داده در کش (ثانیه)"""
+        return getattr(settings, 'CASE_STATS_CACHE_TIMEOUT', 60 * 60 * 24)
+
+    @classmethod
+    def get(cls):
+        """
+        دریافت آمار از کش یا محاسبه آن
+
+        Returns:
+            dict: generation, generated_at, data (total_cases, categories)
+        """
+        generation = CatalogGeneration.get()
+        cache_key = cls.CACHE_KEY.format(generation=generation)
+        stats = cache.get(cache_key)
+        if stats is None:
+            stats = {
+                'generation': generation,
+                'generated_at': timezone.now(),
+                'data': cls.build(),
+            }
+            cache.set(cache_key, stats, cls.get_timeout())
+        return stats
+
+    @classmethod
+    def build(cls):
+        """محاسبه آمار با یک query گروهی روی دسته‌بندی‌ها"""
+        from apps.courses.models import Case, CaseCategory
+
+        categories = list(
+            CaseCategory.objects.annotate(count=Count('cases')).values('id', 'name', 'slug', 'count')
+        )
+        return {
+            'total_cases': Case.objects.count(),
+            'categories': categories,
+        }
+
+
+class CatalogTree:
+    """
+    درخت دسته‌بندی ← زیردسته با تعداد کیس‌های منتشر شده
+
+    با یک query ساخته و با کلید نسل کاتالوگ در کش نگهداری می‌شود؛ همه صفحات
+    کاتالوگ (لیست کیس‌ها، صفحه دسته‌بندی‌ها، API زیردسته‌ها و ...) از آن می‌خوانند.
+    اعضای درخت dict هستند و در قالب‌ها مانند شیء مدل (category.name) خوانده می‌شوند.
+    """
+
+    CACHE_KEY = 'catalog_tree:{generation}'
+
+    @classmethod
+    def get_timeout(cls):
+        return getattr(settings, 'CATALOG_TREE_CACHE_TIMEOUT', 60 * 60 * 24)
+
+    @classmethod
+    def get(cls):
+        """
+        Returns:
+            dict: generation, categories (هر کدام با subcategories)
+        """
+        generation = CatalogGeneration.get()
+        cache_key = cls.CACHE_KEY.format(generation=generation)
+        tree = cache.get(cache_key)
+        if tree is None:
+            tree = {'generation': generation, 'categories': cls.build()}
+            cache.set(cache_key, tree, cls.get_timeout())
+        return tree
+
+    @classmethod
+    def build(cls):
+        """ساخت درخت با یک query (join دسته‌بندی و زیردسته، تعدادها با subquery)"""
+        from apps.courses.models import Case, CaseCategory
+
+        def published_count(**lookup):
+            return Coalesce(
+                Subquery(
+                    Case.objects.filter(is_published=True, **lookup).order_by()
+                    .values(*lookup).annotate(total=Count('id')).values('total'),
+                    output_field=IntegerField(),
+                ),
+                0,
+            )
+
+        rows = CaseCategory.objects.annotate(
+            category_case_count=published_count(category=OuterRef('pk')),
+            sub_case_count=published_count(sub_category=OuterRef('subcategories__id')),
+        ).order_by('name', 'subcategories__name', 'subcategories__id').values(
+            'id', 'name', 'slug', 'description', 'category_case_count',
+            'subcategories__id', 'subcategories__name', 'subcategories__slug',
+            'subcategories__description', 'sub_case_count',
+        )
+
+        categories = {}
+        for row in rows:
+            category = categories.get(row['id'])
+            if category is None:
+                category = categories[row['id']] = {
+                    'id': row['id'],
+                    'name': row['name'],
+                    'slug': row['slug'],
+                    'description': row['description'],
+                    'case_count': row['category_case_count'],
+                    'subcategory_count': 0,
+                    'subcategories': [],
+                }
+            if row['subcategories__id'] is None:
+                continue
+            category['subcategories'].append({
+                'id': row['subcategories__id'],
+                'name': row['subcategories__name'],
+                'slug': row['subcategories__slug'],
+                'description': row['subcategories__description'],
+                'case_count': row['sub_case_count'],
+                'category_id': category['id'],
+                'category': {'id': category['id'], 'name': category['name'], 'slug': category['slug']},
+            })
+            category['subcategory_count'] += 1
+        return list(categories.values())
+
+    @classmethod
+    def categories(cls):
+        """دسته‌بندی‌ها به ترتیب نام"""
+        return cls.get()['categories']
+
+    @classmethod
+    def find_category(cls, category_id=None, slug=None):
+        """دسته‌بندی با شناسه یا slug (یا None)"""
+        for category in cls.categories():
+            if (category_id is not None and str(category['id']) == str(category_id)) or \
+                    (slug is not None and category['slug'] == slug):
+                return category
+        return None
+
+    @classmethod
+    def subcategories(cls, category_id=None, search=None):
+        """
+        زیردسته‌ها به ترتیب نام
+
+        Args:
+            category_id: فقط زیردسته‌های این دسته‌بندی
+            search: فیلتر نام (بدون حساسیت به حروف بزرگ و کوچک)
+        """
+        result = []
+        for category in cls.categories():
+            if category_id is not None and str(category['id']) != str(category_id):
+                continue
+            result.extend(category['subcategories'])
+        if search:
+            search = search.lower()
+            result = [sub for sub in result if search in (sub['name'] or '').lower()]
+        return sorted(result, key=lambda sub: (sub['name'] or '', sub['id']))
+
+
+class CaseNavigation:
+    """
+    ترتیب کیس‌های منتشر شده برای دکمه‌های کیس قبلی/بعدی صفحه کیس
+
+    برای هر محدوده (همه کیس‌ها، هر دسته‌بندی و هر زیردسته) یک dict
+    {case_id: (prev_id, next_id)} در کش نگهداری می‌شود؛ کلید شامل نسل کاتالوگ است، پس
+    انتشار/عدم انتشار، جابجایی دسته‌بندی یا حذف کیس باعث ساخت دوباره آن می‌شود.
+    همه محدوده‌ها با یک query ساخته می‌شوند.
+    """
+
+    CACHE_KEY = 'case_navigation:{generation}:{scope}'
+    ALL_SCOPE = 'all'
+    # ترتیب پیمایش (همان ترتیب پیش‌فرض مدل Case)
+    ORDERING = ('id',)
+
+    @classmethod
+    def get_timeout(cls):
+        return getattr(settings, 'CASE_NAVIGATION_CACHE_TIMEOUT', 60 * 60 * 24)
+
+    @classmethod
+    def scope(cls, category_id=None, sub_category_id=None):
+        """نام محدوده ناوبری بر اساس فیلتر فعلی کاربر"""
+        if sub_category_id:
+            return f'subcategory:{sub_category_id}'
+        if category_id:
+            return f'category:{category_id}'
+        return cls.ALL_SCOPE
+
+    @classmethod
+    def neighbours(cls, case_id, category_id=None, sub_category_id=None):
+        """
+        کیس قبلی و بعدی در محدوده داده شده
+
+        Returns:
+            tuple: (prev_id, next_id)؛ برای کیس خارج از محدوده (None, None)
+        """
+        generation = CatalogGeneration.get()
+        scope = cls.scope(category_id, sub_category_id)
+        cache_key = cls.CACHE_KEY.format(generation=generation, scope=scope)
+        index = cache.get(cache_key)
+        if index is None:
+            index = cls.rebuild(generation).get(scope)
+            if index is None:
+                # محدوده بدون کیس منتشر شده؛ ذخیره تا هر درخواست دوباره ساخته نشود
+                index = {}
+                cache.set(cache_key, index, cls.get_timeout())
+        return index.get(int(case_id), (None, None))
+
+    @classmethod
+    def build(cls):
+        """
+        ساخت ترتیب همه محدوده‌ها با یک query
+
+        Returns:
+            dict: {scope: {case_id: (prev_id, next_id)}}
+        """
+        from apps.courses.models import Case
+
+        orders = {cls.ALL_SCOPE: []}
+        rows = Case.objects.filter(is_published=True).order_by(*cls.ORDERING).values_list(
+            'id', 'category_id', 'sub_category_id'
+        )
+        for case_id, category_id, sub_category_id in rows:
+            orders[cls.ALL_SCOPE].append(case_id)
+            if category_id:
+                orders.setdefault(cls.scope(category_id=category_id), []).append(case_id)
+            if sub_category_id:
+                orders.setdefault(cls.scope(sub_category_id=sub_category_id), []).append(case_id)
+
+        return {
+            scope: {
+                case_id: (ids[i - 1] if i > 0 else None, ids[i + 1] if i + 1 < len(ids) else None)
+                for i, case_id in enumerate(ids)
+            }
+            for scope, ids in orders.items()
+        }
+
+    @classmethod
+    def rebuild(cls, generation=None):
+        """ساخت و ذخیره همه محدوده‌ها در کش"""
+        if generation is None:
+            generation = CatalogGeneration.get()
+        indexes = cls.build()
+        cache.set_many(
+            {cls.CACHE_KEY.format(generation=generation, scope=scope): index for scope, index in indexes.items()},
+            cls.get_timeout(),
+        )
+        return indexes
+
+
+class CategoryLanding:
+    """
+    صفحه‌بندی keyset کیس‌های منتشر شده یک دسته‌بندی برای صفحات معرفی دسته‌بندی
+
+    فقط ستون‌های لازم برای کارت کیس خوانده می‌شوند (بدون history و explanation) و
+    تعداد تست‌ها و اسلایدها با subquery محاسبه می‌شود. HTML هر صفحه با کلید نسل
+    کاتالوگ در کش نگهداری می‌شود؛ cursor ها امضا می‌شوند تا فقط صفحات صادر شده توسط
+    سرور (و نه cursor های دلخواه کاربر) کلید کش بسازند.
+    """
+
+    LIST_FIELDS = ('id', 'title', 'summary', 'created_at', 'category_id')
+    ORDERING = ('-created_at', '-id')
+    FRAGMENT_KEY = 'category_landing:{generation}:{category_id}:{cursor}'
+    EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+    SIGNING_SALT = 'category_landing:{category_id}'
+
+    @classmethod
+    def get_page_size(cls):
+        return getattr(settings, 'CATEGORY_LANDING_PAGE_SIZE', 24)
+
+    @classmethod
+    def get_fragment_timeout(cls):
+        return getattr(settings, 'CATEGORY_LANDING_CACHE_TIMEOUT', 60 * 60)
+
+    @classmethod
+    def _epoch(cls):
+        # با USE_TZ=False مقادیر created_at بدون منطقه زمانی هستند
+        return cls.EPOCH if settings.USE_TZ else cls.EPOCH.replace(tzinfo=None)
+
+    @classmethod
+    def _signer(cls, category_id):
+        return signing.Signer(salt=cls.SIGNING_SALT.format(category_id=category_id))
+
+    @classmethod
+    def encode_cursor(cls, case):
+        """cursor امضا شده صفحه بعد از روی آخرین کیس صفحه: <created_at به میکروثانیه>-<id>"""
+        micros = (case.created_at - cls._epoch()) // timedelta(microseconds=1)
+        return cls._signer(case.category_id).sign(f'{micros}-{case.pk}')
+
+    @classmethod
+    def decode_cursor(cls, cursor, category_id):
+        """
+        Returns:
+            tuple: (created_at, id) یا None برای cursor نامعتبر یا امضا نشده
+        """
+        try:
+            value = cls._signer(category_id).unsign(cursor)
+            micros, case_id = (int(part) for part in value.split('-', 1))
+            created_at = cls._epoch() + timedelta(microseconds=micros)
+        except (signing.BadSignature, TypeError, ValueError, OverflowError):
+            return None
+        return created_at, case_id
+
+    @classmethod
+    def fragment_key(cls, category_id, cursor):
+        return cls.FRAGMENT_KEY.format(
+            generation=CatalogGeneration.get(), category_id=category_id, cursor=cursor or 'first'
+        )
+
+    @classmethod
+    def page(cls, category_id, cursor=None):
+        """
+        یک صفحه از کیس‌های دسته‌بندی
+
+        Returns:
+            dict: cases (لیست)، next_cursor (یا None)
+        """
+        from apps.courses.models import Case
+        from apps.courses.serializers import annotate_case_counts
+
+        queryset = Case.objects.filter(category_id=category_id, is_published=True).only(*cls.LIST_FIELDS)
+        position = cls.decode_cursor(cursor, category_id) if cursor else None
+        if position is not None:
+            created_at, case_id = position
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=case_id)
+            )
+
+        page_size = cls.get_page_size()
+        cases = list(annotate_case_counts(queryset.order_by(*cls.ORDERING))[:page_size + 1])
+        next_cursor = cls.encode_cursor(cases[page_size - 1]) if len(cases) > page_size else None
+        return {'cases': cases[:page_size], 'next_cursor': next_cursor}
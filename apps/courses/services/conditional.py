@@ -0,0 +1,55 @@
+"""
+ابزارهای درخواست شرطی (ETag / Last-Modified / 304)
+"""
+import hashlib
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+class ConditionalGet:
+    """
+    ساخت validator ها و پاسخ 304 برای view ها
+
+    view ابتدا validator را از داده کش شده می‌سازد، با not_modified بررسی می‌کند و
+    فقط در صورت تغییر، پاسخ را render کرده و با apply هدرها را تنظیم می‌کند.
+    """
+
+    @staticmethod
+    def make_etag(*parts):
+        """ETag قوی از روی اجزای داده شده"""
+        digest = hashlib.md5(':'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+        return f'"{digest}"'
+
+    @staticmethod
+    def not_modified(request, etag, last_modified=None):
+        """
+        Returns:
+            HttpResponseNotModified (با هدرهای validator) یا None
+        """
+        timestamp = last_modified.timestamp() if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is not None:
+            ConditionalGet.set_validators(response, etag, last_modified)
+        return response
+
+    @staticmethod
+    def set_validators(response, etag, last_modified=None):
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+
+    @classmethod
+    def apply(cls, response, etag, last_modified=None, private=True, max_age=0):
+        """
+        تنظیم validator ها و سیاست کش پاسخ
+
+        Args:
+            private: پاسخ وابسته به کاربر است (فقط در کش مرورگر)
+            max_age: مدت اعتبار بدون بررسی دوباره (0 یعنی بررسی در هر درخواست)
+        """
+        cls.set_validators(response, etag, last_modified)
+        if private:
+            patch_cache_control(response, private=True, no_cache=True, max_age=max_age)
+        else:
+            patch_cache_control(response, public=True, max_age=max_age)
+        return response
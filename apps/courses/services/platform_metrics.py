@@ -0,0 +1,153 @@
+"""
+سرویس snapshot آمار کلی پلتفرم (پنل ادمین و template tag ها)
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Avg, Q, F
+from django.utils import timezone
+
+
+class PlatformMetrics:
+    """
+    نگهداری همه شمارنده‌های پلتفرم در یک ورودی کش
+
+    snapshot با دستور refresh_platform_metrics (به‌صورت دوره‌ای) کامل محاسبه می‌شود
+    و بین دو اجرا، سیگنال‌های مدل‌ها شمارنده‌های ساده را به‌صورت تدریجی به‌روز می‌کنند.
+    """
+
+    CACHE_KEY = 'platform_metrics_snapshot'
+
+    COUNTER_FIELDS = (
+        'total_cases',
+        'total_users',
+        'total_categories',
+        'total_progress',
+        'completed_cases',
+        'active_users',
+        'new_students_this_month',
+        'monthly_completions',
+        'weekly_completions',
+    )
+
+    @classmethod
+    def get_timeout(cls):
+        """حداکثر عمر snapshot (ثانیه)؛ بعد از آن در اولین درخواست دوباره محاسبه می‌شود"""
+        return getattr(settings, 'PLATFORM_METRICS_TIMEOUT', 60 * 15)
+
+    @classmethod
+    def is_incremental(cls):
+        return getattr(settings, 'PLATFORM_METRICS_INCREMENTAL', True)
+
+    @classmethod
+    def get(cls):
+        """
+        دریافت snapshot با یک خواندن از کش (در صورت نبود، محاسبه می‌شود)
+
+        Returns:
+            dict: شمارنده‌ها به همراه category_stats, user_stats, average_accuracy, generated_at
+        """
+        snapshot = cache.get(cls.CACHE_KEY)
+        if snapshot is None:
+            snapshot = cls.refresh()
+        return snapshot
+
+    @classmethod
+    def refresh(cls):
+        """محاسبه کامل و ذخیره snapshot"""
+        snapshot = cls.compute()
+        cache.set(cls.CACHE_KEY, snapshot, cls.get_timeout())
+        return snapshot
+
+    @classmethod
+    def compute(cls):
+        """محاسبه همه آمار از دیتابیس"""
+        from django.contrib.auth import get_user_model
+        from apps.courses.models import Case, CaseCategory, UserProgress, UserProfile
+
+        User = get_user_model()
+        now = timezone.now()
+        month_ago = now - timedelta(days=30)
+        week_ago = now - timedelta(days=7)
+
+        # همه شمارنده‌های UserProgress در یک query
+        progress = UserProgress.objects.aggregate(
+            total_progress=Count('id'),
+            completed_cases=Count('id', filter=Q(completed=True)),
+            active_users=Count('user', distinct=True),
+            monthly_completions=Count('id', filter=Q(completed=True, completed_at__gte=month_ago)),
+            weekly_completions=Count('id', filter=Q(completed=True, completed_at__gte=week_ago)),
+        )
+        users = User.objects.aggregate(
+            total_users=Count('id'),
+            new_students_this_month=Count('id', filter=Q(date_joined__gte=month_ago)),
+        )
+
+        category_stats = []
+        categories = CaseCategory.objects.annotate(
+            case_count=Count('cases', distinct=True),
+            completed_count=Count('cases', filter=Q(cases__user_progress__completed=True), distinct=True),
+        ).order_by('-case_count', 'name').values('id', 'name', 'case_count', 'completed_count')[:5]
+        for category in categories:
+            category['completion_rate'] = round(
+                (category['completed_count'] / category['case_count'] * 100) if category['case_count'] > 0 else 0, 1
+            )
+            category_stats.append(category)
+
+        user_stats = []
+        active = User.objects.filter(case_progress__isnull=False).annotate(
+            progress_count=Count('case_progress', distinct=True),
+            completed_count=Count('case_progress', filter=Q(case_progress__completed=True), distinct=True),
+        ).select_related('profile').order_by('-completed_count', 'id')[:5]
+        for user in active:
+            profile = getattr(user, 'profile', None)
+            if profile is not None:
+                accuracy = profile.overall_accuracy
+            else:
+                accuracy = round((user.completed_count / user.progress_count * 100) if user.progress_count > 0 else 0, 1)
+            user_stats.append({
+                'name': user.get_full_name() or user.username,
+                'username': user.username,
+                'total_cases': user.progress_count,
+                'completed_cases': user.completed_count,
+                'accuracy': accuracy,
+                'last_login': user.last_login,
+                'date_joined': user.date_joined,
+            })
+
+        accuracy = UserProfile.objects.filter(total_observations__gt=0).aggregate(
+            avg=Avg(F('total_correct_observations') * 100.0 / F('total_observations'))
+        )['avg']
+
+        snapshot = {
+            'total_cases': Case.objects.count(),
+            'total_categories': CaseCategory.objects.count(),
+            'average_accuracy': round(accuracy or 0, 1),
+            'category_stats': category_stats,
+            'user_stats': user_stats,
+            'generated_at': now,
+        }
+        snapshot.update(progress)
+        snapshot.update(users)
+        return snapshot
+
+    @classmethod
+    def increment(cls, **deltas):
+        """
+        به‌روزرسانی تدریجی شمارنده‌ها از سیگنال‌ها
+
+        خواندن و نوشتن snapshot اتمیک نیست؛ خطای احتمالی در اجرای بعدی
+        refresh_platform_metrics اصلاح می‌شود.
+        """
+        if not cls.is_incremental():
+            return
+        snapshot = cache.get(cls.CACHE_KEY)
+        if snapshot is None:
+            return
+        for field, delta in deltas.items():
+            if field in cls.COUNTER_FIELDS and delta:
+                snapshot[field] = max(0, snapshot.get(field, 0) + delta)
+        # عمر باقیمانده snapshot حفظ می‌شود تا محاسبه کامل دوره‌ای عقب نیفتد
+        expires_in = cls.get_timeout() - (timezone.now() - snapshot['generated_at']).total_seconds()
+        if expires_in > 0:
+            cache.set(cls.CACHE_KEY, snapshot, expires_in)
@@ -0,0 +1,201 @@
+"""
+سرویس پردازش تصاویر اسلایدها (نسخه‌های کوچک، متوسط و کامل با WebP و JPEG)
+"""
+import hashlib
+import io
+import os
+from django.conf import settings
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+
+class SlideImageProcessor:
+    """
+    ذخیره تصویر اسلاید با نام مبتنی بر محتوا و ساخت نسخه‌های کوچک‌تر آن
+
+    فایل اصلی با نام <sha256>.<ext> در MEDIA_ROOT/slides ذخیره می‌شود و نسخه‌ها با
+    نام <sha256>_<size>.<format> در MEDIA_ROOT/slides/derivatives؛ چون نام‌ها از محتوا
+    ساخته می‌شوند، فایل تکراری دوباره پردازش نمی‌شود و می‌توان آن‌ها را برای
+    همیشه در مرورگر کش کرد.
+    """
+
+    SLIDES_DIR = 'slides'
+    DERIVATIVES_DIR = 'slides/derivatives'
+
+    # (نام، حداکثر عرض به پیکسل)
+    SIZES = [
+        ('thumb', 240),
+        ('medium', 800),
+        ('full', 1600),
+    ]
+
+    # (پسوند، فرمت Pillow، تنظیمات ذخیره)
+    FORMATS = [
+        ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+        ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+    ]
+
+    DIGEST_LENGTH = 32
+
+    # عرض واقعی نسخه‌های هر تصویر؛ نام‌ها مبتنی بر محتوا هستند و نتیجه تغییر نمی‌کند
+    _widths = {}
+
+    @classmethod
+    def media_path(cls, *parts):
+        return os.path.join(settings.MEDIA_ROOT, *parts)
+
+    @classmethod
+    def media_url(cls, *parts):
+        return settings.MEDIA_URL.rstrip('/') + '/' + '/'.join(parts)
+
+    @classmethod
+    def content_name(cls, data, original_name):
+        """نام فایل مبتنی بر محتوا"""
+        ext = os.path.splitext(original_name)[1].lower() or '.jpg'
+        return hashlib.sha256(data).hexdigest()[:cls.DIGEST_LENGTH] + ext
+
+    @classmethod
+    def derivative_name(cls, image_name, size, ext):
+        stem = os.path.splitext(os.path.basename(image_name))[0]
+        return f'{stem}_{size}.{ext}'
+
+    @classmethod
+    def save_upload(cls, uploaded_file):
+        """
+        ذخیره فایل آپلود شده و ساخت نسخه‌های آن
+
+        Returns:
+            str: نام فایل (برای فیلد Slide.image)
+        """
+        data = b''.join(uploaded_file.chunks())
+        return cls.store(data, uploaded_file.name)
+
+    @classmethod
+    def store(cls, data, original_name):
+        """ذخیره محتوای تصویر با نام مبتنی بر محتوا (در صورت نبود) و ساخت نسخه‌ها"""
+        file_name = cls.content_name(data, original_name)
+        os.makedirs(cls.media_path(cls.SLIDES_DIR), exist_ok=True)
+
+        file_path = cls.media_path(cls.SLIDES_DIR, file_name)
+        if not os.path.exists(file_path):
+            with open(file_path, 'wb') as destination:
+                destination.write(data)
+
+        cls.generate_derivatives(file_name, data)
+        return file_name
+
+    @classmethod
+    def generate_derivatives(cls, image_name, data=None):
+        """
+        ساخت نسخه‌های thumb/medium/full در WebP و JPEG (نسخه‌های موجود دوباره ساخته نمی‌شوند)
+
+        Returns:
+            int: تعداد فایل‌های ساخته شده
+        """
+        from PIL import Image, ImageOps
+
+        targets = [
+            (size, width, ext, image_format, options)
+            for size, width in cls.SIZES
+            for ext, image_format, options in cls.FORMATS
+            if not os.path.exists(cls.media_path(cls.DERIVATIVES_DIR, cls.derivative_name(image_name, size, ext)))
+        ]
+        if not targets:
+            return 0
+
+        if data is None:
+            with open(cls.media_path(cls.SLIDES_DIR, image_name), 'rb') as source:
+                data = source.read()
+
+        os.makedirs(cls.media_path(cls.DERIVATIVES_DIR), exist_ok=True)
+        with Image.open(io.BytesIO(data)) as original:
+            image = ImageOps.exif_transpose(original)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+            created = 0
+            resized = {}
+            for size, width, ext, image_format, options in targets:
+                if size not in resized:
+                    copy = image.copy()
+                    # فقط کوچک‌سازی؛ تصاویر کوچک‌تر از عرض هدف بزرگ نمی‌شوند
+                    copy.thumbnail((width, width * 4), Image.LANCZOS)
+                    resized[size] = copy
+                output = resized[size]
+                if image_format == 'JPEG' and output.mode != 'RGB':
+                    output = output.convert('RGB')
+                output.save(
+                    cls.media_path(cls.DERIVATIVES_DIR, cls.derivative_name(image_name, size, ext)),
+                    image_format,
+                    **options
+                )
+                created += 1
+        return created
+
+    @classmethod
+    def has_derivatives(cls, image_name):
+        return os.path.exists(cls.media_path(cls.DERIVATIVES_DIR, cls.derivative_name(image_name, 'thumb', 'jpg')))
+
+    @classmethod
+    def derivative_widths(cls, image_name):
+        """
+        عرض واقعی نسخه‌ها از روی هدر فایل‌ها (thumbnail تصویر کوچک را بزرگ نمی‌کند)
+
+        Returns:
+            list: (نام اندازه، عرض)؛ نسخه‌هایی با عرض تکراری فقط یک بار آمده‌اند
+        """
+        widths = cls._widths.get(image_name)
+        if widths is not None:
+            return widths
+        from PIL import Image
+
+        widths = []
+        complete = True
+        for size, _ in cls.SIZES:
+            try:
+                with Image.open(cls.media_path(cls.DERIVATIVES_DIR, cls.derivative_name(image_name, size, 'jpg'))) as image:
+                    width = image.width
+            except OSError:
+                complete = False
+                continue
+            if all(width != existing for _, existing in widths):
+                widths.append((size, width))
+        if complete:
+            cls._widths[image_name] = widths
+        return widths
+
+    @classmethod
+    def srcset(cls, image_name, ext):
+        return ', '.join(
+            f'{cls.media_url(cls.DERIVATIVES_DIR, cls.derivative_name(image_name, size, ext))} {width}w'
+            for size, width in cls.derivative_widths(image_name)
+        )
+
+    @classmethod
+    def url(cls, image_name, size=None, ext='jpg'):
+        """آدرس یک نسخه از تصویر (در صورت نبود نسخه‌ها، آدرس فایل اصلی)"""
+        if size and cls.has_derivatives(image_name):
+            return cls.media_url(cls.DERIVATIVES_DIR, cls.derivative_name(image_name, size, ext))
+        return cls.media_url(cls.SLIDES_DIR, image_name)
+
+    @classmethod
+    def picture_html(cls, image_name, alt, style='', sizes='(max-width: 768px) 100vw, 800px', extra_attrs=''):
+        """
+        تگ picture تصویر اسلاید؛ برای تصاویر دارای نسخه با srcset (WebP و JPEG)
+
+        extra_attrs بدون escape در تگ img قرار می‌گیرد و فقط باید مقدار ثابت باشد.
+        """
+        extra_attrs = mark_safe(extra_attrs)
+        if not cls.has_derivatives(image_name):
+            return format_html(
+                '<picture><img src="{}" style="{}" alt="{}" loading="lazy" {} /></picture>',
+                cls.media_url(cls.SLIDES_DIR, image_name), style, alt, extra_attrs,
+            )
+        return format_html(
+            '<picture>'
+            '<source type="image/webp" srcset="{}" sizes="{}" />'
+            '<img src="{}" srcset="{}" sizes="{}" style="{}" alt="{}" loading="lazy" {} />'
+            '</picture>',
+            cls.srcset(image_name, 'webp'), sizes,
+            cls.url(image_name, 'medium'), cls.srcset(image_name, 'jpg'), sizes, style, alt, extra_attrs,
+        )
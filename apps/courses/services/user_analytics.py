@@ -0,0 +1,149 @@
+"""
+سرویس آمار و تحلیل پیشرفت کاربر (صفحه analytics)
+"""
+from datetime import date, timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+
+
+class UserAnalytics:
+    """
+    محاسبه آمار دسته‌بندی‌ها و نمودارهای ماهانه/هفتگی یک کاربر با query های گروهی
+
+    نتیجه برای هر کاربر کش می‌شود و با هر تغییر UserProgress آن کاربر باطل می‌شود.
+    """
+
+    CACHE_KEY = 'user_analytics:{user_id}:{day}'
+    MONTHS = 12
+    WEEKS = 8
+
+    @classmethod
+    def get_timeout(cls):
+        """مدت نگهداری داده در کش (ثانیه)"""
+        return getattr(settings, 'USER_ANALYTICS_CACHE_TIMEOUT', 60 * 10)
+
+    @classmethod
+    def get_cache_key(cls, user_id):
+        # تاریخ روز در کلید است تا بازه‌های ماه و هفته با عوض شدن روز جابجا شوند
+        return cls.CACHE_KEY.format(user_id=user_id, day=timezone.localdate().isoformat())
+
+    @classmethod
+    def invalidate(cls, user_id):
+        """باطل کردن آمار کش شده یک کاربر"""
+        if user_id:
+            cache.delete(cls.get_cache_key(user_id))
+
+    @classmethod
+    def get(cls, user_id):
+        """
+        دریافت آمار کاربر از کش یا محاسبه آن
+
+        Returns:
+            dict: total_progress, completed_progress, category_stats, monthly_stats, weekly_stats
+        """
+        cache_key = cls.get_cache_key(user_id)
+        data = cache.get(cache_key)
+        if data is None:
+            data = cls.build(user_id)
+            cache.set(cache_key, data, cls.get_timeout())
+        return data
+
+    @classmethod
+    def build(cls, user_id):
+        """محاسبه آمار با یک query برای دسته‌بندی‌ها و دو query گروهی روی UserProgress"""
+        from apps.courses.models import CaseCategory, UserProgress
+
+        progress = UserProgress.objects.filter(user_id=user_id)
+
+        # پیشرفت کاربر به تفکیک دسته‌بندی (query گروهی اول)
+        by_category = {}
+        total_progress = 0
+        completed_progress = 0
+        rows = progress.order_by().values('case__category_id').annotate(
+            total=Count('id'),
+            completed=Count('id', filter=Q(completed=True)),
+            completed_published=Count('id', filter=Q(completed=True, case__is_published=True)),
+        )
+        for row in rows:
+            total_progress += row['total']
+            completed_progress += row['completed']
+            by_category[row['case__category_id']] = row['completed_published']
+
+        category_stats = []
+        categories = CaseCategory.objects.annotate(
+            total_cases=Count('cases', filter=Q(cases__is_published=True))
+        ).values('id', 'name', 'slug', 'total_cases')
+        for category in categories:
+            total_cases = category.pop('total_cases')
+            completed = by_category.get(category['id'], 0)
+            category_stats.append({
+                'category': category,
+                'total_cases': total_cases,
+                'completed': completed,
+                'completion_rate': round((completed / total_cases * 100) if total_cases > 0 else 0, 1),
+            })
+
+        monthly_stats, weekly_stats = cls._build_histograms(progress)
+
+        return {
+            'total_progress': total_progress,
+            'completed_progress': completed_progress,
+            'category_stats': category_stats,
+            'monthly_stats': monthly_stats,
+            'weekly_stats': weekly_stats,
+        }
+
+    @classmethod
+    def _build_histograms(cls, progress):
+        """نمودار ماهانه (12 ماه تقویمی) و هفتگی (8 هفته) با یک query گروهی"""
+        today = timezone.localdate()
+
+        month_starts = []
+        year, month = today.year, today.month
+        for _ in range(cls.MONTHS):
+            month_starts.append(date(year, month, 1))
+            year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+        month_starts.reverse()
+
+        current_week = today - timedelta(days=today.weekday())
+        week_starts = [current_week - timedelta(weeks=i) for i in range(cls.WEEKS - 1, -1, -1)]
+
+        since = min(month_starts[0], week_starts[0])
+        rows = progress.filter(
+            completed=True,
+            completed_at__date__gte=since,
+        ).annotate(
+            month=TruncMonth('completed_at'),
+            week=TruncWeek('completed_at'),
+        ).order_by().values('month', 'week').annotate(count=Count('id'))
+
+        monthly = dict.fromkeys(month_starts, 0)
+        weekly = dict.fromkeys(week_starts, 0)
+        for row in rows:
+            month_key = cls._as_date(row['month'])
+            week_key = cls._as_date(row['week'])
+            if month_key in monthly:
+                monthly[month_key] += row['count']
+            if week_key in weekly:
+                weekly[week_key] += row['count']
+
+        monthly_stats = [
+            {'month': month_start.strftime('%Y-%m'), 'completed': monthly[month_start]}
+            for month_start in month_starts
+        ]
+        weekly_stats = [
+            {'week': f'هفته {i + 1}', 'completed': weekly[week_start]}
+            for i, week_start in enumerate(week_starts)
+        ]
+        return monthly_stats, weekly_stats
+
+    @staticmethod
+    def _as_date(value):
+        if value is None:
+            return None
+        if hasattr(value, 'date'):
+            return value.date()
+        return value
@@ -1,100 +1,92 @@
 from django import template
 from django.contrib.auth.models import User
-from django.db.models import Count, Avg, Q
-from django.utils import timezone
-from datetime import timedelta
-from apps.courses.models import Case, CaseCategory, UserProgress, UserProfile
+from apps.courses.services import PlatformMetrics
 
 register = template.Library()
 
-@register.simple_tag
-def get_total_cases():
+def _platform_metrics(context):
+    """snapshot آمار پلتفرم؛ در هر رندر قالب فقط یک بار از کش خوانده می‌شود"""
+    if 'platform_metrics' not in context.render_context:
+        context.render_context['platform_metrics'] = PlatformMetrics.get()
+    return context.render_context['platform_metrics']
+
+@register.simple_tag(takes_context=True)
+def get_total_cases(context):
     """تعداد کل کیس‌ها"""
     try:
-        return Case.objects.count()
+        return _platform_metrics(context)['total_cases']
     except:
         return 0
 
-@register.simple_tag
-def get_total_users():
+@register.simple_tag(takes_context=True)
+def get_total_users(context):
     """تعداد کل کاربران"""
     try:
-        return User.objects.count()
+        return _platform_metrics(context)['total_users']
     except:
         return 0
 
-@register.simple_tag
-def get_total_categories():
+@register.simple_tag(takes_context=True)
+def get_total_categories(context):
     """تعداد کل دسته‌بندی‌ها"""
     try:
-        return CaseCategory.objects.count()
+        return _platform_metrics(context)['total_categories']
     except:
         return 0
 
-@register.simple_tag
-def get_total_progress():
+@register.simple_tag(takes_context=True)
+def get_total_progress(context):
     """تعداد کل پیشرفت‌ها"""
     try:
-        return UserProgress.objects.count()
+        return _platform_metrics(context)['total_progress']
     except:
         return 0
 
-@register.simple_tag
-def get_completed_cases():
+@register.simple_tag(takes_context=True)
+def get_completed_cases(context):
     """تعداد کیس‌های تکمیل شده"""
     try:
-        return UserProgress.objects.filter(completed=True).count()
+        return _platform_metrics(context)['completed_cases']
     except:
         return 0
 
-@register.simple_tag
-def get_active_users():
+@register.simple_tag(takes_context=True)
+def get_active_users(context):
     """تعداد کاربران فعال (با پیشرفت)"""
     try:
-        return UserProgress.objects.values('user').distinct().count()
+        return _platform_metrics(context)['active_users']
     except:
         return 0
 
-@register.simple_tag
-def get_new_students_this_month():
+@register.simple_tag(takes_context=True)
+def get_new_students_this_month(context):
     """تعداد دانشجویان جدید این ماه"""
     try:
-        month_ago = timezone.now() - timedelta(days=30)
-        return User.objects.filter(date_joined__gte=month_ago).count()
+        return _platform_metrics(context)['new_students_this_month']
     except:
         return 0
 
-@register.simple_tag
-def get_monthly_completions():
+@register.simple_tag(takes_context=True)
+def get_monthly_completions(context):
     """تعداد تکمیل‌های این ماه"""
     try:
-        month_ago = timezone.now() - timedelta(days=30)
-        return UserProgress.objects.filter(
-            completed=True,
-            completed_at__gte=month_ago
-        ).count()
+        return _platform_metrics(context)['monthly_completions']
     except:
         return 0
 
-@register.simple_tag
-def get_average_accuracy():
+@register.simple_tag(takes_context=True)
+def get_average_accuracy(context):
     """میانگین دقت کاربران"""
     try:
-        profiles = UserProfile.objects.filter(total_observations__gt=0)
-        if profiles.exists():
-            return round(profiles.aggregate(avg=Avg('total_correct_observations') / Avg('total_observations') * 100)['avg'] or 0, 1)
-        return 0
+        return _platform_metrics(context)['average_accuracy']
     except:
         return 0
 
-@register.simple_tag
-def get_category_stats():
+@register.simple_tag(takes_context=True)
+def get_category_stats(context):
     """آمار دسته‌بندی‌ها"""
     try:
-        return CaseCategory.objects.annotate(
-            case_count=Count('cases'),
-            completed_count=Count('cases__user_progress', filter=Q(cases__user_progress__completed=True))
-        ).order_by('-case_count')[:5]
+        return _platform_metrics(context)['category_stats']
     except:
         return []
 
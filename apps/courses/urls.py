@@ -19,6 +19,7 @@ urlpatterns = [
     
     # API endpoints
     path('save-progress/', views.save_progress, name='save_progress'),
+    path('save-answers/', views.save_answers, name='save_answers'),
     path('submit-result/', views.submit_case_result, name='submit_case_result'),
     path('api/default-options/', views.get_default_options, name='get_default_options'),
 ]
\ No newline at end of file
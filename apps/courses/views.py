@@ -1,12 +1,13 @@
+import json
 from django.core.serializers.json import DjangoJSONEncoder
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404
 from django.utils import timezone
-from django.db.models import Q
+from django.utils.http import urlencode
 from apps.users.decorators import subscription_required_or_admin
 from .models import (
     Case,
@@ -14,43 +15,49 @@ from .models import (
     UserProgress,
     UserObservation,
     UserProfile,
-    CaseCategory,
-    SubCategory,
     CBC_DEFAULT_OPTIONS,
     CHEM_DEFAULT_OPTIONS,
     MORPHO_DEFAULT_OPTIONS,
 )
+from .services import (
+    AnswerBatch,
+    AnswerBatchError,
+    CasePayloadBuilder,
+    CaseNavigation,
+    CaseSearch,
+    CatalogGeneration,
+    CatalogTree,
+    ConditionalGet,
+)
 
 @subscription_required_or_admin
 def case_list(request, category_slug=None):
-    categories = CaseCategory.objects.all()
+    # دسته‌بندی‌ها (با تعداد کیس‌ها) از درخت کش شده کاتالوگ
+    categories = CatalogTree.categories()
     selected_category = None
     # بهینه‌سازی: استفاده از select_related برای category
     cases = Case.objects.filter(is_published=True).select_related('category', 'subcategory')
     
     # فیلتر بر اساس دسته‌بندی
     category_id = request.GET.get('category')
-    if category_id and category_id != 'all':
-        try:
-            selected_category = get_object_or_404(CaseCategory, id=category_id)
-            cases = cases.filter(category=selected_category)
-        except (ValueError, CaseCategory.DoesNotExist):
-            pass
+    if category_id and category_id.isdigit():
+        selected_category = CatalogTree.find_category(category_id=category_id)
+        if selected_category is None:
+            raise Http404('Category not found')
+        cases = cases.filter(category_id=selected_category['id'])
     elif category_slug:
-        selected_category = get_object_or_404(CaseCategory, slug=category_slug)
-        cases = cases.filter(category=selected_category)
+        selected_category = CatalogTree.find_category(slug=category_slug)
+        if selected_category is None:
+            raise Http404('Category not found')
+        cases = cases.filter(category_id=selected_category['id'])
     
-    # جستجو
+    # جستجو (نتایج بر اساس rank مرتب می‌شوند)
     search_query = request.GET.get('search')
     if search_query:
-        cases = cases.filter(
-            Q(title__icontains=search_query) | 
-            Q(history__icontains=search_query) |
-            Q(category__name__icontains=search_query)
-        )
-    
-    # مرتب‌سازی
-    cases = cases.order_by('-created_at')
+        cases = CaseSearch.search(cases, search_query)
+    else:
+        # مرتب‌سازی
+        cases = cases.order_by('-created_at')
     
     return render(request, 'cases/case_list.html', {
         'cases': cases,
@@ -61,161 +68,22 @@ def case_list(request, category_slug=None):
 
 @subscription_required_or_admin
 def case_detail(request, case_id):
-    # بهینه‌سازی: استفاده از select_related و prefetch_related
-    case = get_object_or_404(
-        Case.objects.select_related('category', 'subcategory').prefetch_related('slides', 'lab_tests'),
-        id=case_id
-    )
-    
-    # محاسبه ID کیس بعدی و قبلی - بهینه‌سازی شده (بدون لود کردن همه cases)
-    next_case = Case.objects.filter(id__gt=case_id).order_by('id').first()
-    prev_case = Case.objects.filter(id__lt=case_id).order_by('-id').first()
-    
-    next_case_id = next_case.id if next_case else None
-    prev_case_id = prev_case.id if prev_case else None
-    
-    # دریافت تست‌های آزمایشگاهی و اسلایدها - از prefetch_related استفاده شده
-    lab_tests = case.lab_tests.all()
-    slides = case.slides.all()
-    
-    # دریافت مشاهدات (LabTest model)
-    test_observations = case.lab_tests.all()
-    
-    # ساخت داده‌های جدول آزمایش به‌صورت گروهی (نمایش حتی بدون Test مرتبط)
-    tests_map = {}
-    for lt in lab_tests:
-        key = lt.lab_type.lower()
-        # یافتن تست مرتبط با تطبیق دقیق
-        related_test = test_observations.filter(lab_type__iexact=lt.lab_type.upper()).first()
-
-        if key not in tests_map:
-            tests_map[key] = {
-                'title': key,
-                'rows': [],
-                'observations': (
-                    [opt.observation_text for opt in UserObservation.objects.filter(case_test=related_test)] if related_test and key != 'cbc'
-                    else (
-                        [opt.observation_text for opt in UserObservation.objects.filter(case_test__lab_type='CBC_DEFAULT')] if key == 'cbc'
-                        else (
-                            [opt.observation_text for opt in UserObservation.objects.filter(case_test__lab_type='CHEM_DEFAULT')] if key == 'chem'
-                            else (
-                                [opt.observation_text for opt in UserObservation.objects.filter(case_test__lab_type='MORPHO_DEFAULT')] if key == 'morpho'
-                                else []
-                            )
-                        )
-                    )
-                ),
-                'correct_observations': (
-                    [opt.observation_text for opt in UserObservation.objects.filter(case_test=related_test, is_correct=True)] if related_test and key != 'cbc'
-                    else (
-                        [opt.observation_text for opt in UserObservation.objects.filter(case_test__lab_type='CBC_DEFAULT', is_correct=True)] if key == 'cbc'
-                        else (
-                            [opt.observation_text for opt in UserObservation.objects.filter(case_test__lab_type='CHEM_DEFAULT', is_correct=True)] if key == 'chem'
-                            else (
-                                [opt.observation_text for opt in UserObservation.objects.filter(case_test__lab_type='MORPHO_DEFAULT', is_correct=True)] if key == 'morpho'
-                                else []
-                            )
-                        )
-                    )
-                ),
-            }
-
-        tests_map[key]['rows'].append({
-            'name': lt.lab_name,
-            'value': lt.lab_result,
-            'reference': lt.normal_range,
-            'report': lt.lab_result,
-        })
-
-    tests_data = list(tests_map.values())
-
-    # اضافه کردن گزینه‌های پیش‌فرض از دیتابیس
-    default_test_types = ['CBC_DEFAULT', 'CHEM_DEFAULT', 'MORPHO_DEFAULT']
+    # داده‌های محتوایی کیس از کش خوانده می‌شوند (با تعداد ثابتی query در صورت نبود در کش)
+    payload = CasePayloadBuilder.get(case_id)
+    if payload is None:
+        raise Http404('Case not found')
+    case = payload['case']
     
-    for default_type in default_test_types:
-        # بررسی آیا این نوع تست در tests_data موجود است
-        if not any(t.get('title') == default_type.lower().replace('_default', '') for t in tests_data):
-            # پیدا کردن default test در دیتابیس
-            default_test = test_observations.filter(lab_type=default_type).first()
-            
-            if default_test:
-                # دریافت observations از دیتابیس
-                observations = [opt.observation_text for opt in UserObservation.objects.filter(case_test=default_test)]
-                correct_observations = [opt.observation_text for opt in UserObservation.objects.filter(case_test=default_test, is_correct=True)]
-                
-                test_title = default_type.lower().replace('_default', '')
-                tests_data.append({
-                    'title': test_title,
-                    'rows': [],  # default tests هیچ row ندارند
-                    'observations': observations,
-                    'correct_observations': correct_observations,
-                })
-    
-    # اضافه کردن اسلایدها به داده‌ها (نمایش حتی بدون Test مرتبط)
-    slides_data = []
-    for i, slide in enumerate(slides):
-        slide_test = test_observations.filter(lab_type__iexact='slide').first()
-
-        try:
-            if slide.image and slide.image.strip():
-                # slide.image یک CharField است که نام فایل را ذخیره می‌کند
-                image_url = f"/media/slides/{slide.image}"
-                report_html = f"""
-                <div style="text-align: center; margin-bottom: 1rem;">
-                    <img src='{image_url}' 
-                         style='max-width:100%; height:auto; border-radius:8px; box-shadow: 0 4px 8px rgba(0,0,0,0.1);' 
-                         alt='{slide.title or "Slide Image"}' 
-                         onerror="this.style.display='none'; this.nextElementSibling.style.display='block';" />
-                    <div style='display:none; background: #f0f0f0; padding: 20px; text-align: center; border-radius:8px;'>
-                        <i class='fas fa-image' style='font-size: 48px; color: #ccc;'></i><br>
-                        <p>تصویر یافت نشد: {slide.image}</p>
-                    </div>
-                </div>
-                <div style="background: #f8f9fa; padding: 1rem; border-radius: 8px; border-right: 4px solid #3ea66b;">
-                    <strong>عنوان:</strong> {slide.title or 'بدون عنوان'}<br><br>
-                    <strong>توضیحات:</strong> {slide.description or 'بدون توضیح'}
-                </div>
-                """
-            else:
-                report_html = f"""
-                <div style='background: #f0f0f0; padding: 20px; text-align: center; border-radius:8px;'>
-                    <i class='fas fa-image' style='font-size: 48px; color: #ccc;'></i><br><br>
-                    <strong>عنوان:</strong> {slide.title or 'بدون عنوان'}<br><br>
-                    <strong>توضیحات:</strong> {slide.description or 'بدون توضیح'}
-                </div>
-                """
-        except Exception as e:
-            print(f"Error processing slide image: {e}")
-            report_html = f"""
-            <div style='background: #f0f0f0; padding: 20px; text-align: center; border-radius:8px;'>
-                <i class='fas fa-image' style='font-size: 48px; color: #ccc;'></i><br><br>
-                <strong>خطا در نمایش تصویر:</strong> {str(e)}<br><br>
-                <strong>عنوان:</strong> {slide.title or 'بدون عنوان'}<br><br>
-                <strong>توضیحات:</strong> {slide.description or 'بدون توضیح'}
-            </div>
-            """
-
-        slides_data.append({
-            'title': f'slide_{i+1}',
-            'report': report_html,
-            'observations': (
-                [opt.observation_text for opt in UserObservation.objects.filter(case_test=slide_test)] if slide_test else []
-            ),
-            'correct_observations': (
-                [opt.observation_text for opt in UserObservation.objects.filter(case_test=slide_test, is_correct=True)] if slide_test else []
-            ),
-        })
+    # کیس قبلی و بعدی در فیلتر فعلی کاربر (دسته‌بندی / زیردسته) از ترتیب کش شده
+    nav_filter, nav_query = navigation_filter(request)
+    prev_case, next_case = CaseNavigation.neighbours(case['id'], **nav_filter)
     
-    # ترکیب تست‌ها و اسلایدها
-    all_tests = tests_data + slides_data
+    all_tests = payload['tests']
     
     # اگر هیچ تستی موجود نیست، پیام هشدار نمایش بده
     if not all_tests:
         print("WARNING: No tests found in admin panel for this case!")
         print("Please add tests through the admin panel.")
-        print(f"Lab tests count: {lab_tests.count()}")
-        print(f"Test observations count: {test_observations.count()}")
-        print(f"Slides count: {slides.count()}")
     
     # اگر کاربر لاگین کرده، پیشرفت او را دریافت کن
     user_progress = None
@@ -223,22 +91,78 @@ def case_detail(request, case_id):
         try:
             user_progress, created = UserProgress.objects.get_or_create(
                 user=request.user,
-                case=case,
+                case_id=case['id'],
                 defaults={'completed': False}
             )
         except Exception as e:
             print(f"Error creating user progress: {e}")
             user_progress = None
     
-    return render(request, 'cases/case_detail.html', {
+    # درخواست شرطی: اگر محتوا و وضعیت کاربر تغییر نکرده، 304 بدون render
+    etag = None
+    if payload.get('etag') and not messages.get_messages(request):
+        etag = case_detail_etag(request, payload, user_progress)
+        not_modified = ConditionalGet.not_modified(request, etag, payload['last_modified'])
+        if not_modified is not None:
+            ConditionalGet.apply(not_modified, etag, payload['last_modified'])
+            return not_modified
+    
+    response = render(request, 'cases/case_detail.html', {
         'case': case,
-        'next_case_id': next_case_id,
-        'prev_case_id': prev_case_id,
+        'next_case_id': next_case,
+        'prev_case_id': prev_case,
+        'nav_query': nav_query,
         'tests': all_tests,
         'user_progress': user_progress,
-        'correct_diagnosis': case.correct_diagnosis or 'تشخیص صحیح در دسترس نیست',
-        'diagnosis_explanation': case.explanation or 'توضیحات تکمیلی در دسترس نیست',
+        'correct_diagnosis': case['correct_diagnosis'] or 'تشخیص صحیح در دسترس نیست',
+        'diagnosis_explanation': case['explanation'] or 'توضیحات تکمیلی در دسترس نیست',
     })
+    if etag:
+        ConditionalGet.apply(response, etag, payload['last_modified'])
+    return response
+
+
+def navigation_filter(request):
+    """
+    فیلتر دسته‌بندی/زیردسته ناوبری کیس‌ها از query string (?category= / ?subcategory=)
+
+    Returns:
+        tuple: (kwargs برای CaseNavigation.neighbours، query string برای لینک‌های قبلی/بعدی)
+    """
+    nav_filter = {'category_id': None, 'sub_category_id': None}
+    params = {}
+    for param, key in (('category', 'category_id'), ('subcategory', 'sub_category_id')):
+        value = request.GET.get(param, '')
+        if value.isdigit():
+            nav_filter[key] = int(value)
+            params[param] = value
+    return nav_filter, urlencode(params)
+
+
+def case_detail_etag(request, payload, user_progress):
+    """
+    ETag صفحه کیس: محتوای کیس + وضعیت کاربر + داده‌های مشترک صفحه
+    
+    نسل کاتالوگ برای کیس قبلی/بعدی، تعداد سبد خرید برای هدر و کوکی‌های
+    session/CSRF برای توکن فرم‌ها در ETag هستند.
+    """
+    from django.conf import settings
+    from apps.users.models import Cart
+    
+    user = request.user
+    progress = None
+    if user_progress is not None:
+        progress = (user_progress.pk, user_progress.completed, user_progress.score, user_progress.updated_at)
+    return ConditionalGet.make_etag(
+        'case_detail',
+        payload['etag'],
+        CatalogGeneration.get(),
+        user.pk,
+        progress,
+        Cart.get_cached_count(user.pk) if user.is_authenticated else 0,
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME),
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME),
+    )
 
 def debug_case(request, case_id):
     """View برای debug کردن داده‌های کیس"""
@@ -302,8 +226,10 @@ def logout_view(request):
 
 @login_required
 def profile_view(request):
+    # آمار پروفایل با هر تغییر UserProgress به‌صورت تدریجی به‌روز می‌شود
     user_profile, created = UserProfile.objects.get_or_create(user=request.user)
-    user_profile.update_stats()
+    if created:
+        user_profile.update_stats()
     
     # دریافت پیشرفت‌های اخیر
     recent_progress = request.user.case_progress.filter(completed=True).order_by('-completed_at')[:10]
@@ -361,6 +287,37 @@ def save_progress(request):
     
     return JsonResponse({'status': 'error', 'error': 'Invalid request method'})
 
+@login_required
+def save_answers(request):
+    """
+    ثبت دسته‌ای مشاهدات یک بار حل کیس (به جای یک درخواست save_progress برای هر کلیک)
+
+    بدنه JSON:
+        {"case_id": 12, "idempotency_key": "...", "observations": [{"test": "cbc", "observation": "..."}]}
+    کلید idempotency می‌تواند در هدر Idempotency-Key هم ارسال شود.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'error': 'Invalid request method'}, status=405)
+
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'status': 'error', 'error': 'Invalid JSON'}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse({'status': 'error', 'error': 'Invalid JSON'}, status=400)
+
+    idempotency_key = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+    try:
+        case_id = int(data.get('case_id'))
+    except (TypeError, ValueError):
+        return JsonResponse({'status': 'error', 'error': 'Missing required fields'}, status=400)
+
+    try:
+        result = AnswerBatch.ingest(request.user, case_id, data.get('observations'), str(idempotency_key or ''))
+    except AnswerBatchError as e:
+        return JsonResponse({'status': 'error', 'error': str(e), 'errors': e.errors}, status=e.status)
+    return JsonResponse(result)
+
 @login_required
 def submit_case_result(request):
     if request.method == 'POST':
@@ -400,9 +357,7 @@ def submit_case_result(request):
             user_progress.completed_at = timezone.now()
             user_progress.save()
         
-        # به‌روزرسانی آمار کاربر
-        user_profile, created = UserProfile.objects.get_or_create(user=request.user)
-        user_profile.update_stats()
+        # آمار کاربر توسط سیگنال‌های UserProgress به‌صورت تدریجی به‌روز می‌شود
         
         return JsonResponse({
             'status': 'success',
@@ -426,7 +381,14 @@ def get_default_options(request):
     else:
         options = []
     
-    return JsonResponse({
+    # گزینه‌ها ثابت هستند؛ مرورگر پاسخ را یک ساعت بدون درخواست دوباره نگه می‌دارد
+    etag = ConditionalGet.make_etag('default_options', test_type, options)
+    not_modified = ConditionalGet.not_modified(request, etag)
+    if not_modified is not None:
+        return ConditionalGet.apply(not_modified, etag, private=False, max_age=60 * 60)
+    
+    response = JsonResponse({
         'options': options,
         'type': test_type
-    })
\ No newline at end of file
+    })
+    return ConditionalGet.apply(response, etag, private=False, max_age=60 * 60)
\ No newline at end of file
@@ -5,6 +5,7 @@ from django.utils.html import format_html
 from django.urls import reverse
 from django.utils import timezone
 from .models import CustomUser, Notification, Subscription, Payment, SubscriptionPlan, Cart, CartItem
+from .services.entitlement import SubscriptionEntitlement
 
 
 # Unregister the default User model if it's registered
@@ -175,22 +176,21 @@ class NotificationAdmin(admin.ModelAdmin):
 
     @admin.action(description="ارسال اعلان عمومی به همه کاربران")
     def send_broadcast(self, request, queryset):
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
-        broadcast_count = 0
-        for notification in queryset.filter(is_broadcast=False):
-            users = User.objects.filter(is_active=True)
-            for user in users:
-                Notification.objects.create(
-                    title=notification.title,
-                    message=notification.message,
-                    notification_type=notification.notification_type,
-                    recipient=user,
-                    sender=request.user,
-                    expires_at=notification.expires_at
-                )
-                broadcast_count += 1
-        self.message_user(request, f'{broadcast_count} اعلان عمومی برای همه کاربران ارسال شد.')
+        # هر اعلان عمومی یک بار ذخیره می‌شود و برای همه کاربران نمایش داده می‌شود
+        broadcasts = [
+            Notification(
+                title=notification.title,
+                message=notification.message,
+                notification_type=notification.notification_type,
+                recipient=None,
+                is_broadcast=True,
+                sender=request.user,
+                expires_at=notification.expires_at
+            )
+            for notification in queryset.filter(is_broadcast=False)
+        ]
+        Notification.objects.bulk_create(broadcasts)
+        self.message_user(request, f'{len(broadcasts)} اعلان عمومی برای همه کاربران ارسال شد.')
 
     def save_model(self, request, obj, form, change):
         if not change:
@@ -257,17 +257,23 @@ class SubscriptionAdmin(admin.ModelAdmin):
 
     @admin.action(description="فعال کردن اشتراک")
     def activate_subscription(self, request, queryset):
+        user_ids = list(queryset.values_list('user_id', flat=True))
         updated = queryset.update(status='active')
+        SubscriptionEntitlement.invalidate(user_ids)
         self.message_user(request, f'{updated} اشتراک فعال شد.')
 
     @admin.action(description="غیرفعال کردن اشتراک (منقضی)")
     def deactivate_subscription(self, request, queryset):
+        user_ids = list(queryset.values_list('user_id', flat=True))
         updated = queryset.update(status='expired')
+        SubscriptionEntitlement.invalidate(user_ids)
         self.message_user(request, f'{updated} اشتراک غیرفعال شد.')
 
     @admin.action(description="لغو اشتراک")
     def cancel_subscription(self, request, queryset):
+        user_ids = list(queryset.values_list('user_id', flat=True))
         updated = queryset.update(status='cancelled')
+        SubscriptionEntitlement.invalidate(user_ids)
         self.message_user(request, f'{updated} اشتراک لغو شد.')
 
     @admin.action(description="تمدید 30 روزه")
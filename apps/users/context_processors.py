@@ -2,24 +2,26 @@
 Context processors برای دسترسی به داده‌ها در همه template ها
 """
 from django.db import OperationalError, DatabaseError
+from django.utils.functional import SimpleLazyObject
 from .models import Cart
 
 
 def cart_context(request):
-    """اضافه کردن اطلاعات سبد خرید به context"""
-    cart_count = 0
+    """
+    اضافه کردن اطلاعات سبد خرید به context
     
-    if request.user.is_authenticated:
+    cart_count به صورت lazy محاسبه می‌شود؛ صفحاتی که نشان سبد خرید را نمایش
+    نمی‌دهند هیچ query یا خواندن کشی انجام نمی‌دهند.
+    """
+    def get_cart_count():
+        if not request.user.is_authenticated:
+            return 0
         try:
-            cart = Cart.objects.get(user=request.user)
-            cart_count = cart.items_count
-        except Cart.DoesNotExist:
-            cart_count = 0
+            return Cart.get_cached_count(request.user.id)
         except (OperationalError, DatabaseError):
             # در صورت قطع اتصال دیتابیس، مقدار پیش‌فرض را برمی‌گردانیم
-            cart_count = 0
+            return 0
     
     return {
-        'cart_count': cart_count
+        'cart_count': SimpleLazyObject(get_cart_count)
     }
-
@@ -5,10 +5,7 @@ from django.shortcuts import redirect
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_protect
 from django.views.decorators.http import require_http_methods
-from django.core.cache import cache
 from django.conf import settings
-from django.utils import timezone
-import time
 
 def require_authentication(view_func):
     """Decorator برای احراز هویت اجباری"""
@@ -42,6 +39,12 @@ def require_staff(view_func):
 def rate_limit(max_requests=10, window_seconds=60):
     """Decorator برای محدود کردن درخواست‌ها"""
     def decorator(view_func):
+        from .services.rate_limiter import get_rate_limiter
+        limiter = get_rate_limiter(
+            max_requests, window_seconds,
+            prefix=f"rate_limit_{view_func.__module__}.{view_func.__name__}"
+        )
+        
         def wrapper(request, *args, **kwargs):
             # شناسایی کاربر
             if request.user.is_authenticated:
@@ -49,25 +52,21 @@ def rate_limit(max_requests=10, window_seconds=60):
             else:
                 identifier = f"ip_{request.META.get('REMOTE_ADDR', 'unknown')}"
             
-            # بررسی cache
-            cache_key = f"rate_limit_{identifier}"
-            requests = cache.get(cache_key, [])
-            
-            # حذف درخواست‌های قدیمی
-            current_time = time.time()
-            requests = [req_time for req_time in requests if current_time - req_time < window_seconds]
+            # ثبت درخواست و بررسی محدودیت (شمارنده اتمیک در cache)
+            try:
+                allowed = limiter.hit(identifier).allowed
+            except Exception as e:
+                # اگر مشکلی در cache بود، اجازه دسترسی بده
+                print(f"[Rate Limit Error] {str(e)}")
+                allowed = True
             
             # بررسی محدودیت
-            if len(requests) >= max_requests:
+            if not allowed:
                 if request.headers.get('Accept') == 'application/json':
                     return JsonResponse({'error': 'Rate limit exceeded'}, status=429)
                 messages.error(request, 'تعداد درخواست‌ها بیش از حد مجاز است. لطفاً کمی صبر کنید.')
                 return redirect('users:landing_page')
             
-            # اضافه کردن درخواست فعلی
-            requests.append(current_time)
-            cache.set(cache_key, requests, window_seconds)
-            
             return view_func(request, *args, **kwargs)
         return wrapper
     return decorator
@@ -102,16 +101,10 @@ def subscription_required_or_admin(view_func):
             from django.shortcuts import redirect
             return redirect('users:login')
         
-        # بررسی اشتراک فعال
-        from .models import Subscription
+        # بررسی اشتراک فعال (از کش دسترسی، بدون query دیتابیس)
+        from .services.entitlement import SubscriptionEntitlement
         try:
-            subscription = Subscription.objects.filter(
-                user=request.user,
-                status='active',
-                end_date__gt=timezone.now()
-            ).first()
-            
-            if not subscription:
+            if not SubscriptionEntitlement.has_access(request.user):
                 # کاربر اشتراک فعال ندارد
                 if request.headers.get('Accept') == 'application/json':
                     return JsonResponse({'error': 'Active subscription required'}, status=403)
@@ -138,16 +131,10 @@ def subscription_required(view_func):
             from django.shortcuts import redirect
             return redirect('users:login')
         
-        # بررسی اشتراک فعال
-        from .models import Subscription
+        # بررسی اشتراک فعال (از کش دسترسی، بدون query دیتابیس)
+        from .services.entitlement import SubscriptionEntitlement
         try:
-            subscription = Subscription.objects.filter(
-                user=request.user,
-                status='active',
-                end_date__gt=timezone.now()
-            ).first()
-            
-            if not subscription:
+            if not SubscriptionEntitlement.has_access(request.user):
                 # کاربر اشتراک فعال ندارد
                 if request.headers.get('Accept') == 'application/json':
                     return JsonResponse({'error': 'Active subscription required'}, status=403)
@@ -0,0 +1,39 @@
+"""
+دستور مدیریتی Django برای منقضی کردن اشتراک‌هایی که تاریخ پایان آن‌ها گذشته است
+استفاده: python manage.py expire_subscriptions [--dry-run]
+(برای اجرای دوره‌ای در cron)
+"""
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.users.models import Subscription
+from apps.users.services.entitlement import SubscriptionEntitlement
+
+
+class Command(BaseCommand):
+    help = 'منقضی کردن اشتراک‌های فعالی که تاریخ پایان آن‌ها گذشته است (با یک UPDATE)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='فقط نمایش تعداد اشتراک‌ها بدون تغییر',
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        expired = Subscription.objects.filter(status='active', end_date__lte=now)
+        user_ids = list(expired.values_list('user_id', flat=True))
+
+        if options['dry_run']:
+            self.stdout.write(f'{len(user_ids)} اشتراک منقضی خواهد شد.')
+            return
+
+        # queryset.update سیگنال post_save نمی‌فرستد؛ کش دسترسی جداگانه باطل می‌شود
+        updated = expired.update(status='expired', updated_at=now)
+        SubscriptionEntitlement.invalidate(user_ids)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ {updated} اشتراک منقضی شد.')
+        )
@@ -1,6 +1,8 @@
 from .middleware import NoCacheMiddleware, RequestPrivacyMiddleware, LightNetworkSecurityMiddleware, SecurityMiddleware
 from .xss_protection import XSSProtectionMiddleware
 from .rate_limit import RateLimitMiddleware
+from .pipeline import SecurityPipelineMiddleware, SecurityStage
+from .instrumentation import PerformanceInstrumentationMiddleware
 
 __all__ = [
     'NoCacheMiddleware',
@@ -9,5 +11,8 @@ __all__ = [
     'SecurityMiddleware',
     'XSSProtectionMiddleware',
     'RateLimitMiddleware',
+    'SecurityPipelineMiddleware',
+    'SecurityStage',
+    'PerformanceInstrumentationMiddleware',
 ]
 
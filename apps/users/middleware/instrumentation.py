@@ -0,0 +1,239 @@
+"""
+ابزار اندازه‌گیری کارایی هر درخواست
+
+برای هر درخواست زمان کل، تعداد و زمان query های دیتابیس (connection.execute_wrapper)،
+تعداد hit/miss کش و زمان render قالب‌ها اندازه‌گیری و برای هر view یک خط لاگ
+ساخت‌یافته ثبت می‌شود. برای کاربران staff هدر Server-Timing اضافه می‌شود و در صورت
+تکرار یک SQL بیش از حد آستانه (نشانه N+1) پرتکرارترین query ها لاگ می‌شوند.
+
+تنظیمات در settings.py:
+- PERF_INSTRUMENTATION_ENABLED: فعال بودن اندازه‌گیری (پیش‌فرض True)
+- PERF_SERVER_TIMING: 'staff' (پیش‌فرض)، 'all' یا None برای غیرفعال کردن هدر
+- PERF_SLOW_REQUEST_MS: درخواست‌های کندتر از این مقدار با سطح WARNING لاگ می‌شوند (پیش‌فرض 500)
+- PERF_DUPLICATE_SQL_THRESHOLD: حداقل تکرار یک SQL برای لاگ شدن (پیش‌فرض 5)
+- PERF_DUPLICATE_SQL_TOP: تعداد SQL های پرتکرار لاگ شده (پیش‌فرض 5)
+- PERF_EXEMPT_PATHS: پیشوند مسیرهای بدون اندازه‌گیری
+- PERF_CACHE_ALIASES: کش‌های اندازه‌گیری شده (پیش‌فرض همه کش‌های CACHES)
+"""
+import contextvars
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+from .xss_protection import add_server_timing
+
+logger = logging.getLogger(__name__)
+
+# معیارهای درخواست جاری؛ wrapper های کش و قالب فقط در صورت وجود آن اندازه‌گیری می‌کنند
+_current_metrics = contextvars.ContextVar('request_metrics', default=None)
+_MISSING = object()
+
+
+class RequestMetrics:
+    """معیارهای جمع‌آوری شده یک درخواست"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.total_ms = 0.0
+        self.db_queries = 0
+        self.db_ms = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_ms = 0.0
+        self.template_ms = 0.0
+        self.template_depth = 0
+        self.statements = Counter()
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        """execute_wrapper دیتابیس"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_ms += (time.perf_counter() - start) * 1000
+            self.db_queries += 1
+            # SQL با placeholder ها ثبت می‌شود، پس query های N+1 متن یکسان دارند
+            self.statements[sql] += 1
+
+    def finish(self):
+        self.total_ms = (time.perf_counter() - self.start) * 1000
+
+    def duplicate_statements(self, threshold, top):
+        """SQL هایی که حداقل threshold بار اجرا شده‌اند (پرتکرارترین‌ها)"""
+        return [(sql, count) for sql, count in self.statements.most_common(top) if count >= threshold]
+
+    def as_dict(self):
+        return {
+            'total_ms': round(self.total_ms, 2),
+            'db_queries': self.db_queries,
+            'db_ms': round(self.db_ms, 2),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'cache_ms': round(self.cache_ms, 2),
+            'template_ms': round(self.template_ms, 2),
+        }
+
+
+def instrument_cache(backend):
+    """
+    قرار دادن wrapper روی get و get_many یک نمونه کش (یک بار برای هر نمونه)
+
+    get_or_set و سایر متدهای BaseCache از طریق self.get از همین wrapper عبور می‌کنند.
+    """
+    if getattr(backend, '_perf_instrumented', False):
+        return
+    original_get = backend.get
+    original_get_many = backend.get_many
+
+    def get(key, default=None, version=None, **kwargs):
+        metrics = _current_metrics.get()
+        if metrics is None:
+            return original_get(key, default, version=version, **kwargs)
+        start = time.perf_counter()
+        value = original_get(key, _MISSING, version=version, **kwargs)
+        metrics.cache_ms += (time.perf_counter() - start) * 1000
+        if value is _MISSING:
+            metrics.cache_misses += 1
+            return default
+        metrics.cache_hits += 1
+        return value
+
+    def get_many(keys, version=None, **kwargs):
+        metrics = _current_metrics.get()
+        if metrics is None:
+            return original_get_many(keys, version=version, **kwargs)
+        keys = list(keys)
+        start = time.perf_counter()
+        values = original_get_many(keys, version=version, **kwargs)
+        metrics.cache_ms += (time.perf_counter() - start) * 1000
+        metrics.cache_hits += len(values)
+        metrics.cache_misses += len(keys) - len(values)
+        return values
+
+    backend.get = get
+    backend.get_many = get_many
+    backend._perf_instrumented = True
+
+
+def instrument_templates():
+    """قرار دادن wrapper روی render قالب‌های Django (یک بار برای هر پروسه)"""
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, '_perf_instrumented', False):
+        return
+    original_render = Template.render
+
+    def render(self, context=None, request=None):
+        metrics = _current_metrics.get()
+        if metrics is None:
+            return original_render(self, context, request)
+        # render های تو در تو (render_to_string داخل تگ‌ها) فقط یک بار شمرده می‌شوند
+        metrics.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return original_render(self, context, request)
+        finally:
+            metrics.template_depth -= 1
+            if metrics.template_depth == 0:
+                metrics.template_ms += (time.perf_counter() - start) * 1000
+
+    render._perf_instrumented = True
+    Template.render = render
+
+
+class PerformanceInstrumentationMiddleware:
+    """
+    اندازه‌گیری کارایی هر درخواست
+
+    باید در ابتدای MIDDLEWARE (قبل از SessionMiddleware) قرار بگیرد تا query ها و
+    دسترسی‌های کش سایر middleware ها هم شمرده شوند.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'PERF_INSTRUMENTATION_ENABLED', True)
+        self.server_timing = getattr(settings, 'PERF_SERVER_TIMING', 'staff')
+        self.slow_request_ms = getattr(settings, 'PERF_SLOW_REQUEST_MS', 500)
+        self.duplicate_threshold = getattr(settings, 'PERF_DUPLICATE_SQL_THRESHOLD', 5)
+        self.duplicate_top = getattr(settings, 'PERF_DUPLICATE_SQL_TOP', 5)
+        self.exempt_paths = tuple(getattr(settings, 'PERF_EXEMPT_PATHS', ['/static/', '/media/']))
+        self.cache_aliases = getattr(settings, 'PERF_CACHE_ALIASES', None)
+
+        if self.enabled:
+            instrument_templates()
+
+    def __call__(self, request):
+        if not self.enabled or request.path.startswith(self.exempt_paths):
+            return self.get_response(request)
+
+        # نمونه‌های کش برای هر thread جدا ساخته می‌شوند
+        for alias in self.cache_aliases or settings.CACHES:
+            instrument_cache(caches[alias])
+
+        metrics = RequestMetrics()
+        token = _current_metrics.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(metrics.db_wrapper))
+                response = self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+            metrics.finish()
+
+        self.log_metrics(request, response, metrics)
+        if self.should_add_server_timing(request):
+            self.add_server_timing(response, metrics)
+        return response
+
+    @staticmethod
+    def get_view_name(request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return 'unresolved'
+        return match.view_name or match._func_path
+
+    def should_add_server_timing(self, request):
+        if self.server_timing == 'all':
+            return True
+        if self.server_timing != 'staff':
+            return False
+        user = getattr(request, 'user', None)
+        return bool(user is not None and user.is_authenticated and user.is_staff)
+
+    @staticmethod
+    def add_server_timing(response, metrics):
+        add_server_timing(response, 'db', metrics.db_ms, f'{metrics.db_queries} queries')
+        add_server_timing(
+            response, 'cache', metrics.cache_ms, f'{metrics.cache_hits} hits, {metrics.cache_misses} misses'
+        )
+        add_server_timing(response, 'tpl', metrics.template_ms)
+        add_server_timing(response, 'total', metrics.total_ms)
+
+    def log_metrics(self, request, response, metrics):
+        view_name = self.get_view_name(request)
+        data = metrics.as_dict()
+        data.update(view=view_name, method=request.method, path=request.path, status=response.status_code)
+
+        level = logging.WARNING if metrics.total_ms >= self.slow_request_ms else logging.INFO
+        logger.log(
+            level,
+            'perf view=%s method=%s status=%s total_ms=%.2f db_queries=%d db_ms=%.2f '
+            'cache_hits=%d cache_misses=%d template_ms=%.2f',
+            view_name, request.method, response.status_code, metrics.total_ms, metrics.db_queries,
+            metrics.db_ms, metrics.cache_hits, metrics.cache_misses, metrics.template_ms,
+            extra={'perf': data},
+        )
+
+        duplicates = metrics.duplicate_statements(self.duplicate_threshold, self.duplicate_top)
+        if duplicates:
+            logger.warning(
+                'perf duplicate_sql view=%s path=%s statements=%d\n%s',
+                view_name, request.path, len(duplicates),
+                '\n'.join(f'{count}x {sql}' for sql, count in duplicates),
+                extra={'perf': dict(data, duplicate_sql=duplicates)},
+            )
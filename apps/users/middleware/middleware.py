@@ -16,6 +16,10 @@ class NoCacheMiddleware:
     def __call__(self, request):
         response = self.get_response(request)
         
+        # view سیاست کش خود را تعیین کرده است (مثلاً پاسخ‌های دارای ETag)
+        if response.has_header('Cache-Control'):
+            return response
+        
         # اضافه کردن هدرهای no-cache برای صفحات HTML
         if response.get('Content-Type', '').startswith('text/html'):
             response['Cache-Control'] = 'no-cache, no-store, must-revalidate, max-age=0'
@@ -0,0 +1,336 @@
+"""
+Pipeline یکپارچه امنیتی
+
+به جای چند middleware جداگانه (NoCacheMiddleware, RequestPrivacyMiddleware,
+LightNetworkSecurityMiddleware, SecurityMiddleware, XSSProtectionMiddleware و
+RateLimitMiddleware) که هر کدام IP و User-Agent را دوباره پردازش می‌کنند، یک
+middleware با مراحل (stage) قابل تنظیم:
+
+- IP کلاینت، User-Agent کوچک شده و امضاهای UA/مسیر فقط یک بار برای هر درخواست
+  محاسبه می‌شوند (SecurityContext).
+- همه امضاها در یک regex ترکیبی از پیش کامپایل شده بررسی می‌شوند.
+- هدرهای ثابت همه مراحل هنگام راه‌اندازی ادغام و در یک مرحله روی پاسخ اعمال می‌شوند.
+
+تنظیمات در settings.py:
+- SECURITY_PIPELINE_STAGES: لیست مسیر کلاس مراحل (پیش‌فرض DEFAULT_STAGES)
+- BLOCKED_IPS: لیست IP های مسدود شده
+"""
+import logging
+import re
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+# امضاهای User-Agent به تفکیک دسته
+USER_AGENT_SIGNATURES = {
+    # scanner ها و exploit ها (مسدود می‌شوند)
+    'scanner': [
+        'sqlmap', 'nmap', 'nikto', 'havij', 'burp', 'zap', 'dirbuster',
+        'gobuster', 'wpscan', 'acunetix', 'nessus',
+    ],
+    # ابزارهای تحلیل شبکه (فقط لاگ می‌شوند)
+    'network_tool': ['wireshark', 'tcpdump', 'fiddler', 'charles', 'mitmproxy'],
+}
+
+# امضاهای مسیر درخواست
+PATH_SIGNATURES = {
+    'scanner': [
+        'phpmyadmin', 'wp-admin', 'administrator',
+        'backup', 'config', 'database', 'sql', 'test',
+        'debug', 'info', 'status', 'phpinfo', 'shell',
+        'cmd', 'exec', 'eval', 'system', 'passthru',
+    ],
+}
+
+# نام پارامترهای مشکوک query string
+SUSPICIOUS_PARAMS = ['eval', 'exec', 'system', 'shell', 'cmd', 'script']
+
+# extension های تحلیل شبکه در Referer
+SUSPICIOUS_REFERERS = ['burp-extension', 'wireshark-extension', 'proxy-extension']
+
+
+def compile_signatures(signatures):
+    """
+    ساخت یک regex ترکیبی با یک گروه نام‌دار برای هر دسته
+
+    برای هر رشته فقط یک بار پیمایش انجام می‌شود و دسته‌های پیدا شده از lastgroup
+    تطابق‌ها خوانده می‌شوند.
+    """
+    groups = [
+        f'(?P<{name}>{"|".join(re.escape(word) for word in words)})'
+        for name, words in signatures.items()
+        if words
+    ]
+    return re.compile('|'.join(groups)) if groups else None
+
+
+def match_signatures(pattern, value):
+    """دسته‌های امضای پیدا شده در value"""
+    if pattern is None or not value:
+        return frozenset()
+    return frozenset(match.lastgroup for match in pattern.finditer(value))
+
+
+def get_client_ip(request):
+    """دریافت IP واقعی کلاینت (از SecurityContext در صورت وجود)"""
+    context = getattr(request, 'security_context', None)
+    if context is not None:
+        return context.ip
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        return x_forwarded_for.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR')
+
+
+class SecurityContext:
+    """اطلاعات امنیتی درخواست که یک بار محاسبه و بین مراحل به اشتراک گذاشته می‌شود"""
+
+    __slots__ = ('ip', 'user_agent', 'path', 'user_agent_signatures', 'path_signatures')
+
+    def __init__(self, request, user_agent_pattern, path_pattern):
+        self.ip = get_client_ip(request)
+        self.user_agent = request.META.get('HTTP_USER_AGENT', '').lower()
+        self.path = request.path.lower()
+        self.user_agent_signatures = match_signatures(user_agent_pattern, self.user_agent)
+        self.path_signatures = match_signatures(path_pattern, self.path)
+
+
+class SecurityStage:
+    """
+    کلاس پایه مراحل pipeline
+
+    - headers: هدرهای ثابتی که روی همه پاسخ‌ها اعمال می‌شوند
+    - remove_headers: هدرهایی که از پاسخ حذف می‌شوند
+    - process_request: برگرداندن HttpResponse یعنی رد درخواست
+    - process_response: تغییرات وابسته به پاسخ (مثلاً نوع محتوا)
+    """
+
+    headers = {}
+    remove_headers = ()
+
+    def process_request(self, request, context):
+        return None
+
+    def process_response(self, request, context, response):
+        return response
+
+
+class BlockedIPStage(SecurityStage):
+    """مسدود کردن IP های موجود در BLOCKED_IPS"""
+
+    def __init__(self):
+        self.blocked_ips = frozenset(getattr(settings, 'BLOCKED_IPS', []))
+
+    def process_request(self, request, context):
+        if context.ip in self.blocked_ips:
+            logger.warning(f"Blocked IP attempted access: {context.ip}")
+            return security_response('Access Denied')
+        return None
+
+
+class ScannerSignatureStage(SecurityStage):
+    """مسدود کردن scanner ها بر اساس User-Agent، مسیر و نام پارامترها (SecurityMiddleware)"""
+
+    param_pattern = re.compile('|'.join(re.escape(param) for param in SUSPICIOUS_PARAMS), re.IGNORECASE)
+
+    def process_request(self, request, context):
+        if 'scanner' in context.user_agent_signatures:
+            logger.warning(f"Suspicious user agent blocked: {context.user_agent} from IP: {context.ip}")
+            return security_response('Access Denied')
+
+        if 'scanner' in context.path_signatures or any(
+            self.param_pattern.search(param) for param in request.GET
+        ):
+            logger.warning(f"Suspicious request blocked from IP: {context.ip}")
+            return security_response('Access Denied')
+
+        return None
+
+
+class NetworkToolStage(SecurityStage):
+    """لاگ کردن ابزارهای تحلیل شبکه بدون مسدودسازی (LightNetworkSecurityMiddleware)"""
+
+    def process_request(self, request, context):
+        if 'network_tool' in context.user_agent_signatures:
+            logger.info(f"Security tool detected: {context.user_agent} from IP: {context.ip}")
+        return None
+
+
+class RequestPrivacyStage(SecurityStage):
+    """پاک کردن User-Agent و Referer ابزارهای مشکوک (RequestPrivacyMiddleware)"""
+
+    headers = {'Server': 'HeyVoonak'}
+    remove_headers = ('X-Powered-By',)
+
+    def process_request(self, request, context):
+        if 'scanner' in context.user_agent_signatures:
+            request.META['HTTP_USER_AGENT'] = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+        referer = request.META.get('HTTP_REFERER')
+        if referer and any(ext in referer for ext in SUSPICIOUS_REFERERS):
+            request.META['HTTP_REFERER'] = request.META.get('HTTP_ORIGIN', '')
+        return None
+
+
+class XSSStage(SecurityStage):
+    """بررسی پارامترهای GET و POST برای محتوای مشکوک (XSSProtectionMiddleware)"""
+
+    def __init__(self):
+        from .xss_protection import XSSProtectionMiddleware
+        self.middleware = XSSProtectionMiddleware(lambda request: None)
+
+    def process_request(self, request, context):
+        return self.middleware.process_request(request)
+
+    def process_response(self, request, context, response):
+        from .xss_protection import add_server_timing
+        if self.middleware.timing_header and hasattr(request, 'xss_scan_ms'):
+            add_server_timing(response, 'xss', request.xss_scan_ms)
+        return response
+
+
+class RateLimitStage(SecurityStage):
+    """محدودیت نرخ درخواست با IP محاسبه شده در context (RateLimitMiddleware)"""
+
+    def __init__(self):
+        from .rate_limit import RateLimitMiddleware
+        self.middleware = RateLimitMiddleware(lambda request: None)
+
+    def process_request(self, request, context):
+        if not self.middleware.enabled:
+            return None
+        return self.middleware.check_request(request, context.ip)
+
+    def process_response(self, request, context, response):
+        self.middleware.add_rate_limit_headers(request, response)
+        return response
+
+
+class SecurityHeadersStage(SecurityStage):
+    """هدرهای امنیتی (SecurityMiddleware)"""
+
+    headers = {
+        'X-Content-Type-Options': 'nosniff',
+        'X-Frame-Options': 'DENY',
+        'X-XSS-Protection': '1; mode=block',
+        'Referrer-Policy': 'strict-origin-when-cross-origin',
+        'X-Permitted-Cross-Domain-Policies': 'none',
+        'Cross-Origin-Embedder-Policy': 'require-corp',
+        'Cross-Origin-Opener-Policy': 'same-origin',
+        'Cross-Origin-Resource-Policy': 'same-origin',
+        'Content-Security-Policy': (
+            "default-src 'self'; "
+            "script-src 'self' 'unsafe-inline' https://cdn.tailwindcss.com https://cdnjs.cloudflare.com https://fonts.googleapis.com; "
+            "style-src 'self' 'unsafe-inline' https://cdn.tailwindcss.com https://cdnjs.cloudflare.com https://fonts.googleapis.com; "
+            "font-src 'self' https://fonts.gstatic.com https://cdnjs.cloudflare.com; "
+            "img-src 'self' data: https:; "
+            "connect-src 'self'; "
+            "frame-ancestors 'none'; "
+            "base-uri 'self'; "
+            "form-action 'self';"
+        ),
+    }
+
+
+class NoCacheStage(SecurityStage):
+    """هدرهای کش مرورگر بر اساس نوع پاسخ (NoCacheMiddleware)"""
+
+    static_extensions = ('.css', '.js', '.jpg', '.png', '.gif', '.svg')
+
+    def process_response(self, request, context, response):
+        if response.has_header('Cache-Control'):
+            # view سیاست کش خود را تعیین کرده است (مثلاً پاسخ‌های دارای ETag)
+            return response
+        if response.get('Content-Type', '').startswith('text/html'):
+            response['Cache-Control'] = 'no-cache, no-store, must-revalidate, max-age=0'
+            response['Pragma'] = 'no-cache'
+            response['Expires'] = '0'
+        elif any(ext in context.path for ext in self.static_extensions):
+            response['Cache-Control'] = 'public, max-age=300'  # 5 دقیقه
+        return response
+
+
+def security_response(message):
+    """ایجاد پاسخ امنیتی (403)"""
+    response = HttpResponse(
+        f'<html><body><h1>{message}</h1></body></html>',
+        status=403,
+        content_type='text/html'
+    )
+    response['X-Content-Type-Options'] = 'nosniff'
+    response['X-Frame-Options'] = 'DENY'
+    response['X-XSS-Protection'] = '1; mode=block'
+    return response
+
+
+DEFAULT_STAGES = [
+    'apps.users.middleware.pipeline.BlockedIPStage',
+    'apps.users.middleware.pipeline.ScannerSignatureStage',
+    'apps.users.middleware.pipeline.NetworkToolStage',
+    'apps.users.middleware.pipeline.RequestPrivacyStage',
+    'apps.users.middleware.pipeline.RateLimitStage',
+    'apps.users.middleware.pipeline.XSSStage',
+    'apps.users.middleware.pipeline.SecurityHeadersStage',
+    'apps.users.middleware.pipeline.NoCacheStage',
+]
+
+
+class SecurityPipelineMiddleware:
+    """
+    Middleware یکپارچه امنیتی
+
+    جایگزین NoCacheMiddleware, RequestPrivacyMiddleware, LightNetworkSecurityMiddleware,
+    SecurityMiddleware, XSSProtectionMiddleware و RateLimitMiddleware در MIDDLEWARE.
+    باید بعد از AuthenticationMiddleware قرار بگیرد (معافیت superuser در Rate Limit).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+        stage_paths = getattr(settings, 'SECURITY_PIPELINE_STAGES', DEFAULT_STAGES)
+        self.stages = [import_string(path)() for path in stage_paths]
+
+        self.user_agent_pattern = compile_signatures(USER_AGENT_SIGNATURES)
+        self.path_pattern = compile_signatures(PATH_SIGNATURES)
+
+        # ادغام هدرهای ثابت همه مراحل (مرحله بعدی مقدار قبلی را بازنویسی می‌کند)
+        self.headers = {}
+        self.remove_headers = set()
+        for stage in self.stages:
+            self.headers.update(stage.headers)
+            self.remove_headers.update(stage.remove_headers)
+
+        # فقط مراحلی که واقعاً پردازش انجام می‌دهند در حلقه‌های درخواست/پاسخ اجرا می‌شوند
+        self.request_stages = [
+            stage for stage in self.stages
+            if type(stage).process_request is not SecurityStage.process_request
+        ]
+        self.response_stages = [
+            stage for stage in self.stages
+            if type(stage).process_response is not SecurityStage.process_response
+        ]
+
+    def __call__(self, request):
+        context = SecurityContext(request, self.user_agent_pattern, self.path_pattern)
+        request.security_context = context
+
+        for stage in self.request_stages:
+            response = stage.process_request(request, context)
+            if response is not None:
+                return response
+
+        response = self.get_response(request)
+
+        for header in self.remove_headers:
+            if header in response:
+                del response[header]
+        for header, value in self.headers.items():
+            response[header] = value
+
+        for stage in self.response_stages:
+            response = stage.process_response(request, context, response)
+
+        return response
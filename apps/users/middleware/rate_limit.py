@@ -5,8 +5,8 @@ Rate Limiting Middleware برای محافظت در برابر حملات DDoS
 from django.core.cache import cache
 from django.http import JsonResponse, HttpResponse
 from django.conf import settings
-import time
 from datetime import datetime, timedelta
+from apps.users.services.rate_limiter import get_rate_limiter
 
 class RateLimitMiddleware:
     """
@@ -17,6 +17,7 @@ class RateLimitMiddleware:
     - RATE_LIMIT_MAX_REQUESTS: حداکثر تعداد درخواست
     - RATE_LIMIT_WINDOW_SECONDS: بازه زمانی (ثانیه)
     - RATE_LIMIT_BLOCK_DURATION: مدت زمان مسدود کردن (ثانیه)
+    - RATE_LIMIT_ALGORITHM: الگوریتم (fixed_window / sliding_window)
     """
     
     def __init__(self, get_response):
@@ -34,12 +35,29 @@ class RateLimitMiddleware:
             '/register/': {'max_requests': 20, 'window': 60},
             '/api/': {'max_requests': 200, 'window': 60},
         }
+        
+        # یک limiter برای هر ترکیب (حداکثر درخواست، بازه)
+        self._limiters = {}
     
     def __call__(self, request):
         # اگر غیرفعال است، ادامه بده
         if not self.enabled:
             return self.get_response(request)
         
+        # دریافت IP کاربر
+        ip_address = self.get_client_ip(request)
+        
+        blocked_response = self.check_request(request, ip_address)
+        if blocked_response is not None:
+            return blocked_response
+        
+        response = self.get_response(request)
+        self.add_rate_limit_headers(request, response)
+        
+        return response
+    
+    def is_exempt(self, request):
+        """بررسی معاف بودن درخواست از Rate Limit"""
         # مسیرهایی که نیاز به Rate Limit ندارند
         exempt_paths = [
             '/static/',
@@ -50,14 +68,23 @@ class RateLimitMiddleware:
         # بررسی اینکه آیا مسیر از Rate Limit معاف است
         for exempt_path in exempt_paths:
             if request.path.startswith(exempt_path):
-                return self.get_response(request)
+                return True
         
         # اگر کاربر ادمین است، معاف است
         if hasattr(request, 'user') and request.user.is_authenticated and request.user.is_superuser:
-            return self.get_response(request)
+            return True
         
-        # دریافت IP کاربر
-        ip_address = self.get_client_ip(request)
+        return False
+    
+    def check_request(self, request, ip_address):
+        """
+        بررسی مسدودیت و Rate Limit درخواست
+        
+        Returns:
+            HttpResponse در صورت رد درخواست، در غیر این صورت None
+        """
+        if self.is_exempt(request):
+            return None
         
         # بررسی اینکه آیا IP مسدود شده است
         if self.is_blocked(ip_address):
@@ -69,15 +96,16 @@ class RateLimitMiddleware:
             self.block_ip(ip_address)
             return self.rate_limit_exceeded_response(request, ip_address)
         
-        response = self.get_response(request)
-        
-        # اضافه کردن header های Rate Limit
-        remaining = self.get_remaining_requests(request, ip_address)
-        response['X-RateLimit-Limit'] = str(self.get_max_requests(request.path))
-        response['X-RateLimit-Remaining'] = str(max(0, remaining))
-        response['X-RateLimit-Reset'] = str(int(time.time()) + self.get_window_seconds(request.path))
-        
-        return response
+        return None
+    
+    def add_rate_limit_headers(self, request, response):
+        """اضافه کردن header های Rate Limit (از نتیجه همان بررسی، بدون خواندن دوباره کش)"""
+        result = getattr(request, '_rate_limit_result', None)
+        if result is None:
+            return
+        response['X-RateLimit-Limit'] = str(result.limit)
+        response['X-RateLimit-Remaining'] = str(max(0, result.remaining))
+        response['X-RateLimit-Reset'] = str(result.reset)
     
     def get_client_ip(self, request):
         """دریافت IP واقعی کاربر"""
@@ -102,26 +130,29 @@ class RateLimitMiddleware:
                 return limits['window']
         return self.window_seconds
     
+    def get_limiter(self, path):
+        """دریافت limiter مربوط به محدودیت‌های مسیر"""
+        limits = (self.get_max_requests(path), self.get_window_seconds(path))
+        if limits not in self._limiters:
+            self._limiters[limits] = get_rate_limiter(*limits, prefix='rate_limit')
+        return self._limiters[limits]
+    
     def check_rate_limit(self, request, ip_address):
         """بررسی اینکه آیا کاربر از محدودیت تجاوز کرده"""
         path = request.path
-        max_requests = self.get_max_requests(path)
-        window = self.get_window_seconds(path)
         
         # کلید برای cache
         cache_key = self.get_rate_limit_key(ip_address, path)
         
         try:
-            # دریافت تعداد درخواست‌های فعلی
-            request_count = cache.get(cache_key, 0)
+            # ثبت درخواست و بررسی محدودیت با عملیات اتمیک کش
+            result = self.get_limiter(path).hit(cache_key)
+            request._rate_limit_result = result
             
-            if request_count >= max_requests:
+            if not result.allowed:
                 self.log_rate_limit_event(ip_address, path, 'exceeded')
                 return False
             
-            # افزایش شمارنده
-            cache.set(cache_key, request_count + 1, window)
-            
             return True
         
         except Exception as e:
@@ -131,15 +162,10 @@ class RateLimitMiddleware:
     
     def get_remaining_requests(self, request, ip_address):
         """دریافت تعداد درخواست‌های باقی‌مانده"""
-        path = request.path
-        max_requests = self.get_max_requests(path)
-        cache_key = self.get_rate_limit_key(ip_address, path)
-        
-        try:
-            request_count = cache.get(cache_key, 0)
-            return max_requests - request_count
-        except:
-            return max_requests
+        result = getattr(request, '_rate_limit_result', None)
+        if result is None:
+            return self.get_max_requests(request.path)
+        return result.remaining
     
     def is_blocked(self, ip_address):
         """بررسی اینکه آیا IP مسدود شده"""
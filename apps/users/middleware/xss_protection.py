@@ -1,51 +1,144 @@
 from django.utils.deprecation import MiddlewareMixin
 from django.http import HttpResponse
+from django.conf import settings
 import re
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# الگوهای محتوای مشکوک؛ یک بار در یک regex ترکیبی کامپایل می‌شوند
+SUSPICIOUS_PATTERNS = [
+    r'<script[^>]*>.*?</script>',
+    r'javascript:',
+    r'on\w+\s*=',
+    r'<iframe[^>]*>',
+    r'<object[^>]*>',
+    r'<embed[^>]*>',
+    r'<link[^>]*>',
+    r'<meta[^>]*>',
+    r'<style[^>]*>.*?</style>',
+    r'expression\s*\(',
+    r'url\s*\(',
+    r'@import',
+]
+
+SUSPICIOUS_RE = re.compile('|'.join(f'(?:{pattern})' for pattern in SUSPICIOUS_PATTERNS), re.IGNORECASE)
+
+# کاراکترهایی که حداقل یکی از آن‌ها در هر تطابق وجود دارد؛ مقادیر بدون آن‌ها اسکن نمی‌شوند
+TRIGGER_CHARS = frozenset('<:=(@')
+
+
+class XSSScanner:
+    """
+    اسکنر محتوای مشکوک پارامترهای درخواست
+
+    تنظیمات در settings.py:
+    - XSS_SCAN_MAX_BYTES: حداکثر حجم مقادیر قابل اسکن در هر درخواست (پیش‌فرض 64KB)؛
+      درخواست‌های بزرگ‌تر با 413 رد می‌شوند و هیچ مقداری بدون اسکن نمی‌ماند
+    - XSS_SCAN_EXEMPT_PATHS: پیشوند مسیرهای معاف
+    - XSS_SCAN_EXEMPT_CONTENT_TYPES: نوع محتواهایی که Django آن‌ها را در request.POST
+      پردازش نمی‌کند (multipart اسکن می‌شود؛ فایل‌ها در request.FILES هستند)
+    """
+
+    SUSPICIOUS = 'suspicious'
+    TOO_LARGE = 'too_large'
+
+    def __init__(self):
+        self.max_bytes = getattr(settings, 'XSS_SCAN_MAX_BYTES', 64 * 1024)
+        self.exempt_paths = tuple(getattr(settings, 'XSS_SCAN_EXEMPT_PATHS', ['/static/', '/media/']))
+        self.exempt_content_types = tuple(getattr(
+            settings, 'XSS_SCAN_EXEMPT_CONTENT_TYPES',
+            ['application/json', 'application/octet-stream']
+        ))
+
+    def is_exempt(self, request):
+        return request.path.startswith(self.exempt_paths)
+
+    def should_scan_body(self, request):
+        """آیا بدنه POST باید پردازش و اسکن شود؟"""
+        if request.method != 'POST':
+            return False
+        content_type = request.META.get('CONTENT_TYPE', '')
+        return not content_type.startswith(self.exempt_content_types)
+
+    def iter_values(self, request):
+        """همه مقادیر پارامترها (شامل مقادیر تکراری یک کلید)"""
+        for values in request.GET.lists():
+            yield from values[1]
+        if self.should_scan_body(request):
+            for values in request.POST.lists():
+                yield from values[1]
+
+    def scan(self, request):
+        """
+        بررسی پارامترهای GET و POST
+
+        فقط مقادیر دارای TRIGGER_CHARS می‌توانند با الگوها تطابق داشته باشند و از
+        بودجه کم می‌کنند؛ در صورت عبور از بودجه درخواست رد می‌شود.
+
+        Returns:
+            None، SUSPICIOUS یا TOO_LARGE
+        """
+        budget = self.max_bytes
+        for value in self.iter_values(request):
+            if not isinstance(value, str) or TRIGGER_CHARS.isdisjoint(value):
+                continue
+            budget -= len(value)
+            if budget < 0:
+                logger.warning(f"XSS scan limit exceeded for {request.path}")
+                return self.TOO_LARGE
+            if SUSPICIOUS_RE.search(value):
+                return self.SUSPICIOUS
+        return None
+
 
 class XSSProtectionMiddleware(MiddlewareMixin):
     """
     Middleware برای محافظت در برابر حملات XSS
+
+    زمان اسکن هر درخواست (میلی‌ثانیه) در request.xss_scan_ms ثبت می‌شود و در صورت
+    فعال بودن XSS_SCAN_TIMING_HEADER در هدر Server-Timing برگردانده می‌شود.
     """
-    
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.scanner = XSSScanner()
+        self.timing_header = getattr(settings, 'XSS_SCAN_TIMING_HEADER', False)
+
     def process_request(self, request):
-        # بررسی پارامترهای GET و POST برای محتوای مشکوک
-        suspicious_patterns = [
-            r'<script[^>]*>.*?</script>',
-            r'javascript:',
-            r'on\w+\s*=',
-            r'<iframe[^>]*>',
-            r'<object[^>]*>',
-            r'<embed[^>]*>',
-            r'<link[^>]*>',
-            r'<meta[^>]*>',
-            r'<style[^>]*>.*?</style>',
-            r'expression\s*\(',
-            r'url\s*\(',
-            r'@import',
-        ]
-        
-        # بررسی GET parameters
-        for key, value in request.GET.items():
-            if isinstance(value, str):
-                for pattern in suspicious_patterns:
-                    if re.search(pattern, value, re.IGNORECASE):
-                        return HttpResponse('Suspicious content detected', status=400)
-        
-        # بررسی POST parameters
-        if request.method == 'POST':
-            for key, value in request.POST.items():
-                if isinstance(value, str):
-                    for pattern in suspicious_patterns:
-                        if re.search(pattern, value, re.IGNORECASE):
-                            return HttpResponse('Suspicious content detected', status=400)
-        
+        if self.scanner.is_exempt(request):
+            return None
+
+        start = time.perf_counter()
+        verdict = self.scanner.scan(request)
+        request.xss_scan_ms = (time.perf_counter() - start) * 1000
+
+        if verdict == XSSScanner.SUSPICIOUS:
+            return HttpResponse('Suspicious content detected', status=400)
+        if verdict == XSSScanner.TOO_LARGE:
+            return HttpResponse('Request content too large to verify', status=413)
+
         return None
-    
+
     def process_response(self, request, response):
         # اضافه کردن هدرهای امنیتی
         response['X-XSS-Protection'] = '1; mode=block'
         response['X-Content-Type-Options'] = 'nosniff'
         response['X-Frame-Options'] = 'DENY'
         response['Referrer-Policy'] = 'strict-origin-when-cross-origin'
-        
+
+        if self.timing_header and hasattr(request, 'xss_scan_ms'):
+            add_server_timing(response, 'xss', request.xss_scan_ms)
+
         return response
+
+
+def add_server_timing(response, name, duration_ms, description=None):
+    """افزودن یک مقدار به هدر Server-Timing"""
+    entry = f'{name};dur={duration_ms:.2f}'
+    if description:
+        entry = f'{name};desc="{description}";dur={duration_ms:.2f}'
+    existing = response.get('Server-Timing')
+    response['Server-Timing'] = f'{existing}, {entry}' if existing else entry
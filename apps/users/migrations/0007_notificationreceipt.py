@@ -0,0 +1,32 @@
+# Generated manually
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_add_database_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_read', models.BooleanField(default=False, verbose_name='خوانده شده')),
+                ('read_at', models.DateTimeField(blank=True, null=True, verbose_name='زمان خواندن')),
+                ('is_deleted', models.BooleanField(default=False, verbose_name='حذف شده')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='زمان ایجاد')),
+                ('notification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receipts', to='users.notification', verbose_name='اعلان')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_receipts', to=settings.AUTH_USER_MODEL, verbose_name='کاربر')),
+            ],
+            options={
+                'verbose_name': 'وضعیت اعلان کاربر',
+                'verbose_name_plural': 'وضعیت اعلان‌های کاربران',
+                'unique_together': {('notification', 'user')},
+            },
+        ),
+    ]
@@ -1,4 +1,7 @@
 from django.db import models
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 from django.conf import settings
@@ -114,13 +117,15 @@ class Subscription(models.Model):
         return f"{self.user.get_full_name()} - {self.get_subscription_type_display()}"
     
     def is_active(self):
-        """بررسی فعال بودن اشتراک"""
+        """
+        بررسی فعال بودن اشتراک
+        
+        تغییر وضعیت اشتراک‌های منقضی شده با دستور expire_subscriptions انجام می‌شود.
+        """
         if self.status != 'active':
             return False
         
         if self.end_date and timezone.now() > self.end_date:
-            self.status = 'expired'
-            self.save(update_fields=['status'])
             return False
         
         return True
@@ -199,6 +204,101 @@ class Notification(models.Model):
         self.read_at = timezone.now()
         self.save(update_fields=['is_read', 'read_at'])
     
+    @property
+    def is_shared_broadcast(self):
+        """اعلان عمومی که یک بار برای همه کاربران ذخیره شده است"""
+        return self.is_broadcast and self.recipient_id is None
+    
+    @classmethod
+    def for_user(cls, user):
+        """
+        اعلان‌های مستقیم و عمومی قابل مشاهده برای کاربر در یک query
+        
+        وضعیت خوانده شدن اعلان‌های عمومی از NotificationReceipt همان کاربر
+        (با LEFT JOIN) خوانده می‌شود و در فیلد user_is_read قرار می‌گیرد.
+        """
+        from django.db.models import Q, F, Case, When, BooleanField, FilteredRelation
+        
+        return cls.objects.filter(
+            Q(recipient=user) | Q(is_broadcast=True, recipient__isnull=True),
+            is_active=True,
+        ).exclude(
+            expires_at__lt=timezone.now()
+        ).annotate(
+            user_receipt=FilteredRelation('receipts', condition=Q(receipts__user=user)),
+        ).filter(
+            Q(user_receipt__is_deleted__isnull=True) | Q(user_receipt__is_deleted=False)
+        ).annotate(
+            user_is_read=Case(
+                When(recipient__isnull=False, then=F('is_read')),
+                When(user_receipt__is_read=True, then=True),
+                default=False,
+                output_field=BooleanField(),
+            ),
+        )
+    
+    def mark_as_read_for(self, user):
+        """علامت‌گذاری به عنوان خوانده شده برای یک کاربر"""
+        if not self.is_shared_broadcast:
+            self.mark_as_read()
+            return
+        NotificationReceipt.objects.update_or_create(
+            notification=self,
+            user=user,
+            defaults={'is_read': True, 'read_at': timezone.now()},
+        )
+    
+    def delete_for(self, user):
+        """حذف اعلان برای یک کاربر (اعلان عمومی فقط برای همان کاربر پنهان می‌شود)"""
+        if not self.is_shared_broadcast:
+            self.delete()
+            return
+        NotificationReceipt.objects.update_or_create(
+            notification=self,
+            user=user,
+            defaults={'is_deleted': True},
+        )
+    
+    @classmethod
+    def mark_all_as_read_for(cls, user):
+        """علامت‌گذاری همه اعلان‌های مستقیم و عمومی کاربر به عنوان خوانده شده"""
+        now = timezone.now()
+        cls.objects.filter(recipient=user, is_read=False).update(is_read=True, read_at=now)
+        
+        unread_broadcasts = list(
+            cls.for_user(user).filter(recipient__isnull=True, user_is_read=False).values_list('id', flat=True)
+        )
+        if unread_broadcasts:
+            NotificationReceipt.objects.filter(
+                user=user, notification_id__in=unread_broadcasts
+            ).update(is_read=True, read_at=now)
+            NotificationReceipt.objects.bulk_create(
+                [
+                    NotificationReceipt(notification_id=notification_id, user=user, is_read=True, read_at=now)
+                    for notification_id in unread_broadcasts
+                ],
+                ignore_conflicts=True,
+            )
+
+
+class NotificationReceipt(models.Model):
+    """وضعیت خوانده شدن/حذف یک اعلان عمومی برای هر کاربر (فقط برای کاربرانی که تغییری داده‌اند)"""
+    
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name='receipts', verbose_name='اعلان')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notification_receipts', verbose_name='کاربر')
+    is_read = models.BooleanField(default=False, verbose_name='خوانده شده')
+    read_at = models.DateTimeField(null=True, blank=True, verbose_name='زمان خواندن')
+    is_deleted = models.BooleanField(default=False, verbose_name='حذف شده')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='زمان ایجاد')
+    
+    class Meta:
+        verbose_name = 'وضعیت اعلان کاربر'
+        verbose_name_plural = 'وضعیت اعلان‌های کاربران'
+        unique_together = ('notification', 'user')
+    
+    def __str__(self):
+        return f"{self.notification_id} - {self.user_id}"
+    
 
 class Payment(models.Model):
     """مدل پرداخت"""
@@ -432,6 +532,9 @@ class SubscriptionPlan(models.Model):
 class Cart(models.Model):
     """سبد خرید کاربر"""
     
+    # شمارنده کش شده تعداد آیتم‌ها برای نشان سبد خرید در هدر
+    COUNT_CACHE_KEY = 'cart_count:{user_id}'
+    
     user = models.OneToOneField(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -474,6 +577,31 @@ class Cart(models.Model):
     def clear(self):
         """خالی کردن سبد"""
         self.items.all().delete()
+        self.set_cached_count(self.user_id, 0)
+    
+    def refresh_cached_count(self):
+        """شمارش دوباره آیتم‌ها و به‌روزرسانی شمارنده کش شده (بعد از هر تغییر سبد)"""
+        count = self.items_count
+        self.set_cached_count(self.user_id, count)
+        return count
+    
+    @classmethod
+    def set_cached_count(cls, user_id, count):
+        timeout = getattr(settings, 'CART_COUNT_CACHE_TIMEOUT', 60 * 60 * 24)
+        cache.set(cls.COUNT_CACHE_KEY.format(user_id=user_id), count, timeout)
+    
+    @classmethod
+    def get_cached_count(cls, user_id):
+        """
+        تعداد آیتم‌های سبد کاربر از کش
+        
+        در صورت نبود در کش با یک query شمرده می‌شود (بدون خواندن خود Cart).
+        """
+        count = cache.get(cls.COUNT_CACHE_KEY.format(user_id=user_id))
+        if count is None:
+            count = CartItem.objects.filter(cart__user_id=user_id).count()
+            cls.set_cached_count(user_id, count)
+        return count
 
 
 class CartItem(models.Model):
@@ -566,3 +694,16 @@ class OTPVerification(models.Model):
     
     def __str__(self):
         return f"{self.phone_number} - {self.get_purpose_display()}"
+
+
+@receiver(post_save, sender=Subscription)
+def refresh_subscription_entitlement(sender, instance, **kwargs):
+    """به‌روزرسانی کش دسترسی اشتراک کاربر (پرداخت، تمدید، فعال‌سازی)"""
+    from apps.users.services.entitlement import SubscriptionEntitlement
+    SubscriptionEntitlement.refresh(instance.user_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def invalidate_subscription_entitlement(sender, instance, **kwargs):
+    from apps.users.services.entitlement import SubscriptionEntitlement
+    SubscriptionEntitlement.invalidate(instance.user_id)
@@ -3,6 +3,12 @@
 """
 from .zarinpal import ZarinpalService
 from .sms import SMSService, OTPManager
+from .rate_limiter import get_rate_limiter, FixedWindowLimiter, SlidingWindowCounterLimiter
+from .entitlement import SubscriptionEntitlement
 
-__all__ = ['ZarinpalService', 'SMSService', 'OTPManager']
+__all__ = [
+    'ZarinpalService', 'SMSService', 'OTPManager',
+    'get_rate_limiter', 'FixedWindowLimiter', 'SlidingWindowCounterLimiter',
+    'SubscriptionEntitlement',
+]
 
@@ -0,0 +1,78 @@
+"""
+سرویس کش دسترسی اشتراک (entitlement) کاربران
+"""
+import time
+from django.conf import settings
+from django.core.cache import cache
+
+
+class SubscriptionEntitlement:
+    """
+    نگهداری زمان پایان اشتراک فعال هر کاربر در کش
+
+    مقدار کش شده یک timestamp است (0 یعنی بدون اشتراک فعال و inf یعنی مادام‌العمر)؛
+    دکوریتورهای اشتراک فقط همین مقدار را با زمان فعلی مقایسه می‌کنند و انقضا بدون
+    خواندن دیتابیس اعمال می‌شود. با ذخیره یا حذف Subscription، اکشن‌های ادمین و
+    دستور expire_subscriptions مقدار کش دوباره محاسبه یا باطل می‌شود.
+    """
+
+    CACHE_KEY = 'subscription_entitlement:{user_id}'
+    NO_ACCESS = 0
+    LIFETIME = float('inf')
+
+    @classmethod
+    def get_timeout(cls):
+        """حداکثر عمر مقدار کش شده (ثانیه)"""
+        return getattr(settings, 'SUBSCRIPTION_ENTITLEMENT_TIMEOUT', 60 * 60 * 24)
+
+    @classmethod
+    def get_cache_key(cls, user_id):
+        return cls.CACHE_KEY.format(user_id=user_id)
+
+    @classmethod
+    def compute(cls, user_id):
+        """
+        محاسبه زمان پایان اشتراک فعال کاربر از دیتابیس
+
+        Returns:
+            float: timestamp پایان اشتراک، LIFETIME یا NO_ACCESS
+        """
+        from apps.users.models import Subscription
+
+        subscription = Subscription.objects.filter(
+            user_id=user_id, status='active'
+        ).values('end_date').first()
+        if subscription is None:
+            return cls.NO_ACCESS
+        if subscription['end_date'] is None:
+            return cls.LIFETIME
+        return subscription['end_date'].timestamp()
+
+    @classmethod
+    def refresh(cls, user_id):
+        """محاسبه دوباره و ذخیره مقدار کش کاربر"""
+        active_until = cls.compute(user_id)
+        cache.set(cls.get_cache_key(user_id), active_until, cls.get_timeout())
+        return active_until
+
+    @classmethod
+    def get_active_until(cls, user_id):
+        """دریافت زمان پایان اشتراک از کش (در صورت نبود، با یک query محاسبه می‌شود)"""
+        active_until = cache.get(cls.get_cache_key(user_id))
+        if active_until is None:
+            active_until = cls.refresh(user_id)
+        return active_until
+
+    @classmethod
+    def has_access(cls, user):
+        """آیا کاربر اشتراک فعال دارد؟"""
+        return cls.get_active_until(user.id) > time.time()
+
+    @classmethod
+    def invalidate(cls, user_ids):
+        """باطل کردن مقدار کش شده یک یا چند کاربر"""
+        if isinstance(user_ids, int):
+            user_ids = [user_ids]
+        keys = [cls.get_cache_key(user_id) for user_id in user_ids if user_id]
+        if keys:
+            cache.delete_many(keys)
@@ -0,0 +1,126 @@
+"""
+موتور محدودیت نرخ درخواست (Rate Limiter) بر پایه عملیات اتمیک کش
+
+الگوریتم‌ها:
+- fixed_window: یک شمارنده برای هر بازه زمانی
+- sliding_window: شمارنده بازه فعلی + وزن‌دهی شمارنده بازه قبلی (sliding window counter)
+
+هر درخواست فقط با تعداد ثابتی فراخوانی کش (add / incr / get) بررسی می‌شود و حافظه
+مصرفی برای هر شناسه ثابت است. روی Redis عملیات incr اتمیک است؛ در LocMem داخل یک
+پروسه اتمیک است و در FileBasedCache تقریبی است.
+"""
+import time
+from collections import namedtuple
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+
+RateLimitResult = namedtuple('RateLimitResult', ['allowed', 'limit', 'remaining', 'reset'])
+
+
+class BaseRateLimiter:
+    """کلاس پایه الگوریتم‌های محدودیت نرخ"""
+
+    def __init__(self, limit, window, prefix='rate_limit', cache_alias=None):
+        """
+        Args:
+            limit: حداکثر تعداد درخواست در هر بازه
+            window: طول بازه (ثانیه)
+            prefix: پیشوند کلیدهای کش
+            cache_alias: نام کش (پیش‌فرض: RATE_LIMIT_CACHE یا default)
+        """
+        self.limit = limit
+        self.window = max(1, int(window))
+        self.prefix = prefix
+        self.cache = caches[cache_alias or getattr(settings, 'RATE_LIMIT_CACHE', 'default')]
+
+    def hit(self, identifier):
+        """
+        ثبت یک درخواست و بررسی محدودیت
+
+        Returns:
+            RateLimitResult
+        """
+        raise NotImplementedError
+
+    def _window_key(self, identifier, window_index):
+        return f'{self.prefix}:{identifier}:{self.window}:{window_index}'
+
+    def _increment(self, key, timeout):
+        """افزایش اتمیک شمارنده؛ در صورت نبود کلید با add ساخته می‌شود"""
+        self.cache.add(key, 0, timeout)
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # کلید بین add و incr منقضی شده است
+            self.cache.set(key, 1, timeout)
+            return 1
+
+
+class FixedWindowLimiter(BaseRateLimiter):
+    """الگوریتم پنجره ثابت: 2 فراخوانی کش (add + incr) برای هر درخواست"""
+
+    def hit(self, identifier):
+        now = time.time()
+        window_index = int(now // self.window)
+        count = self._increment(self._window_key(identifier, window_index), self.window)
+        reset = (window_index + 1) * self.window
+        return RateLimitResult(
+            allowed=count <= self.limit,
+            limit=self.limit,
+            remaining=max(0, self.limit - count),
+            reset=int(reset),
+        )
+
+
+class SlidingWindowCounterLimiter(BaseRateLimiter):
+    """
+    الگوریتم sliding window counter: 3 فراخوانی کش (add + incr + get) برای هر درخواست
+
+    تعداد تخمینی = شمارنده بازه قبلی × سهم باقیمانده آن + شمارنده بازه فعلی
+    """
+
+    def hit(self, identifier):
+        now = time.time()
+        window_index = int(now // self.window)
+        elapsed = (now % self.window) / self.window
+
+        # شمارنده‌ها دو بازه نگهداری می‌شوند تا در بازه بعد به عنوان بازه قبلی خوانده شوند
+        current = self._increment(self._window_key(identifier, window_index), self.window * 2)
+        previous = self.cache.get(self._window_key(identifier, window_index - 1), 0)
+
+        estimated = previous * (1 - elapsed) + current
+        return RateLimitResult(
+            allowed=estimated <= self.limit,
+            limit=self.limit,
+            remaining=max(0, int(self.limit - estimated)),
+            reset=int((window_index + 1) * self.window),
+        )
+
+
+ALGORITHMS = {
+    'fixed_window': FixedWindowLimiter,
+    'sliding_window': SlidingWindowCounterLimiter,
+}
+
+
+def get_rate_limiter(limit, window, prefix='rate_limit', algorithm=None):
+    """
+    ساخت limiter بر اساس تنظیمات
+
+    Args:
+        limit: حداکثر تعداد درخواست
+        window: طول بازه (ثانیه)
+        prefix: پیشوند کلیدهای کش
+        algorithm: نام الگوریتم (fixed_window / sliding_window) یا مسیر کلاس؛
+                   پیش‌فرض: RATE_LIMIT_ALGORITHM
+
+    Returns:
+        BaseRateLimiter
+    """
+    algorithm = algorithm or getattr(settings, 'RATE_LIMIT_ALGORITHM', 'sliding_window')
+    limiter_class = ALGORITHMS.get(algorithm)
+    if limiter_class is None:
+        limiter_class = import_string(algorithm)
+    return limiter_class(limit, window, prefix=prefix)
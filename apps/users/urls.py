@@ -23,6 +23,7 @@ urlpatterns = [
     path('dermatology/', views.dermatology, name='dermatology'),
     path('radiology/', views.radiology, name='radiology'),
     path('cardiology/', views.cardiology, name='cardiology'),
+    path('category/<str:slug>/', views.category_landing, name='category_landing'),
     
     # User Dashboard URLs
     path('dashboard/', views.dashboard, name='dashboard'),
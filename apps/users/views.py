@@ -11,7 +11,7 @@ from django.contrib import messages
 from django.db.models import Count, Q
 from django.utils import timezone
 from datetime import datetime, timedelta
-from apps.courses.models import Case, CaseCategory, SubCategory, Slide, UserProgress, UserProfile, UserObservation, Bookmark
+from apps.courses.models import Case, Slide, UserProgress, UserProfile, UserObservation, Bookmark
 
 def get_client_ip(request):
     """دریافت IP address کاربر"""
@@ -102,78 +102,33 @@ class CustomLoginView(LoginView):
 def admin_panel(request):
     """پنل ادمین مدرن - فقط برای staff"""
 
-    # دریافت آمار واقعی از دیتابیس
+    # دریافت آمار از snapshot آمار پلتفرم (یک خواندن از کش)
     from django.contrib.auth.models import User
-    from apps.courses.models import Case, CaseCategory, UserProgress, UserProfile
-    from django.utils import timezone
-    from datetime import timedelta
+    from apps.courses.models import UserProgress
+    from apps.courses.services import PlatformMetrics
     
     try:
+        metrics = PlatformMetrics.get()
+        
         # آمار کلی
-        total_cases = Case.objects.count()
-        total_users = User.objects.count()
-        total_categories = CaseCategory.objects.count()
-        completed_cases = UserProgress.objects.filter(completed=True).count()
-        active_users = UserProgress.objects.values('user').distinct().count()
+        total_cases = metrics['total_cases']
+        total_users = metrics['total_users']
+        total_categories = metrics['total_categories']
+        completed_cases = metrics['completed_cases']
+        active_users = metrics['active_users']
         
-        # آمار ماهانه
-        month_ago = timezone.now() - timedelta(days=30)
-        new_students_this_month = User.objects.filter(date_joined__gte=month_ago).count()
-        monthly_completions = UserProgress.objects.filter(
-            completed=True,
-            completed_at__gte=month_ago
-        ).count()
+        # آمار ماهانه و هفتگی
+        new_students_this_month = metrics['new_students_this_month']
+        monthly_completions = metrics['monthly_completions']
+        weekly_completions = metrics['weekly_completions']
+        
+        # آمار تفصیلی دسته‌بندی‌ها و کاربران فعال
+        category_stats = metrics['category_stats']
+        user_stats = metrics['user_stats']
         
         # آمار پیشرفت کاربران
         recent_progress = UserProgress.objects.select_related('user', 'case').order_by('-completed_at')[:10]
         
-        # آمار دسته‌بندی‌ها با جزئیات بیشتر - بهینه‌سازی شده با annotate
-        from django.db.models import Count, Q
-        category_stats = []
-        categories = CaseCategory.objects.annotate(
-            case_count=Count('cases'),
-            completed_count=Count('cases', filter=Q(cases__userprogress__completed=True), distinct=True)
-        )[:5]
-        
-        for category in categories:
-            completion_rate = round((category.completed_count / category.case_count * 100) if category.case_count > 0 else 0, 1)
-            category_stats.append({
-                'name': category.name,
-                'case_count': category.case_count,
-                'completed_count': category.completed_count,
-                'completion_rate': completion_rate
-            })
-        
-        # آمار کاربران فعال با جزئیات بیشتر - بهینه‌سازی شده با annotate
-        user_stats = []
-        users = User.objects.filter(case_progress__isnull=False).annotate(
-            progress_count=Count('case_progress'),
-            completed_count=Count('case_progress', filter=Q(case_progress__completed=True))
-        ).select_related('profile').distinct()[:5]
-        
-        for user in users:
-            try:
-                accuracy = user.profile.overall_accuracy if hasattr(user, 'profile') and user.profile else 0
-            except:
-                accuracy = round((user.completed_count / user.progress_count * 100) if user.progress_count > 0 else 0, 1)
-            
-            user_stats.append({
-                'name': user.get_full_name() or user.username,
-                'username': user.username,
-                'total_cases': user.progress_count,
-                'completed_cases': user.completed_count,
-                'accuracy': accuracy,
-                'last_login': user.last_login,
-                'date_joined': user.date_joined
-            })
-        
-        # آمار هفتگی (آخرین 7 روز)
-        week_ago = timezone.now() - timedelta(days=7)
-        weekly_completions = UserProgress.objects.filter(
-            completed=True,
-            completed_at__gte=week_ago
-        ).count()
-        
         # محاسبه درآمد تخمینی (بر اساس تکمیل کیس‌ها)
         estimated_income = completed_cases * 100  # 100 دلار به ازای هر کیس تکمیل شده
         
@@ -472,23 +427,11 @@ def dadash_home(request):
 
 def categories_home(request):
     """صفحه اصلی کتگوری‌ها - بهینه‌سازی شده"""
-    from django.core.cache import cache
-    
-    # Cache کردن categories برای 10 دقیقه
-    cache_key_categories = 'categories_home_list'
-    categories = cache.get(cache_key_categories)
+    from apps.courses.services import CatalogTree, CaseStats
     
-    if categories is None:
-        categories = list(CaseCategory.objects.annotate(case_count=Count('cases')))
-        cache.set(cache_key_categories, categories, 600)  # 10 دقیقه
-    
-    # Cache کردن total_cases برای 5 دقیقه
-    cache_key_total = 'total_cases_count'
-    total_cases = cache.get(cache_key_total)
-    
-    if total_cases is None:
-        total_cases = Case.objects.count()
-        cache.set(cache_key_total, total_cases, 300)  # 5 دقیقه
+    # درخت دسته‌بندی‌ها و آمار کیس‌ها (کش شده تا تغییر بعدی کاتالوگ)
+    categories = CatalogTree.categories()
+    total_cases = CaseStats.get()['data']['total_cases']
     
     context = {
         'categories': categories,
@@ -496,65 +439,80 @@ def categories_home(request):
     }
     return render(request, 'dadash/index.html', context)
 
-def internal_diseases(request):
-    """صفحه بیماری‌های داخلی"""
-    cases = Case.objects.filter(category__name__icontains='داخلی').prefetch_related('slides')
+def category_landing(request, slug):
+    """صفحه معرفی یک دسته‌بندی (بر اساس slug) با صفحه‌بندی keyset"""
+    from django.core.cache import cache
+    from django.http import Http404
+    from django.template.loader import render_to_string
+    from apps.courses.services import CatalogTree, CategoryLanding
+    
+    category = CatalogTree.find_category(slug=slug)
+    if category is None:
+        raise Http404('Category not found')
+    
+    cursor = request.GET.get('cursor') or None
+    # فقط cursor های امضا شده توسط سرور پذیرفته می‌شوند؛ کاربر نمی‌تواند کلید کش دلخواه بسازد
+    if cursor and CategoryLanding.decode_cursor(cursor, category['id']) is None:
+        cursor = None
+    
+    # HTML لیست کیس‌ها برای هر دسته‌بندی و صفحه تا تغییر بعدی کاتالوگ کش می‌شود
+    fragment_key = CategoryLanding.fragment_key(category['id'], cursor)
+    cases_html = cache.get(fragment_key)
+    if cases_html is None:
+        page = CategoryLanding.page(category['id'], cursor)
+        cases_html = render_to_string('dadash/includes/category_cases.html', {
+            'category': category,
+            'cases': page['cases'],
+            'next_cursor': page['next_cursor'],
+            'is_first_page': cursor is None,
+        }).strip()
+        cache.set(fragment_key, cases_html, CategoryLanding.get_fragment_timeout())
     
     context = {
-        'cases': cases,
-        'category_name': 'بیماری‌های داخلی',
+        'category': category,
+        'category_name': category['name'],
+        'cases_html': cases_html,
     }
-    return render(request, 'dadash/internal-diseases.html', context)
+    return render(request, 'dadash/category_landing.html', context)
 
-def surgery(request):
-    """صفحه جراحی"""
-    cases = Case.objects.filter(category__name__icontains='جراحی').prefetch_related('slides')
+def legacy_category_landing(request, name_part, category_name):
+    """انتقال آدرس‌های قدیمی دسته‌بندی‌ها به صفحه slug دسته‌بندی منطبق"""
+    from apps.courses.services import CatalogTree
+    
+    for category in CatalogTree.categories():
+        if name_part in category['name'] and category['slug']:
+            return redirect('users:category_landing', slug=category['slug'])
     
     context = {
-        'cases': cases,
-        'category_name': 'جراحی',
+        'category': None,
+        'category_name': category_name,
+        'cases_html': '',
     }
-    return render(request, 'dadash/surgery.html', context)
+    return render(request, 'dadash/category_landing.html', context)
+
+def internal_diseases(request):
+    """صفحه بیماری‌های داخلی"""
+    return legacy_category_landing(request, 'داخلی', 'بیماری‌های داخلی')
+
+def surgery(request):
+    """صفحه جراحی"""
+    return legacy_category_landing(request, 'جراحی', 'جراحی')
 
 def emergency(request):
     """صفحه اورژانس"""
-    cases = Case.objects.filter(category__name__icontains='اورژانس').prefetch_related('slides')
-    
-    context = {
-        'cases': cases,
-        'category_name': 'پزشکی اورژانس',
-    }
-    return render(request, 'dadash/emergency.html', context)
+    return legacy_category_landing(request, 'اورژانس', 'پزشکی اورژانس')
 
 def dermatology(request):
     """صفحه پوست‌شناسی"""
-    cases = Case.objects.filter(category__name__icontains='پوست').prefetch_related('slides')
-    
-    context = {
-        'cases': cases,
-        'category_name': 'پوست‌شناسی',
-    }
-    return render(request, 'dadash/dermatology.html', context)
+    return legacy_category_landing(request, 'پوست', 'پوست‌شناسی')
 
 def radiology(request):
     """صفحه رادیولوژی"""
-    cases = Case.objects.filter(category__name__icontains='رادیولوژی').prefetch_related('slides')
-    
-    context = {
-        'cases': cases,
-        'category_name': 'رادیولوژی',
-    }
-    return render(request, 'dadash/radiology.html', context)
+    return legacy_category_landing(request, 'رادیولوژی', 'رادیولوژی')
 
 def cardiology(request):
     """صفحه قلب‌شناسی"""
-    cases = Case.objects.filter(category__name__icontains='قلب').prefetch_related('slides')
-    
-    context = {
-        'cases': cases,
-        'category_name': 'قلب‌شناسی',
-    }
-    return render(request, 'dadash/cardiology.html', context)
+    return legacy_category_landing(request, 'قلب', 'قلب‌شناسی')
 
 def landing_page(request):
     """لندینگ پیج جدید BBros"""
@@ -563,20 +521,17 @@ def landing_page(request):
 def get_subcategories_api(request, category_id):
     """API برای دریافت subcategories یک دسته‌بندی"""
     try:
-        from django.db.models import Count
+        from apps.courses.services import CatalogTree
         
-        # دریافت subcategories برای دسته‌بندی مشخص
-        subcategories = SubCategory.objects.filter(
-            category_id=category_id
-        ).annotate(
-            case_count=Count('cases')
-        ).values(
-            'id', 'name', 'description', 'case_count'
-        ).order_by('name')
+        # دریافت subcategories برای دسته‌بندی مشخص از درخت کش شده کاتالوگ
+        subcategories = [
+            {key: sub[key] for key in ('id', 'name', 'description', 'case_count')}
+            for sub in CatalogTree.subcategories(category_id=category_id)
+        ]
         
         return JsonResponse({
             'success': True,
-            'subcategories': list(subcategories)
+            'subcategories': subcategories
         })
     except Exception as e:
         return JsonResponse({
@@ -690,7 +645,6 @@ def remove_bookmark_api(request, bookmark_id):
 def categories_page(request):
     """صفحه کتگوری‌ها و ساب کتگوری‌ها - نسخه با دیتابیس واقعی"""
     from django.core.paginator import Paginator
-    from django.db.models import Count
     
     # دریافت پارامترهای فیلتر
     selected_category = request.GET.get('category', 'all')
@@ -698,32 +652,18 @@ def categories_page(request):
     page_number = int(request.GET.get('page', 1))
     
     try:
-        # دریافت همه کتگوری‌ها از دیتابیس
-        categories = CaseCategory.objects.annotate(
-            subcategory_count=Count('subcategories')
-        ).order_by('name')
-        
-        # فیلتر ساب کتگوری‌ها
-        subcategories_query = SubCategory.objects.annotate(
-            case_count=Count('cases')
-        ).select_related('category')
+        # کتگوری‌ها و ساب کتگوری‌ها (با تعداد کیس‌ها) از درخت کش شده کاتالوگ
+        from apps.courses.services import CatalogTree
+        categories = CatalogTree.categories()
         
-        # فیلتر بر اساس کتگوری انتخاب شده
+        # فیلتر بر اساس کتگوری انتخاب شده و جستجو
+        category_id = None
         if selected_category != 'all':
             try:
                 category_id = int(selected_category)
-                subcategories_query = subcategories_query.filter(category_id=category_id)
             except (ValueError, TypeError):
                 pass
-        
-        # فیلتر بر اساس جستجو
-        if search_query:
-            subcategories_query = subcategories_query.filter(
-                name__icontains=search_query
-            )
-        
-        # مرتب‌سازی
-        subcategories_query = subcategories_query.order_by('name')
+        subcategories_query = CatalogTree.subcategories(category_id=category_id, search=search_query)
         
         # صفحه‌بندی
         paginator = Paginator(subcategories_query, 30)  # 30 آیتم در هر صفحه
@@ -874,10 +814,8 @@ def designali_dashboard(request):
         completion_percentage = stats['completion_percentage']
     
     # دریافت محبوب‌ترین دسته‌بندی‌ها - بهینه‌سازی شده
-    from django.db.models import Count
-    popular_categories = CaseCategory.objects.annotate(
-        case_count=Count('cases')
-    ).order_by('-case_count')[:5]
+    from apps.courses.services import CatalogTree
+    popular_categories = sorted(CatalogTree.categories(), key=lambda category: -category['case_count'])[:5]
     
     context = {
         'profile': {
@@ -914,40 +852,40 @@ def my_cases(request):
     # فیلتر کیس‌ها
     cases_query = Case.objects.filter(is_published=True)
     
-    if search_query:
-        cases_query = cases_query.filter(
-            Q(title__icontains=search_query) | 
-            Q(summary__icontains=search_query)
-        )
-    
     if category_filter != 'all':
         cases_query = cases_query.filter(category_id=category_filter)
     
-    # دریافت پیشرفت کاربر برای هر کیس
-    user_cases = []
-    for case in cases_query:
-        progress = UserProgress.objects.filter(user=user, case=case).first()
-        user_cases.append({
-            'case': case,
-            'progress': progress,
-            'is_completed': progress.completed if progress else False,
-            'score': progress.score if progress else None,
-            'attempts': progress.attempts if progress else 0,
-        })
+    # وضعیت کاربر برای هر کیس و فیلتر وضعیت در همان query کیس‌ها
+    from django.core.paginator import Paginator
+    from apps.courses.services import UserCaseStatus, CaseSearch
+
+    if search_query:
+        # نتایج جستجو بر اساس rank مرتب می‌شوند
+        cases_query = UserCaseStatus.for_user(user, CaseSearch.search(cases_query, search_query), status_filter)
+    else:
+        cases_query = UserCaseStatus.for_user(user, cases_query, status_filter).order_by('id')
+    paginator = Paginator(cases_query, 30)  # 30 آیتم در هر صفحه
+    page_obj = paginator.get_page(request.GET.get('page'))
     
-    # فیلتر بر اساس وضعیت
-    if status_filter == 'completed':
-        user_cases = [uc for uc in user_cases if uc['is_completed']]
-    elif status_filter == 'in_progress':
-        user_cases = [uc for uc in user_cases if not uc['is_completed'] and uc['attempts'] > 0]
-    elif status_filter == 'not_started':
-        user_cases = [uc for uc in user_cases if uc['attempts'] == 0]
+    user_cases = [
+        {
+            'case': case,
+            'is_completed': case.is_completed,
+            'score': case.score,
+            'attempts': case.attempts,
+            'completed_at': case.completed_at,
+        }
+        for case in page_obj
+    ]
     
     # دسته‌بندی‌ها برای فیلتر
-    categories = CaseCategory.objects.annotate(case_count=Count('cases')).order_by('name')
+    from apps.courses.services import CatalogTree
+    categories = CatalogTree.categories()
     
     context = {
         'user_cases': user_cases,
+        'page_obj': page_obj,
+        'total_count': paginator.count,
         'categories': categories,
         'status_filter': status_filter,
         'category_filter': category_filter,
@@ -962,75 +900,17 @@ def analytics(request):
     user = request.user
     profile, created = UserProfile.objects.get_or_create(user=user)
     
-    # آمار کلی
-    total_progress = UserProgress.objects.filter(user=user)
-    completed_progress = total_progress.filter(completed=True)
-    
-    # آمار دسته‌بندی‌ها
-    category_stats = []
-    categories = CaseCategory.objects.all()
-    for category in categories:
-        category_cases = Case.objects.filter(category=category, is_published=True)
-        user_category_progress = UserProgress.objects.filter(
-            user=user, 
-            case__in=category_cases
-        )
-        completed_in_category = user_category_progress.filter(completed=True).count()
-        
-        category_stats.append({
-            'category': category,
-            'total_cases': category_cases.count(),
-            'completed': completed_in_category,
-            'completion_rate': round((completed_in_category / category_cases.count() * 100) if category_cases.count() > 0 else 0, 1),
-        })
-    
-    # آمار ماهانه (آخرین 12 ماه)
-    monthly_stats = []
-    for i in range(12):
-        month_start = timezone.now().replace(day=1) - timedelta(days=30*i)
-        month_end = month_start + timedelta(days=30)
-        
-        monthly_completed = UserProgress.objects.filter(
-            user=user,
-            completed=True,
-            completed_at__gte=month_start,
-            completed_at__lt=month_end
-        ).count()
-        
-        monthly_stats.append({
-            'month': month_start.strftime('%Y-%m'),
-            'completed': monthly_completed,
-        })
-    
-    monthly_stats.reverse()
-    
-    # آمار هفتگی (آخرین 8 هفته)
-    weekly_stats = []
-    for i in range(8):
-        week_start = timezone.now() - timedelta(days=7*(i+1))
-        week_end = timezone.now() - timedelta(days=7*i)
-        
-        weekly_completed = UserProgress.objects.filter(
-            user=user,
-            completed=True,
-            completed_at__gte=week_start,
-            completed_at__lt=week_end
-        ).count()
-        
-        weekly_stats.append({
-            'week': f'هفته {8-i}',
-            'completed': weekly_completed,
-        })
-    
-    weekly_stats.reverse()
+    # آمار دسته‌بندی‌ها و نمودارهای ماهانه/هفتگی با query های گروهی (کش شده برای هر کاربر)
+    from apps.courses.services import UserAnalytics
+    stats = UserAnalytics.get(user.id)
     
     context = {
         'profile': profile,
-        'total_progress': total_progress.count(),
-        'completed_progress': completed_progress.count(),
-        'category_stats': category_stats,
-        'monthly_stats': monthly_stats,
-        'weekly_stats': weekly_stats,
+        'total_progress': stats['total_progress'],
+        'completed_progress': stats['completed_progress'],
+        'category_stats': stats['category_stats'],
+        'monthly_stats': stats['monthly_stats'],
+        'weekly_stats': stats['weekly_stats'],
     }
     
     return render(request, 'dadash/analytics.html', context)
@@ -1041,106 +921,9 @@ def achievements(request):
     user = request.user
     profile, created = UserProfile.objects.get_or_create(user=user)
     
-    # محاسبه دستاوردها
-    achievements = []
-    
-    # دستاوردهای کلی
-    total_completed = UserProgress.objects.filter(user=user, completed=True).count()
-    
-    if total_completed >= 1:
-        achievements.append({
-            'title': 'شروع کننده',
-            'description': 'اولین کیس خود را تکمیل کردید',
-            'icon': '🎯',
-            'earned': True,
-            'date': UserProgress.objects.filter(user=user, completed=True).first().completed_at,
-        })
-    
-    if total_completed >= 5:
-        achievements.append({
-            'title': 'متعلم',
-            'description': '5 کیس را تکمیل کردید',
-            'icon': '📚',
-            'earned': True,
-            'date': UserProgress.objects.filter(user=user, completed=True)[4].completed_at,
-        })
-    
-    if total_completed >= 10:
-        achievements.append({
-            'title': 'متخصص',
-            'description': '10 کیس را تکمیل کردید',
-            'icon': '🏆',
-            'earned': True,
-            'date': UserProgress.objects.filter(user=user, completed=True)[9].completed_at,
-        })
-    
-    if total_completed >= 25:
-        achievements.append({
-            'title': 'استاد',
-            'description': '25 کیس را تکمیل کردید',
-            'icon': '👑',
-            'earned': True,
-            'date': UserProgress.objects.filter(user=user, completed=True)[24].completed_at,
-        })
-    
-    # دستاوردهای دقت
-    if profile.overall_accuracy >= 80:
-        achievements.append({
-            'title': 'دقیق',
-            'description': 'دقت کلی بالای 80%',
-            'icon': '🎯',
-            'earned': True,
-            'date': None,
-        })
-    
-    if profile.overall_accuracy >= 90:
-        achievements.append({
-            'title': 'نابغه',
-            'description': 'دقت کلی بالای 90%',
-            'icon': '🧠',
-            'earned': True,
-            'date': None,
-        })
-    
-    # دستاوردهای دسته‌بندی
-    categories = CaseCategory.objects.all()
-    for category in categories:
-        category_cases = Case.objects.filter(category=category, is_published=True)
-        completed_in_category = UserProgress.objects.filter(
-            user=user,
-            case__in=category_cases,
-            completed=True
-        ).count()
-        
-        if completed_in_category >= category_cases.count() and category_cases.count() > 0:
-            achievements.append({
-                'title': f'متخصص {category.name}',
-                'description': f'همه کیس‌های {category.name} را تکمیل کردید',
-                'icon': '🏅',
-                'earned': True,
-                'date': None,
-            })
-    
-    # دستاوردهای آینده (هنوز کسب نشده)
-    if total_completed < 50:
-        achievements.append({
-            'title': 'قهرمان',
-            'description': '50 کیس را تکمیل کنید',
-            'icon': '🥇',
-            'earned': False,
-            'progress': total_completed,
-            'target': 50,
-        })
-    
-    if profile.overall_accuracy < 95:
-        achievements.append({
-            'title': 'کمال‌گرا',
-            'description': 'دقت کلی بالای 95%',
-            'icon': '💎',
-            'earned': False,
-            'progress': profile.overall_accuracy,
-            'target': 95,
-        })
+    # دستاوردهای ذخیره شده کاربر (با هر تکمیل کیس توسط AchievementEngine به‌روز می‌شوند)
+    from apps.courses.services import AchievementEngine
+    achievements = AchievementEngine.for_user(user, profile)
     
     context = {
         'profile': profile,
@@ -1205,25 +988,20 @@ def send_notification_view(request):
             print(f"Debug - is_broadcast: {is_broadcast}, type: {type(is_broadcast)}")
             
             if is_broadcast:
-                # ارسال به همه کاربران فعال
-                users = CustomUser.objects.filter(is_active=True)
-                notification_count = 0
-                
-                for user in users:
-                    Notification.objects.create(
-                        title=title,
-                        message=message,
-                        notification_type=notification_type,
-                        recipient=user,
-                        sender=request.user,
-                        expires_at=expiry_date,
-                        is_broadcast=True
-                    )
-                    notification_count += 1
+                # اعلان عمومی یک بار ذخیره می‌شود؛ وضعیت هر کاربر در NotificationReceipt نگهداری می‌شود
+                Notification.objects.create(
+                    title=title,
+                    message=message,
+                    notification_type=notification_type,
+                    recipient=None,
+                    sender=request.user,
+                    expires_at=expiry_date,
+                    is_broadcast=True
+                )
                 
                 return JsonResponse({
                     'success': True, 
-                    'message': f'اعلان برای {notification_count} کاربر ارسال شد'
+                    'message': 'اعلان عمومی برای همه کاربران ارسال شد'
                 })
             else:
                 # ارسال به کاربر خاص (در آینده پیاده‌سازی شود)
@@ -1245,8 +1023,13 @@ def get_notifications_stats(request):
         return JsonResponse({'total': 0, 'unread': 0}, status=401)
     
     try:
-        total_notifications = Notification.objects.count()
-        unread_notifications = Notification.objects.filter(is_read=False, is_active=True).count()
+        # وضعیت خوانده شدن اعلان‌های عمومی مشترک به کاربر وابسته است و در unread شمرده نمی‌شود
+        stats = Notification.objects.aggregate(
+            total=Count('id'),
+            unread=Count('id', filter=Q(is_read=False, is_active=True, recipient__isnull=False)),
+        )
+        total_notifications = stats['total']
+        unread_notifications = stats['unread']
         
         return JsonResponse({
             'total': total_notifications,
@@ -1260,12 +1043,9 @@ def get_notifications_stats(request):
 def user_notifications_view(request):
     """دریافت اعلان‌های کاربر"""
     try:
-        notifications = Notification.objects.filter(
-            recipient=request.user,
-            is_active=True
-        ).exclude(
-            expires_at__lt=timezone.now()
-        ).order_by('-created_at')[:20]
+        # اعلان‌های مستقیم و عمومی کاربر با وضعیت خوانده شدن در یک query
+        visible = Notification.for_user(request.user)
+        notifications = visible.select_related('sender').order_by('-created_at')[:20]
         
         notifications_data = []
         for notification in notifications:
@@ -1274,14 +1054,14 @@ def user_notifications_view(request):
                 'title': notification.title,
                 'message': notification.message,
                 'notification_type': notification.notification_type,
-                'is_read': notification.is_read,
+                'is_read': notification.user_is_read,
                 'created_at': notification.created_at.isoformat(),
                 'sender': notification.sender.get_full_name() if notification.sender else None
             })
         
         return JsonResponse({
             'notifications': notifications_data,
-            'unread_count': notifications.filter(is_read=False).count()
+            'unread_count': visible.filter(user_is_read=False).count()
         })
     except Exception as e:
         return JsonResponse({'notifications': [], 'unread_count': 0})
@@ -1291,11 +1071,8 @@ def user_notifications_view(request):
 def mark_notification_read_view(request, notification_id):
     """علامت‌گذاری اعلان به عنوان خوانده شده"""
     try:
-        notification = Notification.objects.get(
-            id=notification_id,
-            recipient=request.user
-        )
-        notification.mark_as_read()
+        notification = Notification.for_user(request.user).get(id=notification_id)
+        notification.mark_as_read_for(request.user)
         
         return JsonResponse({'success': True})
     except Notification.DoesNotExist:
@@ -1308,10 +1085,7 @@ def mark_notification_read_view(request, notification_id):
 def mark_all_notifications_read_view(request):
     """علامت‌گذاری همه اعلان‌ها به عنوان خوانده شده"""
     try:
-        Notification.objects.filter(
-            recipient=request.user,
-            is_read=False
-        ).update(is_read=True, read_at=timezone.now())
+        Notification.mark_all_as_read_for(request.user)
         
         return JsonResponse({'success': True})
     except Exception as e:
@@ -1322,11 +1096,8 @@ def mark_all_notifications_read_view(request):
 def delete_notification_view(request, notification_id):
     """حذف اعلان"""
     try:
-        notification = Notification.objects.get(
-            id=notification_id,
-            recipient=request.user
-        )
-        notification.delete()
+        notification = Notification.for_user(request.user).get(id=notification_id)
+        notification.delete_for(request.user)
         
         return JsonResponse({'success': True})
     except Notification.DoesNotExist:
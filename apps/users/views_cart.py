@@ -42,11 +42,13 @@ def add_to_cart(request, plan_id):
     else:
         messages.success(request, f'{plan.name} به سبد خرید اضافه شد.')
     
+    cart_count = cart.refresh_cached_count()
+    
     # اگر درخواست AJAX است
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return JsonResponse({
             'success': True,
-            'cart_count': cart.items_count,
+            'cart_count': cart_count,
             'message': 'به سبد خرید اضافه شد'
         })
     
@@ -61,6 +63,7 @@ def remove_from_cart(request, item_id):
     
     plan_name = cart_item.plan.name
     cart_item.delete()
+    cart_count = cart.refresh_cached_count()
     
     messages.success(request, f'{plan_name} از سبد خرید حذف شد.')
     
@@ -68,7 +71,7 @@ def remove_from_cart(request, item_id):
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return JsonResponse({
             'success': True,
-            'cart_count': cart.items_count,
+            'cart_count': cart_count,
             'message': 'از سبد خرید حذف شد'
         })
     
@@ -91,10 +94,12 @@ def update_cart_item(request, item_id):
             cart_item.delete()
             messages.success(request, 'آیتم از سبد حذف شد.')
         
+        cart_count = cart.refresh_cached_count()
+        
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return JsonResponse({
                 'success': True,
-                'cart_count': cart.items_count,
+                'cart_count': cart_count,
                 'total_price': float(cart.total_price),
             })
     
@@ -114,11 +119,7 @@ def clear_cart(request):
 def get_cart_count(request):
     """دریافت تعداد آیتم‌های سبد (برای AJAX)"""
     if request.user.is_authenticated:
-        try:
-            cart = Cart.objects.get(user=request.user)
-            count = cart.items_count
-        except Cart.DoesNotExist:
-            count = 0
+        count = Cart.get_cached_count(request.user.id)
     else:
         count = 0
     
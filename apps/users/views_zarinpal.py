@@ -178,7 +178,7 @@ def payment_callback(request):
                 if 'cart_payment_id' in request.session:
                     try:
                         cart = Cart.objects.get(user=payment.user)
-                        cart.items.all().delete()  # حذف تمام آیتم‌ها
+                        cart.clear()  # حذف تمام آیتم‌ها و صفر کردن شمارنده
                         del request.session['cart_payment_id']
                         logger.info(f"Cart cleared after successful payment")
                     except Cart.DoesNotExist: